@@ -0,0 +1,99 @@
+"""
+Benchmark: nhiều shipper cùng nhận 1 đơn (accept_order race)
+
+Mỗi vòng tạo 1 đơn PENDING giả, cho N thread (mỗi thread 1 shipperId khác nhau)
+cùng gọi order_service.accept_order. Kỳ vọng: đúng 1 thread thắng, các thread
+còn lại nhận OrderConflictError.
+
+CÁCH CHẠY (từ thư mục app, trỏ vào database riêng để không đụng dữ liệu thật):
+    MONGO_URI=mongodb://localhost:27017 MONGO_DB_NAME=fooddelivery_bench \\
+        python -m benchmarks.bench_order_dispatch --threads 32 --rounds 50
+"""
+import argparse
+import threading
+import time
+
+from bson import ObjectId
+
+from db.models.order import Order, OrderItem, OrderStatus
+from services.order_service import order_service, OrderConflictError
+from utils.timezone_utils import get_utc_now
+
+
+def _insert_pending_order() -> str:
+    """Tạo 1 đơn PENDING tối thiểu để các shipper tranh nhau nhận"""
+    order = Order(
+        user_id=ObjectId(),
+        restaurant_id=ObjectId(),
+        user_fullname='Bench User',
+        user_phone='0000000000',
+        restaurant_name='Bench Restaurant',
+        restaurant_address='Bench Address',
+        items=[OrderItem(food_name='Bench Food', quantity=1, unit_price=10000, subtotal=10000)],
+        address='Bench Address',
+        subtotal=10000,
+        total_amount=10000,
+        status=OrderStatus.PENDING,
+        created_at=get_utc_now(),
+        updated_at=get_utc_now(),
+    )
+    return str(order_service.collection.insert_one(order.to_mongo()).inserted_id)
+
+
+def run_round(threads: int) -> dict:
+    """Chạy 1 vòng: N thread cùng accept 1 đơn. Trả về số thắng/thua và thời gian."""
+    order_id = _insert_pending_order()
+    barrier = threading.Barrier(threads)
+    outcome = {'won': 0, 'conflict': 0, 'error': 0}
+    lock = threading.Lock()
+
+    def worker():
+        shipper_id = str(ObjectId())
+        barrier.wait()
+        try:
+            order_service.accept_order(order_id, shipper_id)
+            key = 'won'
+        except OrderConflictError:
+            key = 'conflict'
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            key = 'error'
+        with lock:
+            outcome[key] += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    outcome['elapsed'] = time.perf_counter() - started
+
+    order_service.collection.delete_one({'_id': ObjectId(order_id)})
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark accept_order race')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    total_attempts = 0
+    total_elapsed = 0.0
+    bad_rounds = 0
+    for i in range(args.rounds):
+        result = run_round(args.threads)
+        total_attempts += args.threads
+        total_elapsed += result['elapsed']
+        if result['won'] != 1 or result['error']:
+            bad_rounds += 1
+            print(f"Round {i}: {result}")
+
+    print(f"Rounds: {args.rounds}, threads/round: {args.threads}")
+    print(f"Rounds with exactly one winner: {args.rounds - bad_rounds}/{args.rounds}")
+    print(f"Throughput: {total_attempts / total_elapsed:,.0f} accept attempts/s")
+
+
+if __name__ == '__main__':
+    main()
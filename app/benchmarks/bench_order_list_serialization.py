@@ -0,0 +1,107 @@
+"""
+Benchmark: serialize 1 trang danh sách đơn hàng (card view)
+
+So sánh 2 cách build simple response cho N document (mặc định 10k):
+- legacy: parse_mongo_document → Order(**doc) → to_dict() → OrderSimpleResponse(**data).model_dump()
+  (document đầy đủ, validate pydantic 2 lần)
+- lean:   OrderListView.from_mongo(doc) → to_dict()
+  (document đã projection theo OrderListView.PROJECTION, không validate)
+
+Chỉ đo CPU serialize (không cần MongoDB, document được sinh sẵn trong bộ nhớ).
+Kết quả 2 cách được so sánh với nhau để chắc chắn response không đổi.
+
+CÁCH CHẠY (từ thư mục app):
+    python -m benchmarks.bench_order_list_serialization --orders 10000 --repeat 3
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from bson import ObjectId
+
+from db.models.order import Order, OrderListView, OrderStatus
+from schemas.order_schema import OrderSimpleResponse
+from utils.mongo_parser import parse_mongo_document
+from utils.timezone_utils import get_utc_now
+
+
+def _make_docs(count: int) -> list:
+    """Sinh document giống dữ liệu thật (có items, lịch sử từ chối, thông tin hoàn tiền...)"""
+    now = get_utc_now().replace(microsecond=0, tzinfo=None)
+    statuses = [s.value for s in OrderStatus]
+    docs = []
+    for i in range(count):
+        items = [
+            {'food_name': f'Món {i}-{j}', 'quantity': j + 1, 'unit_price': 25000.0,
+             'subtotal': 25000.0 * (j + 1), 'status': 'Active'}
+            for j in range(3)
+        ]
+        docs.append({
+            '_id': ObjectId(), 'userId': ObjectId(), 'restaurantId': ObjectId(),
+            'shipperId': ObjectId() if i % 2 else None, 'paymentId': ObjectId(), 'paymentMethod': 'COD',
+            'userFullname': 'Nguyễn Văn A', 'userPhone': '0900000000',
+            'restaurantName': 'Phở Hà Nội', 'restaurantAddress': '1 Tràng Tiền, Hoàn Kiếm, Hà Nội',
+            'restaurantHotline': '0240000000', 'items': items, 'address': '2 Lý Thái Tổ, Hoàn Kiếm, Hà Nội',
+            'note': 'Không hành', 'subtotal': 150000.0, 'shipping_fee': 15000.0, 'discount': 0.0,
+            'total_amount': 165000.0, 'promoId': None, 'status': statuses[i % len(statuses)],
+            'isReviewed': bool(i % 3), 'refunded': False, 'refunded_amount': 0.0, 'refund_at': None,
+            'cancelled_by': None, 'cancellation_reason': None,
+            'shipperRejections': [{'shipperId': ObjectId(), 'reason': 'Xa quá', 'timestamp': now}],
+            'createdAt': now - timedelta(minutes=i), 'updatedAt': now, 'pickedAt': None,
+        })
+    return docs
+
+
+def _project(doc: dict) -> dict:
+    """Giả lập projection của MongoDB theo OrderListView.PROJECTION"""
+    projected = {k: doc[k] for k in OrderListView.PROJECTION if '.' not in k and k in doc}
+    projected['shipperRejections'] = [{'shipperId': r['shipperId']} for r in doc['shipperRejections']]
+    return projected
+
+
+def legacy_serialize(docs: list) -> list:
+    result = []
+    for doc in docs:
+        order = Order(**parse_mongo_document(doc))
+        data = order.to_dict()
+        if order.items:
+            data['foodName'] = order.items[0].food_name
+        result.append(OrderSimpleResponse(**data).model_dump(by_alias=True))
+    return result
+
+
+def lean_serialize(docs: list) -> list:
+    return [OrderListView.from_mongo(doc).to_dict() for doc in docs]
+
+
+def _best_rate(fn, docs: list, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - started)
+    return len(docs) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark order list serialization')
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    docs = _make_docs(args.orders)
+    projected = [_project(doc) for doc in docs]
+
+    if legacy_serialize(docs) != lean_serialize(projected):
+        raise SystemExit('Output mismatch between legacy and lean serialization')
+
+    legacy_rate = _best_rate(legacy_serialize, docs, args.repeat)
+    lean_rate = _best_rate(lean_serialize, projected, args.repeat)
+    print(f"Orders/page: {args.orders}")
+    print(f"legacy (Order + OrderSimpleResponse): {legacy_rate:,.0f} docs/s")
+    print(f"lean   (OrderListView):               {lean_rate:,.0f} docs/s")
+    print(f"Speedup: {lean_rate / legacy_rate:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: encode + nén response của các endpoint list lớn
+
+Payload giống response thật (không cần MongoDB, dữ liệu sinh sẵn trong bộ nhớ):
+- /api/orders/all:         {'success', 'data': [OrderListView.to_dict()...], 'nextCursor'}
+- /api/restaurants/foods:  {'success', 'data': [món như FoodService._to_response()...], 'nextCursor'}
+
+So sánh:
+- stdlib: DefaultJSONProvider mặc định của Flask (json.dumps → str → bytes)
+- orjson: core.json_provider.FastJSONProvider (encode thẳng ra bytes)
+Kèm kích thước body trước/sau gzip (GZIP_LEVEL) và thời gian nén.
+Body của 2 provider được parse lại để chắc chắn dữ liệu không đổi
+(datetime: stdlib ghi HTTP date, orjson ghi ISO 8601 - so sánh theo thời điểm).
+
+CÁCH CHẠY (từ thư mục app):
+    python -m benchmarks.bench_response_encoding --items 5000 --repeat 5
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.bench_order_list_serialization import _make_docs, _project
+from core.config import config
+from core.json_provider import FastJSONProvider
+from db.models.order import OrderListView
+
+DISHES = ['Phở bò', 'Bún chả', 'Cơm tấm sườn', 'Bánh mì thịt', 'Gỏi cuốn', 'Trà sữa trân châu', 'Cà phê sữa đá']
+CATEGORIES = ['Phở', 'Bún', 'Cơm', 'Bánh', 'Đồ uống']
+
+
+def _orders_payload(count: int) -> dict:
+    data = [OrderListView.from_mongo(_project(doc)).to_dict() for doc in _make_docs(count)]
+    return {'success': True, 'data': data, 'nextCursor': 'MjAyNC0wMS0wMVQwMDowMDowMHw2NWE='}
+
+
+def _foods_payload(count: int) -> dict:
+    rng = random.Random(42)
+    data = []
+    for i in range(count):
+        restaurant_id = str(ObjectId())
+        name = f'{rng.choice(DISHES)} {i}'
+        eta = rng.randint(15, 45)
+        data.append({
+            'id': f'{restaurant_id}-{name}', 'name': name, 'price': float(rng.randint(2, 20) * 5000),
+            'description': 'Món ngon đặc trưng của quán, nấu theo công thức gia truyền',
+            'imageUrl': f'https://cdn.example.com/foods/{i}.jpg', 'category': rng.choice(CATEGORIES),
+            'restaurantId': restaurant_id, 'restaurantName': f'Quán {rng.choice(DISHES)} {i % 200}',
+            'rating': round(rng.uniform(3, 5), 1), 'distance': f'{rng.uniform(0.3, 8):.1f} km',
+            'deliveryTime': f'{eta}-{eta + 10} phút', 'etaMinutes': eta, 'status': True,
+        })
+    return {'success': True, 'data': data, 'nextCursor': None}
+
+
+def _same(a, b) -> bool:
+    """So sánh 2 JSON đã parse, chuỗi datetime khác định dạng nhưng cùng thời điểm coi là bằng nhau"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, str) and isinstance(b, str) and a != b:
+        try:
+            return parsedate_to_datetime(a) == datetime.fromisoformat(b)
+        except (TypeError, ValueError):
+            return False
+    return a == b
+
+
+def _best(fn, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _run(app: Flask, label: str, payload: dict, repeat: int) -> None:
+    stdlib, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    with app.test_request_context():
+        stdlib_s, stdlib_body = _best(lambda: stdlib.response(payload).get_data(), repeat)
+        fast_s, fast_body = _best(lambda: fast.response(payload).get_data(), repeat)
+    if not _same(json.loads(stdlib_body), json.loads(fast_body)):
+        raise SystemExit(f'{label}: output mismatch between stdlib and orjson provider')
+
+    gzip_s, gzipped = _best(lambda: gzip.compress(fast_body, compresslevel=config.GZIP_LEVEL, mtime=0), repeat)
+    print(f"{label} ({len(payload['data']):,} items)")
+    print(f"  stdlib json: {stdlib_s * 1000:8.1f} ms")
+    print(f"  orjson:      {fast_s * 1000:8.1f} ms  ({stdlib_s / fast_s:.1f}x)")
+    print(f"  body: {len(fast_body) / 1024:,.0f} KB → gzip level {config.GZIP_LEVEL}: "
+          f"{len(gzipped) / 1024:,.0f} KB ({len(gzipped) / len(fast_body):.0%}), {gzip_s * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding + gzip of large list responses')
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    _run(app, '/api/orders/all', _orders_payload(args.items), args.repeat)
+    _run(app, '/api/restaurants/foods', _foods_payload(args.items), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
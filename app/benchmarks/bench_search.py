@@ -0,0 +1,116 @@
+"""
+Benchmark: tìm món (search cho user)
+
+So sánh 2 cách tìm trên cùng dữ liệu giả (mặc định 2000 nhà hàng x 30 món):
+- regex:  cách cũ - $unwind toàn bộ menu rồi $regex không neo trên tên món và category
+          (không dùng được index, quét hết collection restaurants)
+- search: search_service.search_foods - {searchGrams: {$all: ...}} trên index multikey
+          của collection foods, xếp hạng trong Python
+Kèm số kết quả của từng cách (search còn khớp không dấu nên có thể nhiều hơn regex).
+
+CÁCH CHẠY (từ thư mục app, trỏ vào database riêng để không đụng dữ liệu thật):
+    MONGO_URI=mongodb://localhost:27017 MONGO_DB_NAME=fooddelivery_bench \\
+        python -m benchmarks.bench_search --restaurants 2000 --foods 30 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from bson import ObjectId
+
+from db.connection import init_indexes, restaurants_collection
+from services.food_service import food_service
+from services.search_service import search_service
+
+BENCH_ADDRESS = 'Bench Address'
+
+DISHES = ['Phở bò', 'Phở gà', 'Bún chả', 'Bún bò Huế', 'Cơm tấm sườn', 'Cơm gà xối mỡ', 'Bánh mì thịt',
+          'Bánh cuốn', 'Gỏi cuốn', 'Mì Quảng', 'Hủ tiếu Nam Vang', 'Lẩu thái', 'Gà nướng', 'Rau muống xào',
+          'Trà đá', 'Trà sữa trân châu', 'Cà phê sữa đá', 'Sinh tố bơ', 'Nước cam', 'Kem dừa']
+CATEGORIES = ['Phở', 'Bún', 'Cơm', 'Bánh', 'Món nướng', 'Món xào', 'Đồ uống', 'Tráng miệng']
+QUERIES = ['phở', 'bun bo', 'Cơm tấm', 'tra sua', 'đồ uống', 'xyz']
+
+
+def _seed(restaurant_count: int, food_count: int) -> None:
+    """Sinh nhà hàng giả (menu ngẫu nhiên) + đồng bộ foods"""
+    rng = random.Random(42)
+    docs = []
+    for i in range(restaurant_count):
+        menu = {}
+        for j in range(food_count):
+            menu.setdefault(rng.choice(CATEGORIES), []).append(
+                {'name': f'{rng.choice(DISHES)} {j}', 'price': float(rng.randint(2, 20) * 5000), 'status': True}
+            )
+        name = f'Quán {rng.choice(DISHES)} {i}'
+        docs.append({
+            '_id': ObjectId(), 'name': name, 'address': BENCH_ADDRESS, 'status': True,
+            'menu': [{'category': c, 'items': items} for c, items in menu.items()],
+            'average_rating': round(rng.uniform(3, 5), 1), 'total_reviews': rng.randint(1, 200),
+            **search_service.restaurant_fields(name),
+        })
+    restaurants_collection.insert_many(docs)
+    for doc in docs:
+        food_service.sync_restaurant(doc['_id'], doc)
+
+
+def _cleanup() -> None:
+    ids = [doc['_id'] for doc in restaurants_collection.find({'address': BENCH_ADDRESS}, {'_id': 1})]
+    food_service.collection.delete_many({'restaurantId': {'$in': ids}})
+    restaurants_collection.delete_many({'_id': {'$in': ids}})
+
+
+def regex_search(query: str) -> int:
+    """Cách cũ: 2 pipeline $unwind + $regex (tên món, category), gộp trùng"""
+    keys = set()
+    for field, unwind_items_first in (('menu.items.name', True), ('menu.category', False)):
+        pipeline = [{'$match': {'status': True}}, {'$unwind': '$menu'}]
+        match = {'$match': {field: {'$regex': query, '$options': 'i'}}}
+        pipeline += [{'$unwind': '$menu.items'}, match] if unwind_items_first else [match, {'$unwind': '$menu.items'}]
+        pipeline.append({'$project': {'_id': 1, 'name': 1, 'average_rating': 1, 'total_reviews': 1,
+                                      'category': '$menu.category', 'food': '$menu.items'}})
+        for item in restaurants_collection.aggregate(pipeline):
+            keys.add(f"{item['_id']}_{item['category']}_{item['food']['name']}")
+    return len(keys)
+
+
+def indexed_search(query: str) -> int:
+    return search_service.search_foods(query)[1]
+
+
+def _time(fn, query: str, repeat: int) -> tuple:
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(query)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark food search: regex scan vs n-gram index')
+    parser.add_argument('--restaurants', type=int, default=2000)
+    parser.add_argument('--foods', type=int, default=30, help='Số món mỗi nhà hàng')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    init_indexes()
+    _cleanup()
+    started = time.perf_counter()
+    _seed(args.restaurants, args.foods)
+    print(f"Seeded {args.restaurants} restaurants x {args.foods} foods in {time.perf_counter() - started:.1f}s")
+
+    try:
+        print(f"{'query':<12} {'regex ms':>10} {'hits':>7} {'search ms':>10} {'hits':>7} {'speedup':>8}")
+        for query in QUERIES:
+            regex_time, regex_hits = _time(regex_search, query, args.repeat)
+            search_time, search_hits = _time(indexed_search, query, args.repeat)
+            speedup = regex_time / search_time if search_time else float('inf')
+            print(f"{query:<12} {regex_time * 1000:>10.1f} {regex_hits:>7} "
+                  f"{search_time * 1000:>10.1f} {search_hits:>7} {speedup:>7.1f}x")
+    finally:
+        _cleanup()
+
+
+if __name__ == '__main__':
+    main()
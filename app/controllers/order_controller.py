@@ -1,6 +1,7 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from pydantic import ValidationError
-from services.order_service import order_service
+from services.order_service import order_service, OrderConflictError
+from services.order_feed_service import order_feed_service
 from schemas.order_schema import (
     CreateOrderRequest,
     CancelOrderRequest,
@@ -10,6 +11,11 @@ from schemas.order_schema import (
 class OrderController:
     """Order Controller - Xử lý HTTP requests cho đơn hàng"""
 
+    @staticmethod
+    def _page_args():
+        """Đọc tham số phân trang keyset: ?limit=20&cursor=<nextCursor>"""
+        return request.args.get('limit', type=int), request.args.get('cursor')
+
     # ==================== User Routes ====================
 
     def create_order(self):
@@ -35,8 +41,8 @@ class OrderController:
         """Lấy danh sách đơn hàng của user"""
         try:
             user_id = request.user_id
-            result = order_service.get_user_orders(user_id)
-            return jsonify({'success': True, 'data': result}), 200
+            result, next_cursor = order_service.get_user_orders(user_id, *self._page_args())
+            return jsonify({'success': True, 'data': result, 'nextCursor': next_cursor}), 200
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -84,7 +90,38 @@ class OrderController:
         """Shipper xem danh sách đơn chờ (PENDING)"""
         try:
             shipper_id = request.user_id
-            result = order_service.get_pending_orders(shipper_id)
+            result, next_cursor = order_service.get_pending_orders(shipper_id, *self._page_args())
+            return jsonify({'success': True, 'data': result, 'nextCursor': next_cursor}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
+    def stream_pending_orders(self):
+        """Shipper nhận sự kiện đơn chờ qua SSE (new_pending_order / order_taken / order_cancelled)"""
+        try:
+            # Đọc trước khi vào generator (generator chạy sau khi view đã return)
+            shipper_id = request.user_id
+            since = request.headers.get('Last-Event-ID') or request.args.get('since')
+            response = Response(
+                stream_with_context(order_feed_service.stream(shipper_id, since)),
+                mimetype='text/event-stream'
+            )
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'  # Tắt buffer của nginx
+            return response
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
+    def poll_pending_orders(self):
+        """Shipper long-poll sự kiện đơn chờ (fallback khi không dùng được SSE)"""
+        try:
+            shipper_id = request.user_id
+            since = request.args.get('since')
+            timeout = request.args.get('timeout', default=25, type=float)
+            if timeout < 0:
+                raise ValueError('Tham số timeout phải lớn hơn hoặc bằng 0')
+            result = order_feed_service.wait_for_events(shipper_id, since, min(timeout, 30))
             return jsonify({'success': True, 'data': result}), 200
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
@@ -95,8 +132,8 @@ class OrderController:
         """Shipper xem danh sách đơn của mình"""
         try:
             shipper_id = request.user_id
-            result = order_service.get_shipper_orders(shipper_id)
-            return jsonify({'success': True, 'data': result}), 200
+            result, next_cursor = order_service.get_shipper_orders(shipper_id, *self._page_args())
+            return jsonify({'success': True, 'data': result, 'nextCursor': next_cursor}), 200
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -108,6 +145,8 @@ class OrderController:
             shipper_id = request.user_id
             result = order_service.accept_order(order_id, shipper_id)
             return jsonify({'success': True, 'message': 'Nhận đơn hàng thành công', 'data': result}), 200
+        except OrderConflictError as e:
+            return jsonify({'success': False, 'message': str(e)}), 409
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -119,6 +158,8 @@ class OrderController:
             shipper_id = request.user_id
             result = order_service.complete_order(order_id, shipper_id)
             return jsonify({'success': True, 'message': 'Hoàn thành đơn hàng thành công', 'data': result}), 200
+        except OrderConflictError as e:
+            return jsonify({'success': False, 'message': str(e)}), 409
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -132,6 +173,8 @@ class OrderController:
             reason = data.get('reason')
             result = order_service.decline_pending_order(order_id, shipper_id, reason)
             return jsonify({'success': True, 'message': 'Đã từ chối đơn hàng', 'data': result}), 200
+        except OrderConflictError as e:
+            return jsonify({'success': False, 'message': str(e)}), 409
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -145,6 +188,8 @@ class OrderController:
             reason = data.get('reason')
             result = order_service.reject_order_by_shipper(order_id, shipper_id, reason)
             return jsonify({'success': True, 'message': 'Từ chối đơn hàng thành công', 'data': result}), 200
+        except OrderConflictError as e:
+            return jsonify({'success': False, 'message': str(e)}), 409
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -178,8 +223,8 @@ class OrderController:
     def get_all_orders(self):
         """Admin xem tất cả đơn hàng"""
         try:
-            result = order_service.get_all_orders()
-            return jsonify({'success': True, 'data': result}), 200
+            result, next_cursor = order_service.get_all_orders(*self._page_args())
+            return jsonify({'success': True, 'data': result, 'nextCursor': next_cursor}), 200
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -191,8 +236,8 @@ class OrderController:
             status = request.args.get('status')
             if not status:
                 return jsonify({'success': False, 'message': 'Tham số status không được để trống'}), 400
-            result = order_service.get_all_orders_by_status(status)
-            return jsonify({'success': True, 'data': result}), 200
+            result, next_cursor = order_service.get_all_orders_by_status(status, *self._page_args())
+            return jsonify({'success': True, 'data': result, 'nextCursor': next_cursor}), 200
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -212,8 +257,8 @@ class OrderController:
     def get_restaurant_orders(self, restaurant_id: str):
         """Admin xem đơn hàng của nhà hàng"""
         try:
-            result = order_service.get_restaurant_orders(restaurant_id)
-            return jsonify({'success': True, 'data': result}), 200
+            result, next_cursor = order_service.get_restaurant_orders(restaurant_id, *self._page_args())
+            return jsonify({'success': True, 'data': result, 'nextCursor': next_cursor}), 200
         except ValueError as e:
             return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
@@ -1,9 +1,15 @@
 from flask import request, jsonify
 from pydantic import ValidationError
+from core.config import config
 from services.restaurant_service import restaurant_service
+from services.catalog_version_service import catalog_version_service
+from services.delivery_eta_service import delivery_eta_service
+from utils.http_cache import make_etag, conditional_json
 from schemas.restaurant_schema import (
     CreateRestaurantRequest,
     UpdateRestaurantRequest,
+    AddFoodToMenuRequest,
+    UpdateFoodInMenuRequest,
 )
 
 class RestaurantController:
@@ -25,6 +31,19 @@ class RestaurantController:
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
+    def get_by_id_public(self, restaurant_id: str):
+        """Public xem chi tiết nhà hàng - conditional GET theo version catalog (304 không đọc DB)"""
+        try:
+            version, last_modified = catalog_version_service.current()
+            return conditional_json(
+                make_etag('restaurant', version, restaurant_id), last_modified, config.CATALOG_CACHE_MAX_AGE_SECONDS,
+                lambda: restaurant_service.get_restaurant_by_id(restaurant_id)
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 404
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
     def get_by_id(self, restaurant_id: str):
         """User xem chi tiết nhà hàng (chỉ nếu đang hoạt động)"""
         try:
@@ -82,14 +101,33 @@ class RestaurantController:
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
+    def autocomplete(self):
+        """Gợi ý theo tiền tố khi gõ: ?q=&limit=&types=restaurant,food,category"""
+        try:
+            types = request.args.get('types')
+            data = restaurant_service.autocomplete(
+                request.args.get('q', ''),
+                limit=request.args.get('limit', type=int),
+                types=[t.strip() for t in types.split(',') if t.strip()] if types else None,
+            )
+            return jsonify({'success': True, 'data': data}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
     def search_for_users(self):
         """Search cho user: chỉ tìm food và category"""
         try:
             q = request.args.get('q')
             if not q:
                 return jsonify({'success': False, 'message': 'Thiếu tham số q'}), 400
-            data = restaurant_service.search_for_users(q)
-            return jsonify({'success': True, 'data': data}), 200
+            data, total = restaurant_service.search_for_users(
+                q, request.args.get('page', type=int), request.args.get('limit', type=int)
+            )
+            return jsonify({'success': True, 'data': data, 'total': total}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
@@ -99,8 +137,12 @@ class RestaurantController:
             q = request.args.get('q')
             if not q:
                 return jsonify({'success': False, 'message': 'Thiếu tham số q'}), 400
-            data = restaurant_service.search_for_admin(q)
+            data = restaurant_service.search_for_admin(
+                q, request.args.get('page', type=int), request.args.get('limit', type=int)
+            )
             return jsonify({'success': True, 'data': data}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
@@ -121,39 +163,180 @@ class RestaurantController:
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
+    # ==================== MENU (từng món / category) ====================
+
+    def add_menu_item(self, restaurant_id: str):
+        """Admin thêm 1 món vào menu"""
+        try:
+            if not request.json:
+                return jsonify({'success': False, 'message': 'Request body không được để trống'}), 400
+            req = AddFoodToMenuRequest(**request.json)
+            result = restaurant_service.add_menu_item(restaurant_id, req)
+            return jsonify({'success': True, 'message': 'Thêm món thành công', 'data': result}), 201
+        except ValidationError as e:
+            return jsonify({'success': False, 'message': 'Dữ liệu không hợp lệ', 'errors': e.errors()}), 400
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
+    def update_menu_item(self, restaurant_id: str, food_name: str):
+        """Admin sửa 1 món (tên/giá/mô tả/ảnh/trạng thái/category)"""
+        try:
+            if not request.json:
+                return jsonify({'success': False, 'message': 'Request body không được để trống'}), 400
+            req = UpdateFoodInMenuRequest(**request.json)
+            result = restaurant_service.update_menu_item(restaurant_id, food_name, req)
+            return jsonify({'success': True, 'message': 'Cập nhật món thành công', 'data': result}), 200
+        except ValidationError as e:
+            return jsonify({'success': False, 'message': 'Dữ liệu không hợp lệ', 'errors': e.errors()}), 400
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
+    def remove_menu_item(self, restaurant_id: str, food_name: str):
+        """Admin xóa 1 món khỏi menu"""
+        try:
+            result = restaurant_service.remove_menu_item(restaurant_id, food_name)
+            return jsonify({'success': True, 'message': 'Xóa món thành công', 'data': result}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
+    def toggle_menu_item_status(self, restaurant_id: str, food_name: str):
+        """Admin bật/tắt 1 món"""
+        try:
+            if not request.json:
+                return jsonify({'success': False, 'message': 'Request body không được để trống'}), 400
+
+            status = request.json.get('status')
+            if not isinstance(status, bool):
+                return jsonify({'success': False, 'message': 'Thiếu trường status (true/false)'}), 400
+
+            result = restaurant_service.toggle_menu_item_status(restaurant_id, food_name, status)
+            action = "mở bán" if status else "ngừng bán"
+            return jsonify({'success': True, 'message': f'Đã {action} món thành công', 'data': result}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
+    def move_menu_category(self, restaurant_id: str, category: str):
+        """Admin đổi vị trí 1 category trong menu"""
+        try:
+            if not request.json:
+                return jsonify({'success': False, 'message': 'Request body không được để trống'}), 400
+
+            position = request.json.get('position')
+            if not isinstance(position, int) or isinstance(position, bool):
+                return jsonify({'success': False, 'message': 'Thiếu trường position (số nguyên >= 0)'}), 400
+
+            result = restaurant_service.move_menu_category(restaurant_id, category, position)
+            return jsonify({'success': True, 'message': 'Đổi vị trí category thành công', 'data': result}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
     def get_promotions(self):
         """Lấy danh sách promotions từ restaurants có reviews tốt nhất"""
         try:
             limit = request.args.get('limit', 8, type=int)
-            data = restaurant_service.get_promotions(limit=limit)
-            return jsonify({'success': True, 'data': data}), 200
+            version, _ = catalog_version_service.current()
+            bucket, _ = restaurant_service.promotions_rotation()
+            # Kết quả cố định trong 1 bucket xoay vòng → cho phép cache ở browser/CDN
+            # Nội dung còn đổi theo bucket xoay vòng (không tăng version catalog) → không gửi Last-Modified, chỉ dùng ETag
+            return conditional_json(
+                make_etag('promotions', version, bucket, limit), None,
+                restaurant_service.promotions_max_age(),
+                lambda: restaurant_service.get_promotions(limit=limit)
+            )
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
     def get_categories(self):
         """Lấy danh sách categories từ restaurants với hình ảnh random"""
         try:
-            data = restaurant_service.get_categories()
-            return jsonify({'success': True, 'data': data}), 200
+            version, _ = catalog_version_service.current()
+            # Ảnh random cố định theo bucket xoay vòng của promotions → response ổn định trong 1 ETag
+            bucket, _ = restaurant_service.promotions_rotation()
+            # Nội dung còn đổi theo bucket xoay vòng (không tăng version catalog) → không gửi Last-Modified, chỉ dùng ETag
+            return conditional_json(
+                make_etag('categories', version, bucket), None,
+                restaurant_service.promotions_max_age(),
+                lambda: restaurant_service.get_categories(seed=str(bucket))
+            )
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
     def get_all_foods(self):
-        """Lấy tất cả foods từ restaurants đang hoạt động"""
+        """Lấy foods từ restaurants đang hoạt động
+        ?category=&restaurantId=&minPrice=&maxPrice=&minRating=&sort=rating|price_asc|price_desc|name&limit=&cursor=
+        &lat=&lng= (vị trí người dùng - để tính distance)
+        """
         try:
-            data = restaurant_service.get_all_foods()
-            return jsonify({'success': True, 'data': data}), 200
+            version, _ = catalog_version_service.current()
+            # Nội dung còn đổi theo thống kê ETA (không tăng version catalog) → không gửi Last-Modified, chỉ dùng ETag
+            etag = make_etag('foods', version, delivery_eta_service.stats_tag(), request.query_string)
+            return conditional_json(etag, None, config.CATALOG_CACHE_MAX_AGE_SECONDS, self._build_all_foods)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
+
+    def _build_all_foods(self) -> dict:
+        data, next_cursor = restaurant_service.get_all_foods(
+            category=request.args.get('category'),
+            restaurant_id=request.args.get('restaurantId'),
+            min_price=request.args.get('minPrice', type=float),
+            max_price=request.args.get('maxPrice', type=float),
+            min_rating=request.args.get('minRating', type=float),
+            sort=request.args.get('sort'),
+            limit=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor'),
+            lat=request.args.get('lat', type=float),
+            lng=request.args.get('lng', type=float),
+        )
+        return {'data': data, 'nextCursor': next_cursor}
+
+    def get_nearby(self):
+        """Nhà hàng gần tôi: ?lat=&lng=&radius=(km)&limit=&cursor="""
+        try:
+            data, next_cursor = restaurant_service.get_nearby_restaurants(
+                lat=request.args.get('lat', type=float),
+                lng=request.args.get('lng', type=float),
+                radius_km=request.args.get('radius', type=float),
+                limit=request.args.get('limit', type=int),
+                cursor=request.args.get('cursor'),
+            )
+            return jsonify({'success': True, 'data': data, 'nextCursor': next_cursor}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
     def get_food_by_id(self, food_id: str):
         """Lấy food item theo ID"""
         try:
-            data = restaurant_service.get_food_by_id(food_id)
-            if data:
-                return jsonify({'success': True, 'data': data}), 200
-            else:
-                return jsonify({'success': False, 'message': 'Không tìm thấy món ăn'}), 404
+            version, _ = catalog_version_service.current()
+            # Nội dung còn đổi theo thống kê ETA (không tăng version catalog) → không gửi Last-Modified, chỉ dùng ETag
+            etag = make_etag('food', version, delivery_eta_service.stats_tag(), food_id, request.query_string)
+
+            def build():
+                data = restaurant_service.get_food_by_id(
+                    food_id, request.args.get('lat', type=float), request.args.get('lng', type=float)
+                )
+                if not data:
+                    raise LookupError('Không tìm thấy món ăn')
+                return data
+
+            return conditional_json(etag, None, config.CATALOG_CACHE_MAX_AGE_SECONDS, build)
+        except LookupError as e:
+            return jsonify({'success': False, 'message': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
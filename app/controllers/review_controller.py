@@ -14,6 +14,11 @@ class ReviewController:
     - Admin: list all reviews by restaurant
     """
 
+    @staticmethod
+    def _page_args():
+        """Đọc tham số phân trang keyset: ?limit=20&cursor=<nextCursor>"""
+        return request.args.get('limit', type=int), request.args.get('cursor')
+
     # ===== User endpoints =====
     
     def create(self):
@@ -86,8 +91,10 @@ class ReviewController:
         """User lấy danh sách reviews của mình"""
         try:
             user_id = request.user_id
-            reviews = review_service.find_by_user_id(user_id)
-            return jsonify({'success': True, 'data': reviews}), 200
+            reviews, next_cursor = review_service.find_by_user_id(user_id, *self._page_args())
+            return jsonify({'success': True, 'data': reviews, 'nextCursor': next_cursor}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
@@ -114,8 +121,10 @@ class ReviewController:
         """User lấy danh sách đơn Completed chưa review"""
         try:
             user_id = request.user_id
-            data = review_service.get_reviewable_orders(user_id)
-            return jsonify({'success': True, 'data': data}), 200
+            data, next_cursor = review_service.get_reviewable_orders(user_id, *self._page_args())
+            return jsonify({'success': True, 'data': data, 'nextCursor': next_cursor}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
@@ -124,8 +133,10 @@ class ReviewController:
     def get_by_restaurant(self, restaurant_id: str):
         """Lấy tất cả reviews của nhà hàng (public/admin)"""
         try:
-            reviews = review_service.find_by_restaurant_id(restaurant_id)
-            return jsonify({'success': True, 'data': reviews}), 200
+            reviews, next_cursor = review_service.find_by_restaurant_id(restaurant_id, *self._page_args())
+            return jsonify({'success': True, 'data': reviews, 'nextCursor': next_cursor}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
@@ -140,8 +151,10 @@ class ReviewController:
     def get_by_food_id(self, food_id: str):
         """Lấy tất cả reviews của một món ăn (public)"""
         try:
-            reviews = review_service.find_by_food_id(food_id)
-            return jsonify({'success': True, 'data': reviews}), 200
+            reviews, next_cursor = review_service.find_by_food_id(food_id, *self._page_args())
+            return jsonify({'success': True, 'data': reviews, 'nextCursor': next_cursor}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Lỗi server: {str(e)}'}), 500
 
@@ -30,5 +30,46 @@ class Config:
     DEBUG = os.getenv('DEBUG', 'true').lower() == 'true'
     HOST = os.getenv('HOST', '127.0.0.1')
     PORT = int(os.getenv('PORT', '5000'))
+
+    # Feed đơn chờ cho shipper (SSE / long-poll): 'memory' hoặc 'changestream' (cần replica set)
+    ORDER_FEED_BACKEND = os.getenv('ORDER_FEED_BACKEND', 'memory').lower()
+
+    # Job nền đối soát isReviewed của đơn hàng với reviews (giây, 0 = tắt → sửa trực tiếp khi đọc)
+    REVIEW_RECONCILE_INTERVAL_SECONDS = int(os.getenv('REVIEW_RECONCILE_INTERVAL_SECONDS', '300'))
+
+    # Lưu trữ đơn cũ: đơn Completed/Cancelled tạo trước N ngày được chuyển sang orders_archive
+    ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '180'))
+    ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', '500'))
+    ORDER_ARCHIVE_INTERVAL_SECONDS = int(os.getenv('ORDER_ARCHIVE_INTERVAL_SECONDS', '3600'))  # 0 = tắt job nền
+
+    # Worker xử lý outbox (payment, voucher, hoàn tiền của đơn hàng): số thread, 0 = tắt
+    OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '2'))
+    OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '0.5'))
+
+    # Cache nhà hàng in-process (LRU + TTL): số nhà hàng tối đa và thời gian sống (giây, 0 = tắt)
+    RESTAURANT_CACHE_SIZE = int(os.getenv('RESTAURANT_CACHE_SIZE', '2048'))
+    RESTAURANT_CACHE_TTL_SECONDS = float(os.getenv('RESTAURANT_CACHE_TTL_SECONDS', '60'))
+
+    # Feed promotions trang chủ: cache in-process (giây) và chu kỳ đổi voucher hiển thị (giây)
+    PROMOTIONS_CACHE_TTL_SECONDS = float(os.getenv('PROMOTIONS_CACHE_TTL_SECONDS', '30'))
+    PROMOTIONS_ROTATION_SECONDS = int(os.getenv('PROMOTIONS_ROTATION_SECONDS', '300'))
+
+    # Autocomplete (index gợi ý trong RAM): chu kỳ dựng lại toàn bộ + cập nhật độ phổ biến (giây, 0 = chỉ dựng 1 lần)
+    AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', '600'))
+
+    # Thống kê thời gian giao (ETA): thời gian giữ trong RAM (giây)
+    DELIVERY_STATS_TTL_SECONDS = float(os.getenv('DELIVERY_STATS_TTL_SECONDS', '600'))
+    # Nhà hàng gần tôi: bán kính mặc định / tối đa (km)
+    NEARBY_DEFAULT_RADIUS_KM = float(os.getenv('NEARBY_DEFAULT_RADIUS_KM', '5'))
+    NEARBY_MAX_RADIUS_KM = float(os.getenv('NEARBY_MAX_RADIUS_KM', '30'))
+
+    # Conditional GET cho catalog public: độ trễ tối đa khi đọc version catalog do process khác tăng (giây)
+    # và max-age của Cache-Control (giây) cho browser/CDN
+    CATALOG_VERSION_TTL_SECONDS = float(os.getenv('CATALOG_VERSION_TTL_SECONDS', '2'))
+    CATALOG_CACHE_MAX_AGE_SECONDS = int(os.getenv('CATALOG_CACHE_MAX_AGE_SECONDS', '60'))
+
+    # Nén gzip response: kích thước body tối thiểu (bytes) và mức nén (1-9, 0 = tắt)
+    GZIP_MIN_SIZE_BYTES = int(os.getenv('GZIP_MIN_SIZE_BYTES', '1024'))
+    GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
     
 config = Config()
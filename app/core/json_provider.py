@@ -0,0 +1,61 @@
+"""
+JSON provider cho Flask dùng orjson (thay json của stdlib trong jsonify / app.json)
+
+- Encode trực tiếp ra bytes (không qua str trung gian), nhanh hơn nhiều lần với list lớn
+- Tự xử lý ObjectId, datetime/date (ISO 8601), Enum (value), UUID, Decimal, set
+  datetime naive (pymongo trả về UTC naive) được ghi kèm +00:00 → cùng thời điểm với định dạng
+  HTTP date ("..., GMT") cũ của Flask, JS new Date() không hiểu nhầm thành giờ địa phương
+  → service có thể trả thẳng giá trị từ MongoDB mà không cần str() / isoformat() trước
+- Giữ hành vi mặc định của Flask: sort_keys, compact (tự indent khi debug), mimetype
+- loads() cũng dùng orjson (request.get_json())
+"""
+
+import dataclasses
+import decimal
+from typing import Any, Union
+
+import orjson
+from bson import ObjectId
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+
+def _default(obj: Any) -> Any:
+    """Kiểu orjson không tự encode được"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider với orjson (gắn vào app: app.json = FastJSONProvider(app))"""
+
+    def _options(self, pretty: bool = False) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj: Any, pretty: bool = False) -> bytes:
+        return orjson.dumps(obj, default=_default, option=self._options(pretty))
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.dumps_bytes(obj, pretty=bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, pretty) + b'\n', mimetype=self.mimetype)
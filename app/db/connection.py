@@ -11,10 +11,15 @@ db = client[config.MONGO_DB_NAME]
 users_collection = db['users']
 restaurants_collection = db['restaurants']
 orders_collection = db['orders']
+orders_archive_collection = db['orders_archive']  # Đơn Completed/Cancelled cũ (cold) - xem jobs/order_archiver.py
 payments_collection = db['payments']
 vouchers_collection = db['vouchers']
 reviews_collection = db['reviews']
 cart_collection = db['cart']
+categories_collection = db['categories']  # Danh mục món (materialized từ menu) - xem services/category_service.py
+foods_collection = db['foods']  # 1 document / món (denormalized từ menu) - xem services/food_service.py
+outbox_collection = db['order_outbox']  # Side effect của đơn hàng chờ worker xử lý (services/outbox_service.py)
+counters_collection = db['counters']  # Bộ đếm dùng chung giữa các process (vd version catalog - services/catalog_version_service.py)
 
 def get_db():
     """Trả về database instance"""
@@ -41,6 +46,32 @@ def ping_db():
         return False
 
 
+_transactions_supported = None
+
+
+def supports_transactions() -> bool:
+    """MongoDB có hỗ trợ multi-document transaction không (replica set / sharded cluster)"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = client.admin.command('hello')
+            _transactions_supported = bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+        except Exception:
+            _transactions_supported = False
+    return _transactions_supported
+
+
+def run_in_transaction(callback):
+    """
+    Chạy callback(session) trong 1 transaction nếu deployment hỗ trợ,
+    ngược lại chạy callback(None) - phía gọi tự xử lý rollback (xem supports_transactions()).
+    """
+    if not supports_transactions():
+        return callback(None)
+    with client.start_session() as session:
+        return session.with_transaction(callback)
+
+
 # Tạo indexes (chạy 1 lần khi khởi động app)
 def init_indexes():
     """Tạo indexes cho collections"""
@@ -57,16 +88,37 @@ def init_indexes():
         
         # Index trên trường lồng nhau menu.items.name để hỗ trợ tìm món theo tên
         restaurants_collection.create_index('menu.items.name')
+
+        # Index 2dsphere trên vị trí nhà hàng (GeoJSON Point) cho $geoNear - nhà hàng gần tôi
+        restaurants_collection.create_index([('location', '2dsphere'), ('status', 1)])
         
         # Index cho orders collection
         orders_collection.create_index('userId')
         orders_collection.create_index('restaurantId')
         orders_collection.create_index('shipperId')
         orders_collection.create_index('status')
-        orders_collection.create_index([('userId', 1), ('createdAt', -1)])  # User orders sorted by date
-        orders_collection.create_index([('restaurantId', 1), ('createdAt', -1)])  # Restaurant orders
-        orders_collection.create_index([('shipperId', 1), ('createdAt', -1)])  # Shipper orders
-        orders_collection.create_index([('status', 1), ('createdAt', -1)])  # Pending orders query
+        # Compound indexes kết thúc bằng (createdAt, _id) để phục vụ keyset pagination không cần sort in-memory
+        orders_collection.create_index([('userId', 1), ('createdAt', -1), ('_id', -1)])  # User orders sorted by date
+        orders_collection.create_index([('restaurantId', 1), ('createdAt', -1), ('_id', -1)])  # Restaurant orders
+        orders_collection.create_index([('shipperId', 1), ('createdAt', -1), ('_id', -1)])  # Shipper orders
+        orders_collection.create_index([('status', 1), ('createdAt', -1), ('_id', -1)])  # Pending orders query
+        orders_collection.create_index([('createdAt', -1), ('_id', -1)])  # Admin: tất cả đơn hàng
+        # Màn "Đánh giá ngay": đơn Completed chưa review của user (query isReviewed $in [false, null])
+        orders_collection.create_index([('userId', 1), ('status', 1), ('isReviewed', 1), ('createdAt', -1), ('_id', -1)])
+        # Partial index cho feed đơn chờ của shipper: chỉ chứa đơn Pending (nhỏ, luôn nằm trong RAM)
+        orders_collection.create_index(
+            [('status', 1), ('shipperId', 1), ('createdAt', -1), ('_id', -1)],
+            name='pending_feed',
+            partialFilterExpression={'status': 'Pending'}
+        )
+
+        # Index cho orders_archive (chỉ phục vụ lịch sử / tra cứu theo _id / đơn cũ chưa đánh giá, không có query đơn đang chạy)
+        orders_archive_collection.create_index([('userId', 1), ('createdAt', -1), ('_id', -1)])
+        orders_archive_collection.create_index([('restaurantId', 1), ('createdAt', -1), ('_id', -1)])
+        orders_archive_collection.create_index([('shipperId', 1), ('createdAt', -1), ('_id', -1)])
+        orders_archive_collection.create_index([('status', 1), ('createdAt', -1), ('_id', -1)])
+        orders_archive_collection.create_index([('createdAt', -1), ('_id', -1)])
+        orders_archive_collection.create_index([('userId', 1), ('status', 1), ('isReviewed', 1), ('createdAt', -1), ('_id', -1)])  # "Đánh giá ngay"
 
         # Index cho payments collection
         payments_collection.create_index('orderId')
@@ -85,7 +137,33 @@ def init_indexes():
         reviews_collection.create_index('restaurantId')
         reviews_collection.create_index([('restaurantId', 1), ('createdAt', -1)])  # Restaurant reviews sorted
         reviews_collection.create_index([('userId', 1), ('createdAt', -1)])  # User reviews sorted
+        # Reviews theo món: lọc foodName trong query + keyset pagination (createdAt, _id)
+        reviews_collection.create_index([('restaurantId', 1), ('foodName', 1), ('createdAt', -1), ('_id', -1)])
         
+        # Index cho categories: endpoint danh mục lọc itemCount > 0 và sắp theo tên
+        categories_collection.create_index([('itemCount', 1), ('name', 1)])
+
+        # Index cho foods: lọc theo category / nhà hàng / khoảng giá / rating, kết thúc bằng _id cho keyset pagination
+        foods_collection.create_index([('rating', -1), ('_id', -1)])
+        foods_collection.create_index([('price', 1), ('_id', 1)])
+        foods_collection.create_index([('nameKey', 1), ('_id', 1)])
+        foods_collection.create_index([('categorySlug', 1), ('rating', -1), ('_id', -1)])
+        foods_collection.create_index([('categorySlug', 1), ('price', 1), ('_id', 1)])
+        foods_collection.create_index([('restaurantId', 1), ('rating', -1), ('_id', -1)])
+
+        # Inverted index cho search (gram không dấu - xem services/search_service.py)
+        foods_collection.create_index('searchGrams')
+        restaurants_collection.create_index('searchGrams')
+
+        # Index cho order_outbox: 1 event mỗi (đơn, loại) + hàng đợi theo thời điểm đến hạn
+        outbox_collection.create_index([('orderId', 1), ('type', 1)], unique=True)
+        outbox_collection.create_index([('status', 1), ('nextAttemptAt', 1)])
+        # Event đã xong tự xóa sau 7 ngày
+        outbox_collection.create_index(
+            'updatedAt', name='outbox_done_ttl', expireAfterSeconds=7 * 24 * 3600,
+            partialFilterExpression={'status': 'done'}
+        )
+
         # Index cho cart collection
         cart_collection.create_index('userId', unique=True)  # 1 cart per user
         
@@ -109,6 +109,7 @@ class Order(BaseModel):
     created_at: datetime = Field(default_factory=get_utc_now, alias="createdAt")
     updated_at: datetime = Field(default_factory=get_utc_now, alias="updatedAt")
     picked_at: Optional[datetime] = Field(default=None, alias="pickedAt", description="Thời điểm shipper nhận đơn")
+    completed_at: Optional[datetime] = Field(default=None, alias="completedAt", description="Thời điểm shipper giao xong")
 
     class Config:
         populate_by_name = True
@@ -150,6 +151,7 @@ class Order(BaseModel):
             "createdAt": self.created_at.isoformat(),
             "updatedAt": self.updated_at.isoformat(),
             "pickedAt": self.picked_at.isoformat() if self.picked_at else None,
+            "completedAt": self.completed_at.isoformat() if self.completed_at else None,
         }
 
     def to_mongo(self):
@@ -190,7 +192,126 @@ class Order(BaseModel):
             "createdAt": self.created_at,
             "updatedAt": self.updated_at,
             "pickedAt": self.picked_at,
+            "completedAt": self.completed_at,
         }
         if self.order_id:
             doc["_id"] = self.order_id
         return doc
+
+
+def _oid_str(value) -> Optional[str]:
+    """ObjectId / {"$oid": ...} / str → str (None giữ nguyên)"""
+    if value is None:
+        return None
+    if isinstance(value, dict) and '$oid' in value:
+        return value['$oid']
+    return str(value)
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    """Dữ liệu import có thể lưu ngày dạng {"$date": ...} hoặc chuỗi ISO"""
+    if value is None or isinstance(value, datetime):
+        return value
+    from utils.mongo_parser import parse_mongo_date
+    return parse_mongo_date(value)
+
+
+class OrderListView:
+    """
+    Read model rút gọn cho các API danh sách đơn (card view)
+
+    - Dựng trực tiếp từ document MongoDB đã projection (LIST_VIEW_PROJECTION),
+      không qua validate pydantic (Order + OrderSimpleResponse) vì dữ liệu lấy từ DB
+    - to_dict() trả về đúng format của OrderSimpleResponse.model_dump(by_alias=True)
+    """
+    __slots__ = (
+        'order_id', 'user_id', 'restaurant_id', 'shipper_id', 'user_fullname', 'user_phone',
+        'restaurant_name', 'restaurant_address', 'address', 'items', 'shipping_fee', 'total_amount',
+        'status', 'is_reviewed', 'refunded', 'refunded_amount', 'refund_at', 'created_at', 'updated_at',
+        'shipper_rejection_ids',
+    )
+
+    # Các field cần lấy từ MongoDB cho card view
+    PROJECTION = {
+        '_id': 1, 'userId': 1, 'restaurantId': 1, 'shipperId': 1,
+        'userFullname': 1, 'userPhone': 1, 'restaurantName': 1, 'restaurantAddress': 1,
+        'address': 1, 'items': 1, 'shipping_fee': 1, 'total_amount': 1, 'status': 1,
+        'isReviewed': 1, 'refunded': 1, 'refunded_amount': 1, 'refund_at': 1,
+        'createdAt': 1, 'updatedAt': 1, 'shipperRejections.shipperId': 1,
+    }
+
+    @property
+    def id(self):
+        return self.order_id
+
+    @property
+    def first_food_name(self) -> Optional[str]:
+        return self.items[0]['food_name'] if self.items else None
+
+    @classmethod
+    def from_mongo(cls, doc: dict) -> 'OrderListView':
+        """Dựng view từ document MongoDB (tin tưởng dữ liệu, chỉ chuẩn hóa kiểu)"""
+        view = cls.__new__(cls)
+        view.order_id = doc['_id']
+        view.user_id = doc.get('userId')
+        view.restaurant_id = doc.get('restaurantId')
+        view.shipper_id = doc.get('shipperId')
+        view.user_fullname = doc.get('userFullname')
+        view.user_phone = doc.get('userPhone')
+        view.restaurant_name = doc.get('restaurantName')
+        view.restaurant_address = doc.get('restaurantAddress')
+        view.address = doc.get('address')
+        view.items = [
+            {
+                'food_name': item.get('food_name'),
+                'quantity': int(item.get('quantity', 0)),
+                'unit_price': float(item.get('unit_price', 0)),
+                'subtotal': float(item.get('subtotal', 0)),
+            }
+            for item in doc.get('items') or []
+        ]
+        view.shipping_fee = float(doc.get('shipping_fee') or 0)
+        view.total_amount = float(doc.get('total_amount') or 0)
+        view.status = OrderStatus(doc.get('status', OrderStatus.PENDING.value))
+        view.is_reviewed = bool(doc.get('isReviewed', False))
+        view.refunded = bool(doc.get('refunded', False))
+        view.refunded_amount = float(doc.get('refunded_amount') or 0)
+        view.refund_at = _as_datetime(doc.get('refund_at'))
+        view.created_at = _as_datetime(doc.get('createdAt'))
+        view.updated_at = _as_datetime(doc.get('updatedAt'))
+        view.shipper_rejection_ids = [_oid_str(r.get('shipperId')) for r in doc.get('shipperRejections') or []]
+        return view
+
+    @classmethod
+    def from_order(cls, order: 'Order') -> 'OrderListView':
+        """Dựng view từ Order model đã có sẵn (vd: vừa tạo/cập nhật)"""
+        doc = order.to_mongo()
+        doc['_id'] = order.order_id
+        return cls.from_mongo(doc)
+
+    def to_dict(self) -> dict:
+        """Format giống OrderSimpleResponse.model_dump(by_alias=True)"""
+        return {
+            '_id': _oid_str(self.order_id),
+            'userId': _oid_str(self.user_id),
+            'restaurantId': _oid_str(self.restaurant_id),
+            'userFullname': self.user_fullname,
+            'userPhone': self.user_phone,
+            'userEmail': None,
+            'restaurantName': self.restaurant_name,
+            'restaurantAddress': self.restaurant_address,
+            'address': self.address,
+            'items': [dict(item) for item in self.items],
+            'foodName': self.first_food_name,
+            'shipping_fee': self.shipping_fee,
+            'total_amount': self.total_amount,
+            'status': self.status.value,
+            'isReviewed': self.is_reviewed,
+            'imageUrl': None,
+            'refunded': self.refunded,
+            'refunded_amount': self.refunded_amount,
+            'refund_at': self.refund_at,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'shipper': None,
+        }
@@ -1,6 +1,7 @@
 from typing import Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from .common import PyObjectId
+from utils.geo_utils import is_valid_lat_lng
 
 # 1. Class Món ăn (Cấp thấp nhất)
 class FoodMenuItem(BaseModel):
@@ -36,6 +37,40 @@ class MenuCategory(BaseModel):
             "items": [item.to_dict() for item in self.items]
         }
 
+# Vị trí nhà hàng (GeoJSON Point - index 2dsphere). Lưu ý thứ tự: [kinh độ, vĩ độ]
+class GeoPoint(BaseModel):
+    type: str = "Point"
+    coordinates: List[float]
+
+    @field_validator("type")
+    @classmethod
+    def _check_type(cls, v: str) -> str:
+        if v != "Point":
+            raise ValueError("location.type phải là 'Point'")
+        return v
+
+    @field_validator("coordinates")
+    @classmethod
+    def _check_coordinates(cls, v: List[float]) -> List[float]:
+        if len(v) != 2 or not is_valid_lat_lng(v[1], v[0]):
+            raise ValueError("location.coordinates phải là [kinh độ, vĩ độ] hợp lệ")
+        return [float(v[0]), float(v[1])]
+
+    @classmethod
+    def from_lat_lng(cls, lat: float, lng: float) -> "GeoPoint":
+        return cls(coordinates=[lng, lat])
+
+    @property
+    def lat(self) -> float:
+        return self.coordinates[1]
+
+    @property
+    def lng(self) -> float:
+        return self.coordinates[0]
+
+    def to_dict(self):
+        return {"type": self.type, "coordinates": list(self.coordinates)}
+
 # 3. Class Restaurant (Cấp cao nhất - chứa menu)
 class Restaurant(BaseModel):
     restaurant_id: Optional[PyObjectId] = Field(default=None, alias="_id")
@@ -46,6 +81,7 @@ class Restaurant(BaseModel):
     open_time: Optional[str] = Field(default=None, alias="openTime")
     close_time: Optional[str] = Field(default=None, alias="closeTime")
     map_link: Optional[str] = Field(default=None, alias="mapLink")
+    location: Optional[GeoPoint] = None
     status: bool = Field(default=True, description="Trạng thái hoạt động của nhà hàng")
     
     # Review statistics
@@ -54,6 +90,10 @@ class Restaurant(BaseModel):
     
     # Menu là list các Category
     menu: Optional[List[MenuCategory]] = Field(default_factory=list)
+    # Tăng mỗi khi menu thay đổi - dùng để invalidate các cấu trúc dẫn xuất (food index, cache)
+    menu_version: int = Field(default=0, alias="menuVersion")
+    # Tăng mỗi khi document thay đổi (bất kỳ field nào) - dùng cho cache nhà hàng
+    version: int = Field(default=0)
 
     class Config:
         populate_by_name = True
@@ -73,6 +113,7 @@ class Restaurant(BaseModel):
             "openTime": self.open_time,
             "closeTime": self.close_time,
             "mapLink": self.map_link,
+            "location": self.location.to_dict() if self.location else None,
             "status": self.status,
             "averageRating": float(self.average_rating),
             "totalReviews": int(self.total_reviews),
@@ -93,8 +134,12 @@ class Restaurant(BaseModel):
             "average_rating": float(self.average_rating),
             "total_reviews": int(self.total_reviews),
             # Lưu menu dưới dạng dict lồng nhau
-            "menu": [cat.to_dict() for cat in self.menu] if self.menu else []
+            "menu": [cat.to_dict() for cat in self.menu] if self.menu else [],
+            "menuVersion": int(self.menu_version),
+            "version": int(self.version)
         }
+        if self.location:
+            doc["location"] = self.location.to_dict()
         if self.restaurant_id:
             doc["_id"] = self.restaurant_id
         return doc
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""
+Dựng lại materialized view categories từ menu của tất cả nhà hàng đang hoạt động
+(categories được cập nhật dần sau mỗi thao tác ghi menu - chạy job này khi mới triển khai
+hoặc khi nghi ngờ bị lệch)
+
+Chạy tay (từ thư mục app):
+    python -m jobs.category_rebuild
+"""
+
+
+def run_once() -> dict:
+    """Dựng lại toàn bộ categories, trả về {'categories', 'removed'}"""
+    from services.category_service import category_service
+    return category_service.rebuild()
+
+
+if __name__ == '__main__':
+    result = run_once()
+    print(f"Rebuilt {result['categories']} categories, removed {result['removed']} stale categories")
@@ -0,0 +1,20 @@
+"""
+Dựng lại collection foods (1 document / món) từ menu của tất cả nhà hàng
+(foods được đồng bộ sau mỗi thao tác ghi nhà hàng - chạy job này khi mới triển khai
+hoặc khi nghi ngờ bị lệch)
+
+Chạy tay (từ thư mục app):
+    python -m jobs.food_rebuild
+"""
+
+
+def run_once() -> dict:
+    """Dựng lại toàn bộ foods, trả về {'restaurants', 'foods', 'removed'}"""
+    from services.food_service import food_service
+    return food_service.rebuild()
+
+
+if __name__ == '__main__':
+    result = run_once()
+    print(f"Synced {result['foods']} foods from {result['restaurants']} restaurants, "
+          f"removed {result['removed']} orphaned foods")
@@ -0,0 +1,53 @@
+"""
+Job lưu trữ đơn hàng: chuyển đơn Completed/Cancelled cũ từ orders sang orders_archive
+để collection orders (và các index của nó) chỉ còn working set đang chạy
+
+- Chạy nền trong app: main.py gọi start(), chu kỳ ORDER_ARCHIVE_INTERVAL_SECONDS (0 = tắt)
+- Chạy tay 1 lần (từ thư mục app):
+    python -m jobs.order_archiver --days 180 --batch-size 500
+"""
+import argparse
+import threading
+import time
+
+from core.config import config
+
+_thread = None
+
+
+def run_once(older_than_days: int = None, batch_size: int = None) -> int:
+    """Chạy 1 lượt lưu trữ, trả về số đơn đã chuyển"""
+    from services.order_service import order_service
+    return order_service.archive_terminal_orders(
+        older_than_days if older_than_days is not None else config.ORDER_ARCHIVE_AFTER_DAYS,
+        batch_size or config.ORDER_ARCHIVE_BATCH_SIZE,
+    )
+
+
+def _loop(interval: int) -> None:
+    while True:
+        try:
+            moved = run_once()
+            if moved:
+                print(f"[INFO] Order archiver: moved {moved} orders to orders_archive")
+        except Exception as e:
+            print(f"Order archiver error: {e}")
+        time.sleep(interval)
+
+
+def start() -> None:
+    """Khởi động thread lưu trữ nền (no-op nếu interval = 0 hoặc đã chạy)"""
+    global _thread
+    interval = config.ORDER_ARCHIVE_INTERVAL_SECONDS
+    if interval <= 0 or _thread:
+        return
+    _thread = threading.Thread(target=_loop, args=(interval,), name='order-archiver', daemon=True)
+    _thread.start()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move old Completed/Cancelled orders to orders_archive')
+    parser.add_argument('--days', type=int, default=config.ORDER_ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch-size', type=int, default=config.ORDER_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+    print(f"Moved {run_once(args.days, args.batch_size)} orders to orders_archive")
@@ -0,0 +1,50 @@
+"""
+Worker outbox: xử lý side effect của đơn hàng (tạo payment, hoàn tiền, voucher...)
+đã được ghi vào order_outbox cùng lúc với thay đổi trạng thái đơn
+
+- Chạy nền trong app: main.py gọi start(), OUTBOX_WORKERS thread (0 = tắt)
+- Nhiều process/thread chạy song song an toàn: mỗi event được claim bằng lease
+- Chạy tay tới khi hết event đến hạn (từ thư mục app):
+    python -m jobs.outbox_worker
+"""
+import threading
+import time
+
+from core.config import config
+
+_threads = []
+
+
+def run_once(max_events: int = None) -> int:
+    """Xử lý các event đến hạn, trả về số event đã xử lý"""
+    # Import order_service để đăng ký handler cho outbox
+    from services.order_service import order_service  # noqa: F401
+    from services.outbox_service import outbox_service
+    return outbox_service.drain(max_events)
+
+
+def _loop(poll_seconds: float) -> None:
+    from services.order_service import order_service  # noqa: F401
+    from services.outbox_service import outbox_service
+    while True:
+        try:
+            if outbox_service.process_one():
+                continue
+        except Exception as e:
+            print(f"Outbox worker error: {e}")
+        time.sleep(poll_seconds)
+
+
+def start() -> None:
+    """Khởi động các thread worker nền (no-op nếu OUTBOX_WORKERS = 0 hoặc đã chạy)"""
+    if config.OUTBOX_WORKERS <= 0 or _threads:
+        return
+    for i in range(config.OUTBOX_WORKERS):
+        thread = threading.Thread(target=_loop, args=(config.OUTBOX_POLL_SECONDS,),
+                                  name=f'outbox-worker-{i}', daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+if __name__ == '__main__':
+    print(f"Processed {run_once()} outbox events")
@@ -0,0 +1,30 @@
+"""
+Backfill / kiểm tra rating nhà hàng: so histogram rating_counts / rating_sum / total_reviews /
+average_rating lưu trên restaurants với reviews thực tế (rating được cộng dồn khi tạo/sửa/xóa review
+nên có thể lệch nếu có lỗi giữa chừng hoặc dữ liệu cũ chưa có rating_sum / rating_counts)
+Duyệt nhà hàng theo batch (mỗi batch 1 aggregation reviews)
+
+Chạy tay (từ thư mục app):
+    python -m jobs.rating_backfill          # Chỉ báo cáo các nhà hàng bị lệch
+    python -m jobs.rating_backfill --fix    # Ghi lại giá trị đúng
+    python -m jobs.rating_backfill --fix --batch-size 200
+"""
+import argparse
+
+
+def run_once(fix: bool = False, batch_size: int = 500) -> dict:
+    """Đối soát rating của tất cả nhà hàng, trả về báo cáo"""
+    from services.review_service import review_service
+    return review_service.recompute_restaurant_ratings(fix=fix, batch_size=batch_size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verify / repair stored restaurant ratings')
+    parser.add_argument('--fix', action='store_true', help='Write corrected values for drifted restaurants')
+    parser.add_argument('--batch-size', type=int, default=500, help='Restaurants per batch')
+    args = parser.parse_args()
+    report = run_once(args.fix, args.batch_size)
+    for item in report['details']:
+        print(f"{item['restaurantId']}: stored={item['stored']} actual={item['actual']}")
+    action = 'Fixed' if report['fixed'] else 'Found'
+    print(f"{action} {report['drifted']} drifted restaurants out of {report['checked']}")
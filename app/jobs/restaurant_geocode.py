@@ -0,0 +1,37 @@
+"""
+Điền location (GeoJSON Point) cho nhà hàng cũ từ tọa độ trong mapLink
+(nhà hàng mới / sửa mapLink đã tự điền - chạy job này 1 lần khi triển khai tính năng "nhà hàng gần tôi").
+Nhà hàng có mapLink không chứa tọa độ (link rút gọn) được liệt kê để admin nhập tay.
+
+Chạy tay (từ thư mục app):
+    python -m jobs.restaurant_geocode
+"""
+
+
+def run_once() -> dict:
+    """Trả về {'updated', 'unresolved': [tên nhà hàng không lấy được tọa độ]}"""
+    from services.restaurant_service import restaurant_service
+    from utils.geo_utils import parse_map_link
+
+    updated, unresolved = 0, []
+    for doc in restaurant_service.collection.find({'location': None}, {'name': 1, 'mapLink': 1}):
+        coordinates = parse_map_link(doc.get('mapLink'))
+        if not coordinates:
+            unresolved.append(doc.get('name'))
+            continue
+        lat, lng = coordinates
+        # Đi qua _update_and_cache để cache nhà hàng + foods (vị trí denormalized) được cập nhật
+        restaurant_service._update_and_cache(
+            str(doc['_id']), {'$set': {'location': {'type': 'Point', 'coordinates': [lng, lat]}}}
+        )
+        updated += 1
+    return {'updated': updated, 'unresolved': unresolved}
+
+
+if __name__ == '__main__':
+    result = run_once()
+    print(f"Set location for {result['updated']} restaurants")
+    if result['unresolved']:
+        print(f"No coordinates in mapLink for {len(result['unresolved'])} restaurants:")
+        for name in result['unresolved']:
+            print(f"  - {name}")
@@ -0,0 +1,46 @@
+"""
+Job đối soát isReviewed: đơn Completed đã có review nhưng cờ isReviewed chưa được bật
+(vd: ghi review thành công nhưng update order lỗi, dữ liệu cũ trước khi có cờ)
+Mỗi lượt chỉ xét các review mới từ mốc lưu trong counters (xem OrderService.reconcile_reviewed_flags)
+
+- Chạy nền trong app: main.py gọi start(), chu kỳ REVIEW_RECONCILE_INTERVAL_SECONDS (0 = tắt)
+- Chạy tay 1 lần (từ thư mục app):
+    python -m jobs.review_reconciler
+"""
+import threading
+import time
+
+from core.config import config
+
+_thread = None
+
+
+def run_once() -> int:
+    """Chạy 1 lượt đối soát, trả về số đơn đã được sửa"""
+    from services.order_service import order_service
+    return order_service.reconcile_reviewed_flags()
+
+
+def _loop(interval: int) -> None:
+    while True:
+        try:
+            fixed = run_once()
+            if fixed:
+                print(f"[INFO] Review reconciler: fixed isReviewed on {fixed} orders")
+        except Exception as e:
+            print(f"Review reconciler error: {e}")
+        time.sleep(interval)
+
+
+def start() -> None:
+    """Khởi động thread đối soát nền (no-op nếu interval = 0 hoặc đã chạy)"""
+    global _thread
+    interval = config.REVIEW_RECONCILE_INTERVAL_SECONDS
+    if interval <= 0 or _thread:
+        return
+    _thread = threading.Thread(target=_loop, args=(interval,), name='review-reconciler', daemon=True)
+    _thread.start()
+
+
+if __name__ == '__main__':
+    print(f"Fixed isReviewed on {run_once()} orders")
@@ -0,0 +1,25 @@
+"""
+Ghi lại index tìm kiếm (searchGrams) cho dữ liệu cũ:
+- restaurants: searchGrams / nameFolded theo tên nhà hàng
+- foods: dựng lại toàn bộ (document foods mang sẵn searchGrams / searchText / categoryText)
+(index được cập nhật sau mỗi thao tác ghi nhà hàng - chạy job này khi mới triển khai
+hoặc khi đổi cách sinh gram trong utils/text_utils)
+
+Chạy tay (từ thư mục app):
+    python -m jobs.search_reindex
+"""
+
+
+def run_once() -> dict:
+    """Reindex restaurants + foods, trả về {'restaurants', 'foods', 'removed'}"""
+    from services.food_service import food_service
+    from services.search_service import search_service
+    restaurants = search_service.reindex_restaurants()
+    foods = food_service.rebuild()
+    return {'restaurants': restaurants, 'foods': foods['foods'], 'removed': foods['removed']}
+
+
+if __name__ == '__main__':
+    result = run_once()
+    print(f"Reindexed {result['restaurants']} restaurants and {result['foods']} foods, "
+          f"removed {result['removed']} orphaned foods")
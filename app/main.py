@@ -15,12 +15,22 @@ from routes.review_route import review_router
 from routes.dashboard_route import dashboard_router
 from routes.cart_route import cart_router
 from db.connection import ping_db, init_indexes
+from core.json_provider import FastJSONProvider
+from middlewares.compression import init_compression
+from services.order_feed_service import order_feed_service
+from services.restaurant_service import restaurant_service
+from services.autocomplete_service import autocomplete_service
+from jobs import review_reconciler, order_archiver, outbox_worker
 
 app = Flask(__name__)
 
 # Cấu hình CORS
 CORS(app)
 
+# JSON (jsonify) qua orjson + nén gzip response lớn
+app.json = FastJSONProvider(app)
+init_compression(app)
+
 # Config
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
 
@@ -28,6 +38,21 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
 with app.app_context():
     init_indexes()
 
+# Khởi động watcher change stream cho feed đơn chờ (no-op với backend 'memory')
+order_feed_service.start()
+
+# Job nền đối soát isReviewed (để luồng đọc danh sách đơn không phải ghi DB)
+review_reconciler.start()
+
+# Job nền chuyển đơn cũ đã kết thúc sang orders_archive (giữ orders nhỏ)
+order_archiver.start()
+
+# Worker xử lý outbox: payment / hoàn tiền / voucher của đơn hàng chạy ngoài request
+outbox_worker.start()
+
+# Dựng index autocomplete trong RAM (gợi ý khi gõ tìm kiếm không đọc DB)
+autocomplete_service.start()
+
 # Register routes
 app.register_blueprint(auth_router, url_prefix='/api/auth')
 app.register_blueprint(user_router, url_prefix='/api/users')
@@ -57,7 +82,11 @@ def home():
 def health():
     return jsonify({
         'status': 'healthy' if ping_db() else 'unhealthy',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'caches': {
+            'restaurants': restaurant_service.cache_stats(),
+            'autocomplete': autocomplete_service.stats(),
+        }
     })
 
 
@@ -0,0 +1,57 @@
+# middlewares/compression.py
+"""
+Nén gzip response (after_request) cho các endpoint trả list lớn
+
+Chỉ nén khi:
+- Client chấp nhận gzip (Accept-Encoding, tôn trọng q=0)
+- Response 200 có body kiểu text/JSON, không stream (SSE) và chưa được nén
+- Body >= GZIP_MIN_SIZE_BYTES (body nhỏ: nén không lợi mà tốn CPU)
+Response nén: Content-Encoding: gzip, ETag mạnh (nếu có) chuyển thành weak (W/"...") vì bytes khác bản gốc.
+Response 304 giữ nguyên ETag: endpoint conditional GET (utils/http_cache.py) luôn dùng weak ETag cho cả
+200 và 304, nên ETag khớp với bản client đang cache dù bản đó có được nén hay không
+"""
+import gzip
+
+from flask import Flask, Response, request
+
+from core.config import config
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/javascript', 'image/svg+xml'}
+
+
+def _accepts_gzip() -> bool:
+    return request.accept_encodings.quality('gzip') > 0
+
+
+def _is_compressible(response: Response) -> bool:
+    mimetype = response.mimetype or ''
+    return mimetype in COMPRESSIBLE_MIMETYPES or (mimetype.startswith('text/') and mimetype != 'text/event-stream')
+
+
+def _weaken_etag(response: Response) -> None:
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response: Response) -> Response:
+    """after_request: nén gzip nếu đủ điều kiện"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or not _is_compressible(response)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < config.GZIP_MIN_SIZE_BYTES or not _accepts_gzip():
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=config.GZIP_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    _weaken_etag(response)
+    return response
+
+
+def init_compression(app: Flask) -> None:
+    """Đăng ký nén gzip cho app (GZIP_LEVEL = 0 → tắt)"""
+    if config.GZIP_LEVEL > 0:
+        app.after_request(compress_response)
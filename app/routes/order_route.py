@@ -15,7 +15,7 @@ def create_order():
 @order_router.route('/my_orders', methods=['GET'])
 @user_required
 def get_my_orders():
-    """GET /api/orders/my_orders - Danh sách đơn hàng của user"""
+    """GET /api/orders/my_orders?limit=20&cursor=... - Danh sách đơn hàng của user"""
     return order_controller.get_my_orders()
 
 @order_router.route('/my_orders/filter', methods=['GET'])
@@ -41,13 +41,25 @@ def user_cancel_order(order_id: str):
 @order_router.route('/shipper/pending', methods=['GET'])
 @shipper_required
 def get_pending_orders():
-    """GET /api/orders/shipper/pending - Danh sách đơn chờ (PENDING)"""
+    """GET /api/orders/shipper/pending?limit=20&cursor=... - Danh sách đơn chờ (PENDING)"""
     return order_controller.get_pending_orders()
 
+@order_router.route('/shipper/pending/stream', methods=['GET'])
+@shipper_required
+def stream_pending_orders():
+    """GET /api/orders/shipper/pending/stream - SSE đẩy sự kiện đơn chờ (hỗ trợ Last-Event-ID)"""
+    return order_controller.stream_pending_orders()
+
+@order_router.route('/shipper/pending/poll', methods=['GET'])
+@shipper_required
+def poll_pending_orders():
+    """GET /api/orders/shipper/pending/poll?since=<lastEventId>&timeout=25 - Long-poll sự kiện đơn chờ"""
+    return order_controller.poll_pending_orders()
+
 @order_router.route('/shipper/my_deliveries', methods=['GET'])
 @shipper_required
 def get_my_deliveries():
-    """GET /api/orders/shipper/my_deliveries - Danh sách đơn của shipper"""
+    """GET /api/orders/shipper/my_deliveries?limit=20&cursor=... - Danh sách đơn của shipper"""
     return order_controller.get_my_deliveries()
 
 @order_router.route('/<order_id>/accept', methods=['PUT'])
@@ -91,13 +103,13 @@ def get_deliveries_by_status():
 @order_router.route('/all', methods=['GET'])
 @admin_required
 def get_all_orders():
-    """GET /api/orders/all - Admin xem tất cả đơn hàng"""
+    """GET /api/orders/all?limit=20&cursor=... - Admin xem tất cả đơn hàng"""
     return order_controller.get_all_orders()
 
 @order_router.route('/all/filter', methods=['GET'])
 @admin_required
 def filter_all_orders():
-    """GET /api/orders/all/filter?status=Pending - Admin lọc tất cả đơn theo trạng thái"""
+    """GET /api/orders/all/filter?status=Pending&limit=20&cursor=... - Admin lọc tất cả đơn theo trạng thái"""
     return order_controller.filter_all_orders()
 
 @order_router.route('/<order_id>/admin_cancel', methods=['PUT'])
@@ -109,5 +121,5 @@ def admin_cancel_order(order_id: str):
 @order_router.route('/restaurant/<restaurant_id>', methods=['GET'])
 @admin_required
 def get_restaurant_orders(restaurant_id: str):
-    """GET /api/orders/restaurant/<restaurant_id> - Admin xem đơn hàng nhà hàng"""
+    """GET /api/orders/restaurant/<restaurant_id>?limit=20&cursor=... - Admin xem đơn hàng nhà hàng"""
     return order_controller.get_restaurant_orders(restaurant_id)
@@ -36,11 +36,23 @@ def get_food_by_id(food_id: str):
     """Lấy food item theo ID"""
     return restaurant_controller.get_food_by_id(food_id)
 
+# Nhà hàng gần tôi (public - không cần auth): ?lat=&lng=&radius=&limit=&cursor=
+@restaurant_router.route('/nearby', methods=['GET'])
+def get_nearby():
+    """Nhà hàng đang hoạt động gần vị trí người dùng, kèm khoảng cách + thời gian giao dự kiến"""
+    return restaurant_controller.get_nearby()
+
+# Gợi ý khi gõ tìm kiếm (public - không cần auth, không đọc DB)
+@restaurant_router.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """Top-k gợi ý nhà hàng / món / category theo tiền tố"""
+    return restaurant_controller.autocomplete()
+
 # Lấy chi tiết nhà hàng (public - không cần auth, chỉ nhà hàng đang hoạt động)
 @restaurant_router.route('/<restaurant_id>', methods=['GET'])
 def get_by_id_public(restaurant_id: str):
     """Public xem chi tiết nhà hàng đang hoạt động (không cần đăng nhập)"""
-    return restaurant_controller.get_by_id(restaurant_id)
+    return restaurant_controller.get_by_id_public(restaurant_id)
 
 # Lấy chi tiết nhà hàng (yêu cầu auth - cho user đã đăng nhập)
 @restaurant_router.route('/user/<restaurant_id>', methods=['GET'])
@@ -103,3 +115,34 @@ def toggle_status(restaurant_id: str):
     Body: {"status": true/false}
     """
     return restaurant_controller.toggle_status(restaurant_id)
+
+# ==================== ADMIN MENU ROUTES (từng món / category, không ghi lại cả menu) ====================
+# Thêm món - Body: {"name", "price", "category", "description"?, "image"?, "status"?}
+@restaurant_router.route('/<restaurant_id>/menu/items', methods=['POST'])
+@admin_required
+def add_menu_item(restaurant_id: str):
+    return restaurant_controller.add_menu_item(restaurant_id)
+
+# Sửa món (food_name = tên hiện tại) - Body: các field cần sửa, "category" để chuyển nhóm
+@restaurant_router.route('/<restaurant_id>/menu/items/<food_name>', methods=['PUT'])
+@admin_required
+def update_menu_item(restaurant_id: str, food_name: str):
+    return restaurant_controller.update_menu_item(restaurant_id, food_name)
+
+# Xóa món
+@restaurant_router.route('/<restaurant_id>/menu/items/<food_name>', methods=['DELETE'])
+@admin_required
+def remove_menu_item(restaurant_id: str, food_name: str):
+    return restaurant_controller.remove_menu_item(restaurant_id, food_name)
+
+# Bật/tắt món - Body: {"status": true/false}
+@restaurant_router.route('/<restaurant_id>/menu/items/<food_name>/toggle-status', methods=['PUT'])
+@admin_required
+def toggle_menu_item_status(restaurant_id: str, food_name: str):
+    return restaurant_controller.toggle_menu_item_status(restaurant_id, food_name)
+
+# Đổi vị trí category - Body: {"position": 0}
+@restaurant_router.route('/<restaurant_id>/menu/categories/<category>/position', methods=['PUT'])
+@admin_required
+def move_menu_category(restaurant_id: str, category: str):
+    return restaurant_controller.move_menu_category(restaurant_id, category)
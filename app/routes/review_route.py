@@ -40,7 +40,7 @@ def delete_review(review_id: str):
 @user_required
 def get_my_reviews():
     """
-    GET /api/reviews/user/my-reviews
+    GET /api/reviews/user/my-reviews?limit=20&cursor=...
     User lấy danh sách reviews của mình
     """
     return review_controller.my_reviews()
@@ -58,7 +58,7 @@ def check_order_reviewable(order_id: str):
 @user_required
 def get_reviewable_orders():
     """
-    GET /api/reviews/user/reviewable-orders
+    GET /api/reviews/user/reviewable-orders?limit=20&cursor=...
     Lấy danh sách đơn hàng Completed chưa được đánh giá (màn "Đánh giá ngay")
     """
     return review_controller.reviewable_orders()
@@ -79,7 +79,7 @@ def get_review_by_order(order_id: str):
 @auth_required
 def get_reviews_by_restaurant(restaurant_id: str):
     """
-    GET /api/reviews/restaurant/<restaurant_id>
+    GET /api/reviews/restaurant/<restaurant_id>?limit=20&cursor=...
     Lấy tất cả reviews của nhà hàng (yêu cầu đăng nhập)
     """
     return review_controller.get_by_restaurant(restaurant_id)
@@ -96,7 +96,7 @@ def get_restaurant_rating_stats(restaurant_id: str):
 @review_router.route('/food/<food_id>', methods=['GET'])
 def get_reviews_by_food(food_id: str):
     """
-    GET /api/reviews/food/<food_id>
+    GET /api/reviews/food/<food_id>?limit=20&cursor=...
     Lấy tất cả reviews của một món ăn (public - không cần auth)
     Format food_id: "restaurantId-foodName"
     """
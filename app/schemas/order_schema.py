@@ -108,6 +108,7 @@ class OrderResponse(BaseModel):
     cancellation_reason: Optional[str] = None
     shipper_rejections: List[ShipperRejectionResponse] = Field(default_factory=list, alias="shipperRejections")
     picked_at: Optional[datetime] = Field(None, alias="pickedAt")
+    completed_at: Optional[datetime] = Field(None, alias="completedAt")
     created_at: datetime = Field(..., alias="createdAt")
     updated_at: datetime = Field(..., alias="updatedAt")
 
@@ -141,6 +142,7 @@ class OrderResponse(BaseModel):
             "cancellation_reason": self.cancellation_reason,
             "shipperRejections": self.shipper_rejections,
             "pickedAt": self.picked_at,
+            "completedAt": self.completed_at,
             "createdAt": self.created_at,
             "updatedAt": self.updated_at,
         }
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from db.models.restaurants import FoodMenuItem, MenuCategory
+from db.models.restaurants import FoodMenuItem, MenuCategory, GeoPoint
 
 
 class AddFoodToMenuRequest(BaseModel):
@@ -47,6 +47,8 @@ class CreateRestaurantRequest(BaseModel):
     open_time: Optional[str] = Field(default=None, alias="openTime")
     close_time: Optional[str] = Field(default=None, alias="closeTime")
     map_link: Optional[str] = Field(default=None, alias="mapLink")
+    # GeoJSON Point [kinh độ, vĩ độ] - bỏ trống thì lấy từ tọa độ trong mapLink (nếu có)
+    location: Optional[GeoPoint] = None
     status: Optional[bool] = Field(default=True, description="Trạng thái hoạt động")
     
     # Input menu lồng nhau: [{category: "Pizza", items: [...]}, ...]
@@ -64,6 +66,7 @@ class UpdateRestaurantRequest(BaseModel):
     open_time: Optional[str] = Field(default=None, alias="openTime")
     close_time: Optional[str] = Field(default=None, alias="closeTime")
     map_link: Optional[str] = Field(default=None, alias="mapLink")
+    location: Optional[GeoPoint] = None
     status: Optional[bool] = None
 
     class Config:
@@ -85,6 +88,7 @@ class RestaurantSimpleResponse(BaseModel):
     open_time: Optional[str] = Field(default=None, alias="openTime")
     close_time: Optional[str] = Field(default=None, alias="closeTime")
     map_link: Optional[str] = Field(default=None, alias="mapLink")
+    location: Optional[GeoPoint] = None
     status: bool = True
     average_rating: float = Field(default=0.0, alias="averageRating")
     total_reviews: int = Field(default=0, alias="totalReviews")
@@ -0,0 +1,321 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+from typing import Optional, List, Dict, Tuple, Iterable
+
+from bson import ObjectId
+
+from core.config import config
+from db.connection import restaurants_collection, orders_collection
+from db.models.order import OrderStatus
+from utils.text_utils import fold, slugify
+from utils.timezone_utils import get_utc_now
+
+
+class AutocompleteService:
+    """
+    Autocomplete Service - Gợi ý tên nhà hàng / món / category theo tiền tố (search-as-you-type)
+
+    Index nằm hoàn toàn trong RAM, mỗi keystroke không đọc MongoDB:
+    - _entries: {(kind, key): {text, folded, weight, sources: {restaurantId: weight}}}
+      kind = restaurant (key = restaurantId) | food | category (key = tên đã bỏ dấu, gộp giữa các nhà hàng)
+    - _keys: list (sorted) các tuple (chuỗi tra cứu, kind, key); chuỗi tra cứu = text đã bỏ dấu
+      bắt đầu từ mỗi từ ("bun bo hue", "bo hue", "hue") → tra bằng bisect trong khoảng [prefix, prefix + '\\uffff')
+    - weight = độ phổ biến theo đơn hàng POPULARITY_DAYS ngày gần nhất
+      (nhà hàng: số đơn, món: tổng số lượng đã đặt, category: tổng của các món trong category)
+
+    Cập nhật:
+    - refresh_restaurant(): gọi sau mỗi thao tác ghi nhà hàng (RestaurantService._sync_catalog),
+      chỉ gỡ/ghi lại phần đóng góp của nhà hàng đó; nhà hàng được refresh trong lúc rebuild() đang dựng
+      được ghi nhận và áp lại (đọc lại DB) sau khi đổi sang index mới → không mất cập nhật
+    - Toàn bộ index (kể cả weight) dựng lại trong thread nền mỗi AUTOCOMPLETE_REFRESH_SECONDS
+      (nhận thay đổi từ process khác), request vẫn dùng index cũ trong lúc dựng
+    """
+    KINDS = ('restaurant', 'food', 'category')
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+    MIN_PREFIX_LENGTH = 1
+    POPULARITY_DAYS = 30
+    # Kết quả của tiền tố ngắn (khoảng quét lớn) được nhớ lại tới lần index đổi tiếp theo
+    MEMO_PREFIX_LENGTH = 2
+
+    RESTAURANT_PROJECTION = {'name': 1, 'status': 1, 'menu.category': 1, 'menu.items.name': 1}
+
+    def __init__(self, refresh_seconds: float = 600):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._build_lock = threading.RLock()
+        self._entries: Dict[Tuple[str, str], Dict] = {}
+        self._keys: List[Tuple[str, str, str]] = []
+        # Phần đóng góp của từng nhà hàng: {restaurantId: {(kind, key): (text, weight)}}
+        self._contributions: Dict[str, Dict[Tuple[str, str], Tuple[str, int]]] = {}
+        # Độ phổ biến lấy lúc dựng index: {restaurantId: số đơn}, {(restaurantId, tên món đã bỏ dấu): số lượng}
+        self._restaurant_orders: Dict[str, int] = {}
+        self._food_orders: Dict[Tuple[str, str], int] = {}
+        self._memo: Dict[Tuple, List[Dict]] = {}
+        self._built_at: Optional[float] = None
+        self._refreshing = False
+        # Nhà hàng được refresh_restaurant() trong lúc rebuild() đang dựng (None = không rebuild)
+        self._touched: Optional[set] = None
+
+    # ==================== Helpers ====================
+
+    @staticmethod
+    def _lookup_keys(text: str) -> List[str]:
+        """Chuỗi tra cứu của 1 text: bắt đầu từ mỗi từ ('Bún bò Huế' → 'bun bo hue', 'bo hue', 'hue')"""
+        words = fold(text).split()
+        return [' '.join(words[i:]) for i in range(len(words))]
+
+    @staticmethod
+    def _restaurant_contribution(doc: Optional[Dict], restaurant_orders: Dict[str, int],
+                                 food_orders: Dict[Tuple[str, str], int]) -> Dict[Tuple[str, str], Tuple[str, int]]:
+        """Các gợi ý 1 nhà hàng đóng góp: {(kind, key): (text, weight)} (nhà hàng bị khóa/đã xóa → rỗng)"""
+        result: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        if not doc or not doc.get('status', True):
+            return result
+        restaurant_id = str(doc['_id'])
+        name = ' '.join((doc.get('name') or '').split())
+        if name:
+            result[('restaurant', restaurant_id)] = (name, restaurant_orders.get(restaurant_id, 0))
+        for category in doc.get('menu') or []:
+            if not isinstance(category, dict):
+                continue
+            category_name = ' '.join((category.get('category') or '').split())
+            category_weight = 0
+            for item in category.get('items') or []:
+                food_name = ' '.join(((item.get('name') if isinstance(item, dict) else None) or '').split())
+                food_key = fold(food_name)
+                if not food_key:
+                    continue
+                weight = food_orders.get((restaurant_id, food_key), 0)
+                category_weight += weight
+                text, current = result.get(('food', food_key), (food_name, 0))
+                result[('food', food_key)] = (text, current + weight)
+            category_key = fold(category_name)
+            if category_key:
+                text, current = result.get(('category', category_key), (category_name, 0))
+                result[('category', category_key)] = (text, current + category_weight)
+        return result
+
+    def _index_keys(self, entry_id: Tuple[str, str], text: str, add: bool) -> None:
+        for lookup in self._lookup_keys(text):
+            key = (lookup, *entry_id)
+            if add:
+                insort(self._keys, key)
+                continue
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def _add_source(self, entry_id: Tuple[str, str], restaurant_id: str, text: str, weight: int) -> None:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            entry = self._entries[entry_id] = {'text': text, 'folded': fold(text), 'weight': 0, 'sources': {}}
+            self._index_keys(entry_id, text, add=True)
+        elif entry_id[0] == 'restaurant' and entry['text'] != text:
+            # Nhà hàng đổi tên → thay chuỗi tra cứu
+            self._index_keys(entry_id, entry['text'], add=False)
+            entry['text'], entry['folded'] = text, fold(text)
+            self._index_keys(entry_id, text, add=True)
+        entry['sources'][restaurant_id] = weight
+        entry['weight'] = sum(entry['sources'].values())
+
+    def _remove_source(self, entry_id: Tuple[str, str], restaurant_id: str) -> None:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return
+        entry['sources'].pop(restaurant_id, None)
+        if entry['sources']:
+            entry['weight'] = sum(entry['sources'].values())
+            return
+        del self._entries[entry_id]
+        self._index_keys(entry_id, entry['text'], add=False)
+
+    def _apply_restaurant(self, restaurant_id: str, contribution: Dict[Tuple[str, str], Tuple[str, int]]) -> None:
+        """Thay phần đóng góp của 1 nhà hàng (gọi khi đang giữ _lock)"""
+        previous = self._contributions.pop(restaurant_id, {})
+        for entry_id in previous:
+            if entry_id not in contribution:
+                self._remove_source(entry_id, restaurant_id)
+        for entry_id, (text, weight) in contribution.items():
+            self._add_source(entry_id, restaurant_id, text, weight)
+        if contribution:
+            self._contributions[restaurant_id] = contribution
+        self._memo.clear()
+
+    @staticmethod
+    def _to_response(kind: str, key: str, entry: Dict) -> Dict:
+        suggestion = {'type': kind, 'text': entry['text']}
+        if kind == 'restaurant':
+            suggestion['restaurantId'] = key
+        elif kind == 'category':
+            suggestion['slug'] = slugify(key)
+        return suggestion
+
+    # ==================== LAYER 1: MongoDB CRUD Operations ====================
+
+    def _load_popularity(self) -> Tuple[Dict[str, int], Dict[Tuple[str, str], int]]:
+        """Số đơn / nhà hàng và số lượng đặt / món trong POPULARITY_DAYS ngày gần nhất (2 aggregation)"""
+        match = {'$match': {
+            'createdAt': {'$gte': get_utc_now() - timedelta(days=self.POPULARITY_DAYS)},
+            'status': {'$ne': OrderStatus.CANCELLED.value},
+        }}
+        restaurant_orders = {
+            str(doc['_id']): doc['orders'] for doc in orders_collection.aggregate([
+                match, {'$group': {'_id': '$restaurantId', 'orders': {'$sum': 1}}}
+            ]) if doc['_id'] is not None
+        }
+        food_orders: Dict[Tuple[str, str], int] = {}
+        for doc in orders_collection.aggregate([
+            match,
+            {'$unwind': '$items'},
+            {'$group': {'_id': {'r': '$restaurantId', 'f': '$items.food_name'},
+                        'quantity': {'$sum': '$items.quantity'}}},
+        ]):
+            key = (str(doc['_id'].get('r')), fold(doc['_id'].get('f') or ''))
+            food_orders[key] = food_orders.get(key, 0) + int(doc.get('quantity') or 0)
+        return restaurant_orders, food_orders
+
+    # ==================== LAYER 2: Business Logic ====================
+
+    def rebuild(self, restaurant_docs: Optional[Iterable[Dict]] = None) -> Dict:
+        """Dựng lại toàn bộ index (đọc restaurants + độ phổ biến từ orders), đổi index cũ sang mới 1 lần"""
+        with self._build_lock:
+            with self._lock:
+                self._touched = set()
+            try:
+                restaurant_orders, food_orders = self._load_popularity()
+                if restaurant_docs is None:
+                    restaurant_docs = restaurants_collection.find({'status': True}, self.RESTAURANT_PROJECTION)
+                contributions = {
+                    str(doc['_id']): self._restaurant_contribution(doc, restaurant_orders, food_orders)
+                    for doc in restaurant_docs
+                }
+            except Exception:
+                with self._lock:
+                    self._touched = None
+                raise
+
+            entries: Dict[Tuple[str, str], Dict] = {}
+            for restaurant_id, contribution in contributions.items():
+                for entry_id, (text, weight) in contribution.items():
+                    entry = entries.setdefault(entry_id, {'text': text, 'folded': fold(text), 'weight': 0, 'sources': {}})
+                    entry['sources'][restaurant_id] = weight
+                    entry['weight'] += weight
+            keys = sorted(
+                (lookup, *entry_id) for entry_id, entry in entries.items() for lookup in self._lookup_keys(entry['text'])
+            )
+
+            with self._lock:
+                self._entries, self._keys = entries, keys
+                self._contributions = {rid: c for rid, c in contributions.items() if c}
+                self._restaurant_orders, self._food_orders = restaurant_orders, food_orders
+                self._memo.clear()
+                self._built_at = time.monotonic()
+                touched, self._touched = self._touched, None
+            stats = {'restaurants': len(self._contributions), 'suggestions': len(entries), 'keys': len(keys)}
+
+            # Cập nhật rơi vào khoảng giữa snapshot và lúc đổi index đã bị áp lên index cũ → áp lại
+            for restaurant_id in touched:
+                self.refresh_restaurant(restaurant_id)
+            return stats
+
+    def _ensure_fresh(self) -> None:
+        """Lần đầu: dựng index (đồng bộ). Quá hạn: dựng lại trong thread nền, vẫn trả lời bằng index cũ."""
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self.rebuild()
+            return
+        if self.refresh_seconds <= 0 or time.monotonic() - self._built_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Warning: Could not rebuild autocomplete index: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, name='autocomplete-refresh', daemon=True).start()
+
+    def start(self) -> None:
+        """Dựng index trong thread nền lúc khởi động app (keystroke đầu tiên không phải chờ)"""
+        threading.Thread(target=self._ensure_fresh, name='autocomplete-warmup', daemon=True).start()
+
+    def refresh_restaurant(self, restaurant_id, restaurant_doc: Optional[Dict] = None) -> None:
+        """
+        Cập nhật gợi ý của 1 nhà hàng (gọi sau khi tạo/sửa menu/đổi status/xóa nhà hàng)
+        restaurant_doc=None → đọc lại từ DB (không còn → gỡ hết).
+        Index chưa dựng → bỏ qua (rebuild() đang chạy sẽ áp lại sau khi dựng xong).
+        """
+        restaurant_id = str(restaurant_id)
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(restaurant_id)
+            if self._built_at is None:
+                return
+        if restaurant_doc is None:
+            restaurant_doc = restaurants_collection.find_one(
+                {'_id': ObjectId(restaurant_id)}, self.RESTAURANT_PROJECTION
+            )
+        with self._lock:
+            self._apply_restaurant(restaurant_id, self._restaurant_contribution(
+                restaurant_doc, self._restaurant_orders, self._food_orders
+            ))
+
+    def suggest(self, prefix: str, limit: Optional[int] = None, types: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Top-k gợi ý cho tiền tố (không phân biệt dấu), xếp theo độ phổ biến"""
+        limit = self.DEFAULT_LIMIT if limit is None else limit
+        if limit < 1 or limit > self.MAX_LIMIT:
+            raise ValueError(f'limit phải trong khoảng 1-{self.MAX_LIMIT}')
+        kinds = tuple(sorted(set(types))) if types else self.KINDS
+        invalid = [kind for kind in kinds if kind not in self.KINDS]
+        if invalid:
+            raise ValueError(f"types không hợp lệ (chỉ hỗ trợ: {', '.join(self.KINDS)})")
+
+        prefix = fold(prefix)
+        if len(prefix) < self.MIN_PREFIX_LENGTH:
+            return []
+        self._ensure_fresh()
+
+        memo_key = (prefix, limit, kinds)
+        with self._lock:
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+            start = bisect_left(self._keys, (prefix,))
+            end = bisect_left(self._keys, (prefix + '\uffff',), start)
+            best: Dict[Tuple[str, str], Tuple] = {}
+            for lookup, kind, key in self._keys[start:end]:
+                if kind not in kinds:
+                    continue
+                entry = self._entries[(kind, key)]
+                # Khớp từ đầu tên được ưu tiên hơn khớp từ giữa khi cùng độ phổ biến
+                rank = (-entry['weight'], lookup != entry['folded'], len(entry['text']), entry['text'])
+                if (kind, key) not in best or rank < best[(kind, key)]:
+                    best[(kind, key)] = rank
+            top = heapq.nsmallest(limit, best.items(), key=lambda x: x[1])
+            result = [self._to_response(kind, key, self._entries[(kind, key)]) for (kind, key), _ in top]
+            if len(prefix) <= self.MEMO_PREFIX_LENGTH:
+                self._memo[memo_key] = result
+            return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'suggestions': len(self._entries),
+                'keys': len(self._keys),
+                'restaurants': len(self._contributions),
+                'ageSeconds': round(time.monotonic() - self._built_at, 1) if self._built_at is not None else None,
+                'refreshSeconds': self.refresh_seconds,
+            }
+
+
+autocomplete_service = AutocompleteService(config.AUTOCOMPLETE_REFRESH_SECONDS)
@@ -111,15 +111,8 @@ class CartService:
             if not restaurant:
                 raise ValueError("Không tìm thấy nhà hàng")
             
-            # Tìm món trong menu
-            food_found = None
-            for category in restaurant.menu:
-                for food in category.items:
-                    if food.name == req.food_name:
-                        food_found = food
-                        break
-                if food_found:
-                    break
+            # Tìm món trong menu (qua food index của nhà hàng)
+            food_found = self.restaurant_service.find_food(restaurant, req.food_name)
             
             if not food_found:
                 raise ValueError(f"Không tìm thấy món '{req.food_name}' trong menu")
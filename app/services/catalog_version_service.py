@@ -0,0 +1,67 @@
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+
+from core.config import config
+from db.connection import counters_collection
+from utils.timezone_utils import get_utc_now
+
+
+class CatalogVersionService:
+    """
+    Catalog Version Service - Bộ đếm version của dữ liệu catalog public
+    (nhà hàng, menu, rating, voucher) để sinh ETag / Last-Modified cho conditional GET
+
+    - bump(): gọi SAU mỗi thao tác ghi nhà hàng/menu/review/voucher ($inc trên counters, dùng chung mọi process)
+    - current(): đọc version trong RAM; chỉ đọc lại MongoDB sau mỗi CATALOG_VERSION_TTL_SECONDS
+      → request có If-None-Match khớp được trả 304 mà không đụng MongoDB.
+      Bump trong cùng process thấy ngay, bump từ process khác thấy sau tối đa TTL giây.
+    """
+    COUNTER_ID = 'catalog'
+
+    def __init__(self, ttl_seconds: float = 2):
+        self.collection: Collection = counters_collection
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._version = 0
+        self._updated_at: Optional[datetime] = None
+        self._refreshed_at: Optional[float] = None
+
+    def _store(self, doc: Optional[dict]) -> Tuple[int, Optional[datetime]]:
+        with self._lock:
+            version = int((doc or {}).get('version', 0))
+            # Không lùi version (đọc chậm hơn 1 lần bump trong process)
+            if self._refreshed_at is None or version >= self._version:
+                self._version, self._updated_at = version, (doc or {}).get('updatedAt')
+            self._refreshed_at = time.monotonic()
+            return self._version, self._updated_at
+
+    def current(self) -> Tuple[int, Optional[datetime]]:
+        """(version, thời điểm đổi gần nhất) của catalog"""
+        with self._lock:
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.ttl_seconds:
+                return self._version, self._updated_at
+        return self._store(self.collection.find_one({'_id': self.COUNTER_ID}))
+
+    def bump(self) -> int:
+        """Tăng version catalog (gọi sau khi ghi xong, lỗi chỉ log - ETag cũ hết hạn theo max-age)"""
+        try:
+            doc = self.collection.find_one_and_update(
+                {'_id': self.COUNTER_ID},
+                {'$inc': {'version': 1}, '$set': {'updatedAt': get_utc_now().replace(microsecond=0)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return self._store(doc)[0]
+        except Exception as e:
+            print(f"Warning: Could not bump catalog version: {e}")
+            with self._lock:
+                self._refreshed_at = None
+            return self._version
+
+
+catalog_version_service = CatalogVersionService(config.CATALOG_VERSION_TTL_SECONDS)
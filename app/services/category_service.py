@@ -0,0 +1,215 @@
+import random
+from typing import Optional, List, Dict, Iterable
+
+from bson import ObjectId
+from pymongo import ReplaceOne, DeleteOne
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from db.connection import categories_collection, restaurants_collection
+from utils.text_utils import normalize_spaces, slugify
+from utils.timezone_utils import get_vietnam_now
+
+
+class CategoryService:
+    """
+    Category Service - Danh mục món ăn (materialized view của menu các nhà hàng đang hoạt động)
+
+    Mỗi document trong categories (_id = slug: ID ASCII dùng trên URL, trùng categorySlug của foods):
+    - Các tên chỉ khác dấu / hoa thường ("Phở", "Pho") gộp chung 1 category, 1 id công khai
+    - name: tên hiển thị (tên gặp đầu tiên), slug: = _id
+    - itemCount: tổng số món, images: mẫu ảnh món (tối đa IMAGE_SAMPLE_SIZE)
+    - sources: {restaurantId: {name, itemCount, images}} - phần đóng góp của từng nhà hàng,
+      để khi 1 nhà hàng đổi menu chỉ cần tính lại phần của nhà hàng đó
+
+    - Ghi: refresh_restaurant() sau mỗi thao tác ghi menu/status/xóa nhà hàng
+    - Đọc: get_categories() = 1 query trên index (itemCount, name)
+    - Sửa lệch: rebuild() (jobs/category_rebuild.py) dựng lại toàn bộ từ restaurants
+    """
+    IMAGE_SAMPLE_SIZE = 20
+    MAX_CAS_RETRIES = 5
+
+    # Ảnh mặc định theo từ khóa trong tên category (khi không có món nào có ảnh)
+    FALLBACK_IMAGES = [
+        (("phở", "pho"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070845_fcckkb.png"),
+        (("bún", "bun"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070845_fcckkb.png"),
+        (("cơm", "com"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764460831/Screenshot_2025-11-30_070009_s8hzez.png"),
+        (("đồ uống", "drink"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070905_sde2iv.png"),
+        (("bánh", "banh"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070813_ldmmy9.png"),
+        (("xôi", "xoi"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764460831/Screenshot_2025-11-30_070009_s8hzez.png"),
+        (("lẩu", "lau"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070845_fcckkb.png"),
+        (("nướng", "nuong"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_070923_miqawt.png"),
+        (("xào", "xao"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_070923_miqawt.png"),
+        (("kem",), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_071007_euepva.png"),
+    ]
+    DRINK_IMAGE = FALLBACK_IMAGES[3][1]
+    DEFAULT_IMAGE = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_070923_miqawt.png"
+
+    # Chỉ đọc các field cần để tính category từ restaurant
+    RESTAURANT_PROJECTION = {'status': 1, 'menu.category': 1, 'menu.items.image': 1}
+
+    def __init__(self):
+        self.collection: Collection = categories_collection
+
+    # ==================== Helpers ====================
+
+    def _contributions(self, restaurant_doc: Dict) -> Dict[str, Dict]:
+        """Phần đóng góp của 1 nhà hàng: {slug: {name, itemCount, images}} (nhà hàng bị khóa → rỗng)"""
+        result: Dict[str, Dict] = {}
+        if not restaurant_doc or not restaurant_doc.get('status', True):
+            return result
+        for category in restaurant_doc.get('menu') or []:
+            if not isinstance(category, dict):
+                continue
+            name = (category.get('category') or '').strip()
+            # Cùng cách tính với categorySlug của foods (food_service) → itemCount khớp với filter ?category=
+            key = slugify(normalize_spaces(name))
+            if not key:
+                continue
+            entry = result.setdefault(key, {'name': name, 'itemCount': 0, 'images': []})
+            items = category.get('items') or []
+            entry['itemCount'] += len(items)
+            for item in items:
+                image = item.get('image') if isinstance(item, dict) else None
+                if image and len(entry['images']) < self.IMAGE_SAMPLE_SIZE and image not in entry['images']:
+                    entry['images'].append(image)
+        return result
+
+    def _build_doc(self, key: str, sources: Dict[str, Dict], name: Optional[str] = None,
+                   version: int = 0) -> Dict:
+        """Tính lại các field tổng hợp của 1 category từ sources"""
+        images: List[str] = []
+        seen = set()
+        for source in sources.values():
+            for image in source.get('images', []):
+                if image not in seen and len(images) < self.IMAGE_SAMPLE_SIZE:
+                    seen.add(image)
+                    images.append(image)
+        display_name = name or next((s['name'] for s in sources.values() if s.get('name')), key)
+        return {
+            '_id': key,
+            'name': display_name,
+            'slug': key,
+            'itemCount': sum(s.get('itemCount', 0) for s in sources.values()),
+            'images': images,
+            'sources': sources,
+            'version': version,
+            'updatedAt': get_vietnam_now(),
+        }
+
+    def _fallback_image(self, name: str) -> str:
+        """Ảnh mặc định dựa trên tên hiển thị của category"""
+        key = normalize_spaces(name)
+        is_tea = "trà" in key and "trà sữa" not in key and "trà trái" not in key
+        for keywords, url in self.FALLBACK_IMAGES:
+            if any(k in key for k in keywords) or (is_tea and url == self.DRINK_IMAGE):
+                return url
+        return self.DEFAULT_IMAGE
+
+    def _to_response(self, doc: Dict, rng: random.Random) -> Dict:
+        images = doc.get('images') or []
+        return {
+            'id': doc.get('slug') or doc['_id'],
+            'name': doc.get('name') or doc['_id'],
+            'image': rng.choice(images) if images else self._fallback_image(doc.get('name') or doc['_id']),
+            'itemCount': doc.get('itemCount', 0),
+        }
+
+    # ==================== LAYER 1: MongoDB CRUD Operations ====================
+
+    def find_visible(self) -> List[Dict]:
+        """Tất cả category còn món, sắp theo tên (index (itemCount, name), không đọc sources)"""
+        return list(self.collection.find(
+            {'itemCount': {'$gt': 0}},
+            {'name': 1, 'slug': 1, 'itemCount': 1, 'images': 1}
+        ).sort('name', 1))
+
+    def _apply_source(self, key: str, restaurant_id: str, contribution: Optional[Dict]) -> None:
+        """Ghi/xóa phần đóng góp của 1 nhà hàng vào 1 category (compare-and-set theo version)"""
+        for _ in range(self.MAX_CAS_RETRIES):
+            current = self.collection.find_one({'_id': key})
+            sources = dict((current or {}).get('sources') or {})
+            if contribution:
+                sources[restaurant_id] = contribution
+            else:
+                sources.pop(restaurant_id, None)
+
+            if current is None:
+                if not sources:
+                    return
+                try:
+                    self.collection.insert_one(self._build_doc(key, sources))
+                    return
+                except DuplicateKeyError:
+                    # Nhà hàng khác vừa tạo category này → đọc lại và thử tiếp
+                    continue
+
+            version = current.get('version', 0)
+            if not sources:
+                result = self.collection.delete_one({'_id': key, 'version': version})
+                if result.deleted_count:
+                    return
+                continue
+
+            result = self.collection.replace_one(
+                {'_id': key, 'version': version},
+                self._build_doc(key, sources, current.get('name'), version + 1)
+            )
+            if result.matched_count:
+                return
+        raise ValueError(f'Không thể cập nhật category "{key}" (ghi đồng thời)')
+
+    # ==================== LAYER 2: Business Logic ====================
+
+    def get_categories(self, seed: Optional[str] = None) -> List[Dict]:
+        """Danh sách categories cho trang chủ - 1 query, mỗi category 1 ảnh random trong mẫu ảnh
+        (seed cố định → ảnh cố định, dùng khi response được cache theo ETag)"""
+        rng = random.Random(seed) if seed is not None else random.Random()
+        return [self._to_response(doc, rng) for doc in self.find_visible()]
+
+    def refresh_restaurant(self, restaurant_id, restaurant_doc: Optional[Dict] = None) -> None:
+        """
+        Tính lại phần đóng góp của 1 nhà hàng (gọi sau khi tạo/sửa menu/đổi status/xóa nhà hàng)
+        restaurant_doc=None → đọc lại từ DB (không còn → coi như đã xóa)
+        """
+        restaurant_id = str(restaurant_id)
+        if restaurant_doc is None:
+            restaurant_doc = restaurants_collection.find_one(
+                {'_id': ObjectId(restaurant_id)}, self.RESTAURANT_PROJECTION
+            )
+        contributions = self._contributions(restaurant_doc)
+
+        # Các category nhà hàng này đang đóng góp (để gỡ category đã bị xóa khỏi menu)
+        previous = {doc['_id'] for doc in self.collection.find(
+            {f'sources.{restaurant_id}': {'$exists': True}}, {'_id': 1}
+        )}
+        for key in previous | set(contributions):
+            self._apply_source(key, restaurant_id, contributions.get(key))
+
+    def rebuild(self, restaurant_docs: Optional[Iterable[Dict]] = None) -> Dict:
+        """Dựng lại toàn bộ categories từ restaurants (1 lượt đọc, 1 bulk write)"""
+        if restaurant_docs is None:
+            restaurant_docs = restaurants_collection.find({}, self.RESTAURANT_PROJECTION)
+        sources_by_key: Dict[str, Dict[str, Dict]] = {}
+        for doc in restaurant_docs:
+            for key, contribution in self._contributions(doc).items():
+                sources_by_key.setdefault(key, {})[str(doc['_id'])] = contribution
+
+        existing = {doc['_id']: doc for doc in self.collection.find({}, {'name': 1, 'version': 1})}
+        ops = [
+            ReplaceOne(
+                {'_id': key},
+                self._build_doc(key, sources, (existing.get(key) or {}).get('name'),
+                                (existing.get(key) or {}).get('version', 0) + 1),
+                upsert=True
+            )
+            for key, sources in sources_by_key.items()
+        ]
+        stale = [key for key in existing if key not in sources_by_key]
+        ops.extend(DeleteOne({'_id': key}) for key in stale)
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        return {'categories': len(sources_by_key), 'removed': len(stale)}
+
+
+category_service = CategoryService()
@@ -1,9 +1,10 @@
-from typing import List, Dict, Optional
+import itertools
+from typing import List, Dict, Optional, Iterable
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from pymongo.collection import Collection
 
-from db.connection import orders_collection, users_collection, restaurants_collection, payments_collection
+from db.connection import orders_collection, orders_archive_collection, users_collection, restaurants_collection, payments_collection
 from db.models.order import OrderStatus
 from db.models.payment import PaymentStatus
 from schemas.dashboard_schema import (
@@ -25,12 +26,37 @@ from schemas.dashboard_schema import (
 class DashboardService:
     def __init__(self):
         self.orders_collection: Collection = orders_collection
+        self.orders_archive_collection: Collection = orders_archive_collection
         self.users_collection: Collection = users_collection
         self.restaurants_collection: Collection = restaurants_collection
         self.payments_collection: Collection = payments_collection
 
     # ==================== LAYER 1: MongoDB Aggregation Operations ====================
 
+    def _find_orders(self, query: Dict, projection: Optional[Dict] = None) -> Iterable[Dict]:
+        """find trên cả orders và orders_archive (thống kê cần cả đơn cũ đã lưu trữ)"""
+        return itertools.chain(
+            self.orders_collection.find(query, projection),
+            self.orders_archive_collection.find(query, projection)
+        )
+
+    def _count_orders(self, query: Dict) -> int:
+        """count_documents trên cả orders và orders_archive"""
+        return self.orders_collection.count_documents(query) + self.orders_archive_collection.count_documents(query)
+
+    def _aggregate_orders(self, pipeline: List[Dict]) -> List[Dict]:
+        """Chạy pipeline trên orders + orders_archive bằng $unionWith
+
+        $match đầu pipeline được áp dụng cho từng collection trước khi gộp để vẫn dùng được index.
+        """
+        archive = self.orders_archive_collection.name
+        if pipeline and '$match' in pipeline[0]:
+            match = pipeline[0]
+            pipeline = [match, {'$unionWith': {'coll': archive, 'pipeline': [match]}}] + pipeline[1:]
+        else:
+            pipeline = [{'$unionWith': archive}] + pipeline
+        return list(self.orders_collection.aggregate(pipeline))
+
     def _parse_datetime(self, dt) -> Optional[datetime]:
         """Helper để parse datetime từ nhiều format"""
         if dt is None:
@@ -63,7 +89,7 @@ class DashboardService:
     def _aggregate_total_revenue(self, start_date: datetime, end_date: Optional[datetime] = None) -> float:
         """Tính tổng doanh thu trong khoảng thời gian"""
         # Query tất cả orders Completed và filter trong Python để xử lý cả datetime và string
-        all_completed = list(self.orders_collection.find({"status": OrderStatus.COMPLETED.value}))
+        all_completed = self._find_orders({"status": OrderStatus.COMPLETED.value}, {"createdAt": 1, "total_amount": 1})
         total = 0.0
         
         for order in all_completed:
@@ -77,7 +103,7 @@ class DashboardService:
     def _get_active_user_ids(self, start_date: datetime) -> List[ObjectId]:
         """Lấy danh sách user_id có hoạt động từ start_date (bao gồm cả user và shipper)"""
         # Lấy tất cả orders và filter trong Python để xử lý cả datetime và string
-        all_orders = list(self.orders_collection.find({}, {"userId": 1, "shipperId": 1, "createdAt": 1}))
+        all_orders = self._find_orders({}, {"userId": 1, "shipperId": 1, "createdAt": 1})
         user_ids = set()
         
         for order in all_orders:
@@ -112,7 +138,7 @@ class DashboardService:
     def _aggregate_revenue_by_month(self, year: int) -> Dict[int, float]:
         """Aggregate doanh thu theo từng tháng trong năm"""
         # Lấy tất cả orders Completed và filter trong Python
-        all_completed = list(self.orders_collection.find({"status": OrderStatus.COMPLETED.value}))
+        all_completed = self._find_orders({"status": OrderStatus.COMPLETED.value}, {"createdAt": 1, "total_amount": 1})
         revenue_by_month = {i: 0.0 for i in range(1, 13)}
         start_of_year = datetime(year, 1, 1)
         end_of_year = datetime(year + 1, 1, 1)
@@ -130,7 +156,7 @@ class DashboardService:
         pipeline = [
             {"$group": {"_id": "$status", "count": {"$sum": 1}}}
         ]
-        results = list(self.orders_collection.aggregate(pipeline))
+        results = self._aggregate_orders(pipeline)
         return {r["_id"]: r["count"] for r in results}
 
     def _get_recent_orders_with_user(self, limit: int) -> List[Dict]:
@@ -153,17 +179,18 @@ class DashboardService:
             },
             {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}}
         ]
+        # Đơn gần đây luôn nằm trong orders (archive chỉ chứa đơn cũ) → không cần $unionWith
         return list(self.orders_collection.aggregate(pipeline))
 
     def _aggregate_top_selling_items(self, limit: int) -> List[Dict]:
         """Aggregate món ăn bán chạy nhất (phân biệt theo nhà hàng)"""
         # Lấy tất cả orders hợp lệ và xử lý trong Python để đảm bảo logic chính xác
-        orders = list(self.orders_collection.find({
+        orders = self._find_orders({
             "status": {"$in": [OrderStatus.COMPLETED.value, OrderStatus.SHIPPING.value]},
             "items": {"$exists": True, "$ne": []},
             "restaurantId": {"$exists": True, "$ne": None},
             "restaurantName": {"$exists": True, "$ne": None, "$ne": ""}
-        }))
+        }, {"restaurantId": 1, "restaurantName": 1, "items": 1})
         
         # Dictionary để nhóm và đếm: key = (restaurantId, food_name)
         food_stats = {}
@@ -242,7 +269,7 @@ class DashboardService:
             },
             {"$unwind": {"path": "$restaurant", "preserveNullAndEmptyArrays": True}}
         ]
-        return list(self.orders_collection.aggregate(pipeline))
+        return self._aggregate_orders(pipeline)
 
     # ==================== LAYER 2: Business Logic ====================
 
@@ -411,7 +438,7 @@ class DashboardService:
             },
             {"$group": {"_id": None, "total": {"$sum": "$shipping_fee"}}}
         ]
-        result = list(self.orders_collection.aggregate(pipeline))
+        result = self._aggregate_orders(pipeline)
         return float(result[0]["total"]) if result else 0.0
 
     def _calculate_shipper_working_hours(self, shipper_id: str, start_date: datetime, end_date: Optional[datetime] = None) -> float:
@@ -425,7 +452,7 @@ class DashboardService:
             match_filter["pickedAt"]["$lt"] = end_date
         
         # Lấy tất cả đơn hoàn thành có pickedAt
-        orders = list(self.orders_collection.find(match_filter, {"pickedAt": 1, "updatedAt": 1}))
+        orders = self._find_orders(match_filter, {"pickedAt": 1, "updatedAt": 1})
         
         total_hours = 0.0
         for order in orders:
@@ -441,7 +468,7 @@ class DashboardService:
 
     def _count_shipper_today_completed_orders(self, shipper_id: str, start_of_day: datetime) -> int:
         """Đếm số đơn hoàn thành hôm nay của shipper"""
-        return self.orders_collection.count_documents({
+        return self._count_orders({
             "shipperId": ObjectId(shipper_id),
             "status": OrderStatus.COMPLETED.value,
             "updatedAt": {"$gte": start_of_day}
@@ -465,7 +492,7 @@ class DashboardService:
                 }
             }
         ]
-        result = list(self.orders_collection.aggregate(pipeline))
+        result = self._aggregate_orders(pipeline)
         if result:
             return {
                 "orders": result[0]["orders"],
@@ -484,7 +511,7 @@ class DashboardService:
             },
             {"$group": {"_id": None, "total": {"$sum": "$shipping_fee"}}}
         ]
-        result = list(self.orders_collection.aggregate(pipeline))
+        result = self._aggregate_orders(pipeline)
         return float(result[0]["total"]) if result else 0.0
 
     def _aggregate_shipper_monthly_revenue(self, shipper_id: str, year: int) -> Dict[int, Dict]:
@@ -509,7 +536,7 @@ class DashboardService:
             },
             {"$sort": {"_id": 1}}
         ]
-        results = list(self.orders_collection.aggregate(pipeline))
+        results = self._aggregate_orders(pipeline)
         return {r["_id"]: {"orders": r["orders"], "revenue": float(r["revenue"])} for r in results}
 
     # ==================== LAYER 2: Shipper Dashboard - Business Logic ====================
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from typing import Optional, List, Dict
+
+from core.config import config
+from db.connection import orders_collection
+from db.models.order import OrderStatus
+from utils.timezone_utils import get_utc_now
+
+
+class DeliveryEtaService:
+    """
+    Delivery ETA Service - Ước lượng thời gian giao hàng từ lịch sử đơn
+
+    - Dữ liệu: thời gian giao (pickedAt → completedAt của đơn Completed) của các đơn tạo trong
+      HISTORY_DAYS ngày gần nhất (không dùng updatedAt: bị ghi đè khi user đánh giá đơn)
+      Đơn hoàn thành trước khi có completedAt bị bỏ qua
+    - Mỗi nhà hàng có đủ MIN_SAMPLES đơn: dùng phân vị 25/75 của riêng nhà hàng, còn lại dùng toàn hệ thống
+    - Khoảng cách thực tế tới khách đặt cận dưới: không nhanh hơn distance / SPEED_KMH
+    - Thống kê được tính bằng 1 aggregation và giữ trong RAM DELIVERY_STATS_TTL_SECONDS giây
+    """
+    HISTORY_DAYS = 30
+    MIN_SAMPLES = 5
+    # Bỏ đơn bất thường (quên bấm hoàn thành, dữ liệu lỗi)
+    MAX_DURATION_MINUTES = 180
+    # Tốc độ xe máy trung bình trong phố (km/h)
+    SPEED_KMH = 20.0
+    # Khi chưa có lịch sử (hệ thống mới)
+    DEFAULT_RANGE = (15.0, 20.0)
+
+    def __init__(self, ttl_seconds: float = 600):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # {'global': (p25, p75) | None, 'restaurants': {restaurantId: (p25, p75)}}
+        self._stats: Optional[Dict] = None
+        self._expires_at = 0.0
+
+    # ==================== Helpers ====================
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], q: float) -> float:
+        """Phân vị q (0-1) của list đã sort (nội suy tuyến tính)"""
+        position = (len(sorted_values) - 1) * q
+        lower = int(position)
+        upper = min(lower + 1, len(sorted_values) - 1)
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+    def _range_of(self, durations: List[float]) -> Optional[tuple]:
+        if len(durations) < self.MIN_SAMPLES:
+            return None
+        durations = sorted(durations)
+        return self._percentile(durations, 0.25), self._percentile(durations, 0.75)
+
+    # ==================== LAYER 1: MongoDB CRUD Operations ====================
+
+    def _load_durations(self) -> Dict[str, List[float]]:
+        """Thời gian giao (phút) của các đơn hoàn thành gần đây, nhóm theo nhà hàng (1 aggregation)"""
+        cutoff = get_utc_now() - timedelta(days=self.HISTORY_DAYS)
+        pipeline = [
+            # (status, createdAt) dùng index (status, createdAt, _id) → chỉ đọc đơn trong cửa sổ lịch sử
+            {'$match': {
+                'status': OrderStatus.COMPLETED.value,
+                'createdAt': {'$gte': cutoff},
+                'pickedAt': {'$ne': None, '$gte': cutoff},
+                'completedAt': {'$ne': None},
+            }},
+            {'$project': {
+                'restaurantId': 1,
+                'minutes': {'$divide': [{'$subtract': ['$completedAt', '$pickedAt']}, 60000]},
+            }},
+            {'$match': {'minutes': {'$gt': 0, '$lte': self.MAX_DURATION_MINUTES}}},
+            {'$group': {'_id': '$restaurantId', 'minutes': {'$push': '$minutes'}}},
+        ]
+        return {str(doc['_id']): doc['minutes'] for doc in orders_collection.aggregate(pipeline)}
+
+    # ==================== LAYER 2: Business Logic ====================
+
+    def stats(self) -> Dict:
+        """Thống kê thời gian giao (cache trong RAM, tính lại khi hết hạn)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._stats is not None and now < self._expires_at:
+                return self._stats
+        durations = self._load_durations()
+        all_durations = [m for values in durations.values() for m in values]
+        stats = {
+            'global': self._range_of(all_durations),
+            'restaurants': {
+                rid: r for rid, r in ((rid, self._range_of(values)) for rid, values in durations.items()) if r
+            },
+        }
+        # Tag theo nội dung ETA hiển thị (đã làm tròn) - đổi khi thời gian giao dự kiến đổi
+        rounded = sorted((rid, round(r[0]), round(r[1])) for rid, r in stats['restaurants'].items())
+        global_range = tuple(round(v) for v in stats['global']) if stats['global'] else None
+        stats['tag'] = hashlib.sha1(repr((global_range, rounded)).encode()).hexdigest()[:12]
+        with self._lock:
+            self._stats, self._expires_at = stats, now + self.ttl_seconds
+        return stats
+
+    def stats_tag(self) -> str:
+        """Tag của thống kê hiện tại - đưa vào ETag của response có deliveryTime"""
+        return self.stats()['tag']
+
+    def estimate(self, restaurant_id, distance_km: Optional[float] = None) -> Dict:
+        """
+        ETA giao hàng của 1 nhà hàng: {'etaMinutes': 18, 'deliveryTime': '15-22 phút'}
+        distance_km: khoảng cách nhà hàng → khách (None nếu không biết vị trí)
+        """
+        stats = self.stats()
+        low, high = stats['restaurants'].get(str(restaurant_id)) or stats['global'] or self.DEFAULT_RANGE
+        if distance_km is not None:
+            travel = distance_km / self.SPEED_KMH * 60
+            low, high = max(low, travel), max(high, travel + 5)
+        low, high = round(low), round(high)
+        high = max(high, low + 1)
+        return {'etaMinutes': round((low + high) / 2), 'deliveryTime': f'{low}-{high} phút'}
+
+
+delivery_eta_service = DeliveryEtaService(config.DELIVERY_STATS_TTL_SECONDS)
@@ -0,0 +1,219 @@
+from typing import Optional, List, Dict, Iterable, Tuple
+
+from bson import ObjectId
+from pymongo import ReplaceOne, DeleteMany
+from pymongo.collection import Collection
+
+from db.connection import foods_collection, restaurants_collection
+from services.delivery_eta_service import delivery_eta_service
+from services.search_service import search_service
+from utils.pagination import apply_sort_cursor, normalize_limit, split_sorted_page
+from utils.geo_utils import format_distance_km, haversine_km, parse_origin
+from utils.text_utils import normalize_spaces, slugify
+
+
+class FoodService:
+    """
+    Food Service - Danh sách món ăn phẳng (1 document / món / nhà hàng đang hoạt động)
+
+    - _id = "restaurantId-foodName" (giữ nguyên format foodId cũ của API)
+    - Dữ liệu denormalized từ restaurants: tên nhà hàng, rating nhà hàng, vị trí nhà hàng
+    - Đồng bộ: sync_restaurant() sau mỗi thao tác ghi menu/status/xóa nhà hàng,
+      set_restaurant_rating() khi rating nhà hàng đổi, rebuild() (jobs/food_rebuild.py) để sửa lệch
+    - Đọc: lọc theo category/giá/nhà hàng/rating, sort + keyset pagination trên index
+      Có vị trí người dùng (lat/lng) → distance thực tế; deliveryTime ước lượng từ lịch sử giao (DeliveryEtaService)
+    """
+    # Rating hiển thị cho món của nhà hàng chưa có review
+    DEFAULT_RATING = 4.0
+
+    # sort param → (field, direction)
+    SORTS = {
+        'rating': ('rating', -1),
+        'price_asc': ('price', 1),
+        'price_desc': ('price', -1),
+        'name': ('nameKey', 1),
+    }
+    DEFAULT_SORT = 'rating'
+
+    RESTAURANT_PROJECTION = {'name': 1, 'status': 1, 'menu': 1, 'average_rating': 1, 'total_reviews': 1, 'location': 1}
+
+    def __init__(self):
+        self.collection: Collection = foods_collection
+
+    # ==================== Helpers ====================
+
+    @staticmethod
+    def food_id(restaurant_id, food_name: str) -> str:
+        return f"{restaurant_id}-{food_name}"
+
+    @classmethod
+    def restaurant_rating(cls, restaurant_doc: Dict) -> float:
+        """Rating nhà hàng dùng cho món (1 chữ số thập phân, mặc định DEFAULT_RATING)"""
+        if (restaurant_doc.get('total_reviews') or 0) <= 0:
+            return cls.DEFAULT_RATING
+        return round(restaurant_doc.get('average_rating') or 0.0, 1)
+
+    def _build_docs(self, restaurant_doc: Dict) -> List[Dict]:
+        """Các document món của 1 nhà hàng (nhà hàng bị khóa → rỗng). Món trùng tên: giữ món đầu tiên."""
+        if not restaurant_doc or not restaurant_doc.get('status', True):
+            return []
+        restaurant_id = restaurant_doc['_id']
+        rating = self.restaurant_rating(restaurant_doc)
+        docs: Dict[str, Dict] = {}
+        for category in restaurant_doc.get('menu') or []:
+            if not isinstance(category, dict):
+                continue
+            category_name = category.get('category')
+            for item in category.get('items') or []:
+                name = item.get('name') if isinstance(item, dict) else None
+                if not name:
+                    continue
+                food_id = self.food_id(restaurant_id, name)
+                if food_id in docs:
+                    continue
+                status = item.get('status')
+                docs[food_id] = {
+                    '_id': food_id,
+                    'name': name,
+                    'nameKey': normalize_spaces(name),
+                    'price': float(item.get('price') or 0.0),
+                    'description': item.get('description') or '',
+                    'imageUrl': item.get('image') or '',
+                    'category': category_name,
+                    'categorySlug': slugify(normalize_spaces(category_name)),
+                    'restaurantId': restaurant_id,
+                    'restaurantName': restaurant_doc.get('name'),
+                    'restaurantLocation': restaurant_doc.get('location'),
+                    'rating': rating,
+                    'status': status if status is not None else True,
+                    **search_service.food_fields(name, category_name),
+                }
+        return list(docs.values())
+
+    def _to_response(self, doc: Dict, origin: Optional[Tuple[float, float]] = None) -> Dict:
+        distance_km = None
+        location = doc.get('restaurantLocation')
+        if origin and location:
+            lng, lat = location['coordinates']
+            distance_km = haversine_km(origin[0], origin[1], lat, lng)
+        eta = delivery_eta_service.estimate(doc.get('restaurantId'), distance_km)
+        return {
+            'id': doc['_id'],
+            'name': doc.get('name'),
+            'price': doc.get('price', 0.0),
+            'description': doc.get('description', ''),
+            'imageUrl': doc.get('imageUrl', ''),
+            'category': doc.get('category'),
+            'restaurantId': str(doc.get('restaurantId')),
+            'restaurantName': doc.get('restaurantName'),
+            'rating': doc.get('rating', self.DEFAULT_RATING),
+            'distance': format_distance_km(distance_km) if distance_km is not None else None,
+            'deliveryTime': eta['deliveryTime'],
+            'etaMinutes': eta['etaMinutes'],
+            'status': doc.get('status', True),
+        }
+
+    # ==================== LAYER 1: MongoDB CRUD Operations ====================
+
+    def find_by_id(self, food_id: str) -> Optional[Dict]:
+        return self.collection.find_one({'_id': food_id})
+
+    def find_page(self, query: Dict, sort: str, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        field, direction = self.SORTS[sort]
+        cursor_query = self.collection.find(apply_sort_cursor(query, field, direction, cursor)).sort(
+            [(field, direction), ('_id', direction)]
+        )
+        if limit is not None:
+            cursor_query = cursor_query.limit(limit + 1)
+        return split_sorted_page(list(cursor_query), limit, field)
+
+    def _write_restaurant_docs(self, restaurant_id, docs: List[Dict]) -> None:
+        """Thay toàn bộ món của 1 nhà hàng bằng docs (upsert món hiện có, xóa món không còn)"""
+        restaurant_oid = ObjectId(str(restaurant_id))
+        ops = [ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in docs]
+        ops.append(DeleteMany({'restaurantId': restaurant_oid, '_id': {'$nin': [doc['_id'] for doc in docs]}}))
+        self.collection.bulk_write(ops, ordered=True)
+
+    # ==================== LAYER 2: Business Logic ====================
+
+    def get_foods(self, category: Optional[str] = None, restaurant_id: Optional[str] = None,
+                  min_price: Optional[float] = None, max_price: Optional[float] = None,
+                  min_rating: Optional[float] = None, sort: Optional[str] = None,
+                  limit: Optional[int] = None, cursor: Optional[str] = None,
+                  lat: Optional[float] = None, lng: Optional[float] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Danh sách món có lọc/sort/phân trang keyset
+        - category: slug (vd 'do-uong') hoặc tên category
+        - Không truyền limit/cursor: trả về toàn bộ (tương thích cũ)
+        - lat/lng: vị trí người dùng để tính distance (không truyền → distance = None)
+        """
+        origin = parse_origin(lat, lng)
+        sort = sort or self.DEFAULT_SORT
+        if sort not in self.SORTS:
+            raise ValueError(f"Tham số sort không hợp lệ (chỉ hỗ trợ: {', '.join(self.SORTS)})")
+        limit = normalize_limit(limit, cursor)
+
+        query: Dict = {}
+        if category:
+            query['categorySlug'] = slugify(normalize_spaces(category))
+        if restaurant_id:
+            try:
+                query['restaurantId'] = ObjectId(restaurant_id)
+            except Exception:
+                raise ValueError('restaurantId không hợp lệ')
+        price: Dict = {}
+        if min_price is not None:
+            price['$gte'] = float(min_price)
+        if max_price is not None:
+            price['$lte'] = float(max_price)
+        if price:
+            query['price'] = price
+        if min_rating is not None:
+            query['rating'] = {'$gte': float(min_rating)}
+
+        docs, next_cursor = self.find_page(query, sort, limit, cursor)
+        return [self._to_response(doc, origin) for doc in docs], next_cursor
+
+    def get_food_by_id(self, food_id: str, lat: Optional[float] = None,
+                       lng: Optional[float] = None) -> Optional[Dict]:
+        """Lấy món theo foodId ("restaurantId-foodName") - 1 point lookup"""
+        origin = parse_origin(lat, lng)
+        doc = self.find_by_id(food_id)
+        return self._to_response(doc, origin) if doc else None
+
+    def sync_restaurant(self, restaurant_id, restaurant_doc: Optional[Dict] = None) -> None:
+        """
+        Đồng bộ món của 1 nhà hàng (gọi sau khi tạo/sửa menu/đổi status/xóa nhà hàng)
+        restaurant_doc=None → đọc lại từ DB (không còn → xóa hết món)
+        """
+        if restaurant_doc is None:
+            restaurant_doc = restaurants_collection.find_one(
+                {'_id': ObjectId(str(restaurant_id))}, self.RESTAURANT_PROJECTION
+            )
+        self._write_restaurant_docs(restaurant_id, self._build_docs(restaurant_doc))
+
+    def set_restaurant_rating(self, restaurant_id, restaurant_doc: Dict) -> None:
+        """Cập nhật rating denormalized trên các món khi rating nhà hàng đổi"""
+        self.collection.update_many(
+            {'restaurantId': ObjectId(str(restaurant_id))},
+            {'$set': {'rating': self.restaurant_rating(restaurant_doc)}}
+        )
+
+    def rebuild(self, restaurant_docs: Optional[Iterable[Dict]] = None) -> Dict:
+        """Dựng lại toàn bộ foods từ restaurants"""
+        if restaurant_docs is None:
+            restaurant_docs = restaurants_collection.find({}, self.RESTAURANT_PROJECTION)
+        restaurants, foods = 0, 0
+        restaurant_ids = []
+        for doc in restaurant_docs:
+            docs = self._build_docs(doc)
+            self._write_restaurant_docs(doc['_id'], docs)
+            restaurant_ids.append(doc['_id'])
+            restaurants += 1
+            foods += len(docs)
+        # Món của nhà hàng đã bị xóa
+        removed = self.collection.delete_many({'restaurantId': {'$nin': restaurant_ids}}).deleted_count
+        return {'restaurants': restaurants, 'foods': foods, 'removed': removed}
+
+
+food_service = FoodService()
@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Optional, List, Dict, Iterator
+
+from core.config import config
+from db.connection import orders_collection
+from db.models.order import OrderStatus, OrderListView
+
+
+class OrderFeedEvent:
+    """Các loại sự kiện của feed đơn chờ (shipper)"""
+    NEW_PENDING_ORDER = 'new_pending_order'  # Đơn mới / đơn bị shipper trả lại → có thể nhận
+    ORDER_TAKEN = 'order_taken'  # Đã có shipper nhận → gỡ khỏi danh sách
+    ORDER_CANCELLED = 'order_cancelled'  # Đơn bị hủy → gỡ khỏi danh sách
+
+
+class OrderFeedService:
+    """
+    Order Feed Service - Pub/sub in-process đẩy sự kiện đơn chờ cho shipper (SSE / long-poll)
+
+    - Sự kiện được lưu vào ring buffer có số thứ tự tăng dần
+    - Event id gửi cho client = "<epoch>-<số thứ tự>", epoch sinh ngẫu nhiên mỗi lần process khởi động
+      (số thứ tự chỉ nằm trong RAM, đếm lại từ 0 khi restart / khác nhau giữa các worker)
+    - Mỗi client (SSE hoặc long-poll) tự giữ lastEventId và đọc các sự kiện sau nó
+    - Client nhận sự kiện 'resync' và cần gọi lại GET /api/orders/shipper/pending khi lastEventId:
+      đã bị đẩy ra khỏi buffer, thuộc epoch khác (process đã restart / load balancer chuyển worker),
+      lớn hơn id mới nhất hoặc không đúng định dạng
+
+    Backend (ORDER_FEED_BACKEND):
+    - 'memory': OrderService gọi publish() trực tiếp (1 process / môi trường local)
+    - 'changestream': 1 thread đọc MongoDB change stream của orders (cần replica set),
+      bắt được cả thay đổi từ các process khác; publish() từ service sẽ bị bỏ qua
+    """
+    BUFFER_SIZE = 1000
+    HEARTBEAT_SECONDS = 15
+    # Client long-poll vừa poll trong khoảng này vẫn tính là đang nghe (đang giữa 2 lần poll)
+    POLL_GRACE_SECONDS = 60
+
+    def __init__(self, backend: str = 'memory'):
+        self.backend = backend
+        self._events: deque = deque(maxlen=self.BUFFER_SIZE)
+        self.epoch = uuid.uuid4().hex[:8]
+        self._last_id = 0
+        self._subscribers = 0
+        self._last_poll_at = 0.0
+        self._cond = threading.Condition()
+        self._watcher: Optional[threading.Thread] = None
+
+    # ==================== Publish ====================
+
+    def has_subscribers(self) -> bool:
+        """Có client nào đang nghe không (để bỏ qua việc build payload khi không cần)"""
+        return self._subscribers > 0 or time.monotonic() - self._last_poll_at < self.POLL_GRACE_SECONDS
+
+    def publish(self, event_type: str, order_id: str, order: Optional[Dict] = None,
+                rejected_shipper_ids: Optional[List[str]] = None) -> None:
+        """Gọi từ OrderService khi đơn thay đổi (chỉ có tác dụng với backend 'memory')"""
+        if self.backend != 'memory':
+            return
+        self._append(event_type, order_id, order, rejected_shipper_ids)
+
+    def _append(self, event_type: str, order_id: str, order: Optional[Dict],
+                rejected_shipper_ids: Optional[List[str]]) -> None:
+        with self._cond:
+            self._last_id += 1
+            self._events.append({
+                'id': self._last_id,
+                'type': event_type,
+                'orderId': order_id,
+                'order': order,
+                # Không gửi cho shipper đã từ chối đơn này
+                '_rejected': set(rejected_shipper_ids or []),
+            })
+            self._cond.notify_all()
+
+    # ==================== Subscribe ====================
+
+    @property
+    def last_event_id(self) -> str:
+        return self._format_event_id(self._last_id)
+
+    def _format_event_id(self, seq: int) -> str:
+        return f'{self.epoch}-{seq}'
+
+    def _resolve_since(self, since: Optional[str]) -> Optional[int]:
+        """
+        lastEventId của client → số thứ tự trong process này
+        Không truyền → id mới nhất (chỉ nhận sự kiện từ bây giờ); id của epoch khác / sai định dạng → None (resync)
+        """
+        if since is None:
+            return self._last_id
+        epoch, _, seq = str(since).rpartition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _events_after(self, since: Optional[int], shipper_id: str) -> Optional[List[Dict]]:
+        """Các sự kiện có số thứ tự > since dành cho shipper. None (cần resync) nếu since không dùng được."""
+        if since is None or since > self._last_id:
+            return None
+        if self._events and since < self._events[0]['id'] - 1:
+            return None
+        return [
+            {**{k: v for k, v in e.items() if k != '_rejected'}, 'id': self._format_event_id(e['id'])}
+            for e in self._events
+            if e['id'] > since and shipper_id not in e['_rejected']
+        ]
+
+    def wait_for_events(self, shipper_id: str, since: Optional[str], timeout: float) -> Dict:
+        """Long-poll: chờ tối đa timeout giây cho tới khi có sự kiện mới sau since (lastEventId)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._subscribers += 1
+            try:
+                since_seq = self._resolve_since(since)
+                while True:
+                    events = self._events_after(since_seq, shipper_id)
+                    if events is None:
+                        return {'resync': True, 'events': [], 'lastEventId': self.last_event_id}
+                    remaining = deadline - time.monotonic()
+                    if events or remaining <= 0:
+                        return {'resync': False, 'events': events, 'lastEventId': self.last_event_id}
+                    self._cond.wait(remaining)
+            finally:
+                self._subscribers -= 1
+                self._last_poll_at = time.monotonic()
+
+    def stream(self, shipper_id: str, since: Optional[str] = None) -> Iterator[str]:
+        """SSE: generator trả về các chunk 'text/event-stream' (có heartbeat để giữ kết nối)"""
+        with self._cond:
+            self._subscribers += 1
+            since = self._resolve_since(since)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                with self._cond:
+                    events = self._events_after(since, shipper_id)
+                    if events == []:
+                        self._cond.wait(self.HEARTBEAT_SECONDS)
+                        events = self._events_after(since, shipper_id)
+                    current_id = self._last_id
+
+                since = current_id
+                if events is None:
+                    yield f'id: {self._format_event_id(current_id)}\nevent: resync\ndata: {{}}\n\n'
+                    continue
+                if not events:
+                    # Heartbeat (comment) để proxy không cắt kết nối
+                    yield ': keep-alive\n\n'
+                    continue
+                # events là tất cả sự kiện tới current_id (đọc trong cùng lock) → lần sau đọc tiếp từ current_id
+                for event in events:
+                    yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    # ==================== Change stream backend ====================
+
+    def start(self) -> None:
+        """Khởi động watcher change stream (chỉ với backend 'changestream')"""
+        if self.backend != 'changestream' or self._watcher:
+            return
+        self._watcher = threading.Thread(target=self._watch_orders, name='order-feed-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch_orders(self) -> None:
+        """Đọc change stream của orders, chuyển insert/đổi status thành sự kiện feed"""
+        from services.order_service import order_service
+
+        pipeline = [{'$match': {'$or': [
+            {'operationType': 'insert'},
+            {'operationType': 'update', 'updateDescription.updatedFields.status': {'$exists': True}},
+        ]}}]
+        resume_token = None
+        while True:
+            try:
+                with orders_collection.watch(pipeline, full_document='updateLookup',
+                                             resume_after=resume_token) as change_stream:
+                    for change in change_stream:
+                        resume_token = change_stream.resume_token
+                        doc = change.get('fullDocument')
+                        if not doc:
+                            continue
+                        self._handle_change(order_service, doc)
+            except Exception as e:
+                print(f"Order feed change stream error: {e}")
+                time.sleep(5)
+
+    def _handle_change(self, order_service, doc: Dict) -> None:
+        order_id = str(doc['_id'])
+        status = doc.get('status')
+        if status == OrderStatus.PENDING.value and not doc.get('shipperId'):
+            view = OrderListView.from_mongo(doc)
+            payload = order_service._to_simple_response(view) if self.has_subscribers() else None
+            self._append(OrderFeedEvent.NEW_PENDING_ORDER, order_id, payload, view.shipper_rejection_ids)
+        elif status == OrderStatus.SHIPPING.value:
+            self._append(OrderFeedEvent.ORDER_TAKEN, order_id, None, None)
+        elif status == OrderStatus.CANCELLED.value:
+            self._append(OrderFeedEvent.ORDER_CANCELLED, order_id, None, None)
+
+
+order_feed_service = OrderFeedService(backend=config.ORDER_FEED_BACKEND)
@@ -1,28 +1,55 @@
-from typing import Optional, List, Dict
-from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Union
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument, ReplaceOne, DeleteOne
 from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
 
-from db.connection import orders_collection
-from db.models.order import Order, OrderItem, OrderStatus
+from core.config import config
+from db.connection import (
+    orders_collection, orders_archive_collection, reviews_collection, counters_collection,
+    run_in_transaction, supports_transactions
+)
+from db.models.order import Order, OrderItem, OrderStatus, OrderListView
 from db.models.payment import PaymentMethod, PaymentStatus
 from services.voucher_service import voucher_service
 from services.payment_service import payment_service
+from services.order_feed_service import order_feed_service, OrderFeedEvent
+from services.outbox_service import outbox_service, OutboxEvent
 from utils.mongo_parser import parse_mongo_document
-from utils.timezone_utils import get_vietnam_now
+from utils.timezone_utils import get_vietnam_now, get_utc_now, to_utc
+from utils.stage_timer import StageTimer
+from utils.pagination import KEYSET_SORT, apply_cursor, normalize_limit, split_page
 from schemas.order_schema import (
     CreateOrderRequest,
     UpdateOrderStatusRequest,
     CancelOrderRequest,
     AssignShipperRequest,
     OrderResponse,
-    OrderSimpleResponse,
 )
 
 
+class OrderConflictError(ValueError):
+    """Đơn hàng đã đổi trạng thái trước khi thao tác được áp dụng (thua race, ví dụ shipper khác đã nhận)"""
+    pass
+
+
+class _WriteSkipped(Exception):
+    """Precondition của thay đổi không còn đúng → hủy luôn outbox event đi kèm"""
+    pass
+
+
 class OrderService:
+    # Chỉ đơn đã kết thúc mới được chuyển sang orders_archive
+    ARCHIVABLE_STATUSES = (OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value)
+    # Mốc đối soát isReviewed (_id review cuối đã xét) trong counters, dùng chung mọi process
+    RECONCILE_COUNTER_ID = 'review_reconcile'
+    # Quét lùi lại từ mốc: review có _id (sinh phía client) nhỏ hơn mốc nhưng insert muộn / lệch giờ giữa các server
+    RECONCILE_OVERLAP = timedelta(minutes=10)
+
     def __init__(self, restaurant_service=None, user_service=None):
         self.collection: Collection = orders_collection
+        self.archive_collection: Collection = orders_archive_collection
         # Import here to avoid circular dependency
         if restaurant_service is None:
             from services.restaurant_service import restaurant_service as rs
@@ -36,6 +63,11 @@ class OrderService:
         else:
             self.user_service = user_service
 
+        # Side effect (payment, voucher, hoàn tiền) chạy qua outbox worker, không chạy trong request
+        outbox_service.register(OutboxEvent.ORDER_CREATED, self._on_order_created)
+        outbox_service.register(OutboxEvent.ORDER_CANCELLED, self._on_order_cancelled)
+        outbox_service.register(OutboxEvent.ORDER_COMPLETED, self._on_order_completed)
+
     # ==================== Helpers ====================
     def _to_model(self, doc: dict) -> Order:
         """Convert MongoDB doc to Order model"""
@@ -43,74 +75,82 @@ class OrderService:
         doc = parse_mongo_document(doc)
         return Order(**doc)
 
-    def _to_simple_response(self, order: Order) -> Dict:
-        """Convert Order model to simple response dict"""
-        data = order.to_dict()
-        
-        # Thêm foodName (tên món đầu tiên) để frontend hiển thị
-        if order.items and len(order.items) > 0:
-            data['foodName'] = order.items[0].food_name
-        
+    def _to_simple_responses(self, orders: List[Union[Order, OrderListView]]) -> List[Dict]:
+        """Convert danh sách đơn sang simple response - Batch lookup
+
+        Thu thập restaurantId/userId/shipperId của cả trang rồi lấy bằng 1 query $in
+        cho mỗi collection, thay vì 2-3 query cho mỗi đơn.
+        Nhận OrderListView (từ find_page) hoặc Order (đơn vừa tạo/cập nhật).
+        """
+        if not orders:
+            return []
+
+        views = [o if isinstance(o, OrderListView) else OrderListView.from_order(o) for o in orders]
+
+        # Batch lookup: Thu thập tất cả IDs cần query
+        restaurant_ids = set()
+        user_ids = set()
+        for view in views:
+            if view.items:
+                restaurant_ids.add(view.restaurant_id)
+            if view.user_id:
+                user_ids.add(view.user_id)
+            if view.shipper_id:
+                user_ids.add(view.shipper_id)
+
+        # Batch query restaurants (1 query thay vì N queries)
+        restaurant_cache = {}
+        try:
+            for r in self.restaurant_service.find_by_ids(list(restaurant_ids)):
+                restaurant_cache[str(r.id)] = r
+        except Exception as e:
+            print(f"Error batch loading restaurants for orders: {e}")
+
+        # Batch query users + shippers (1 query thay vì N queries)
+        user_cache = {}
+        try:
+            for u in self.user_service.find_by_ids(list(user_ids)):
+                user_cache[str(u.id)] = u
+        except Exception as e:
+            print(f"Error batch loading users for orders: {e}")
+
+        return [self._build_simple_response(view, restaurant_cache, user_cache) for view in views]
+
+    def _build_simple_response(self, view: OrderListView, restaurant_cache: Dict, user_cache: Dict) -> Dict:
+        """Build simple response cho 1 đơn từ dữ liệu đã batch lookup (format OrderSimpleResponse)"""
+        data = view.to_dict()
+
         # Thêm imageUrl từ món ăn đầu tiên trong order
         try:
-            if order.items and len(order.items) > 0:
-                first_food_name = order.items[0].food_name
-                # Lấy hình ảnh từ restaurant menu
-                restaurant = self.restaurant_service.find_by_id(str(order.restaurant_id))
-                if restaurant and restaurant.menu:
-                    # Normalize food name for comparison (remove extra spaces, lowercase)
-                    normalized_order_name = first_food_name.lower().strip()
-                    
-                    for category in restaurant.menu:
-                        for food_item in category.items:
-                            # Normalize menu item name for comparison
-                            normalized_menu_name = food_item.name.lower().strip()
-                            
-                            # Exact match or contains match
-                            if normalized_menu_name == normalized_order_name or normalized_order_name in normalized_menu_name or normalized_menu_name in normalized_order_name:
-                                # Get image from food_item
-                                food_image = None
-                                if hasattr(food_item, 'image') and food_item.image:
-                                    food_image = food_item.image
-                                elif hasattr(food_item, 'imageUrl') and food_item.imageUrl:
-                                    food_image = food_item.imageUrl
-                                
-                                if food_image:
-                                    data['imageUrl'] = food_image
-                                    break
-                        if 'imageUrl' in data:
-                            break
+            if view.items:
+                restaurant = restaurant_cache.get(str(view.restaurant_id))
+                food_image = self.restaurant_service.find_food_image(restaurant, view.first_food_name)
+                if food_image:
+                    data['imageUrl'] = food_image
         except Exception as e:
             # Log error for debugging but don't fail the response
-            print(f"Error getting image for order {order.order_id}: {e}")
-            pass
-        
+            print(f"Error getting image for order {view.order_id}: {e}")
+
         # Bổ sung thông tin user (email) - để shipper có thể liên hệ
-        try:
-            if order.user_id:
-                user = self.user_service.find_by_id(str(order.user_id))
-                if user:
-                    data['userEmail'] = user.email
-        except Exception:
-            # Không chặn response nếu lấy user info lỗi
-            pass
-        
+        user = user_cache.get(str(view.user_id)) if view.user_id else None
+        if user:
+            data['userEmail'] = user.email
+
         # Bổ sung thông tin shipper (nếu có) - giống như _to_full_response
-        try:
-            if order.shipper_id:
-                shipper = self.user_service.find_by_id(str(order.shipper_id))
-                if shipper:
-                    data['shipper'] = {
-                        'shipperId': str(order.shipper_id),
-                        'fullname': shipper.fullname,
-                        'phone_number': shipper.phone_number,
-                        'email': shipper.email
-                    }
-        except Exception:
-            # Không chặn response nếu lấy shipper info lỗi
-            pass
-        
-        return OrderSimpleResponse(**data).model_dump(by_alias=True)
+        shipper = user_cache.get(str(view.shipper_id)) if view.shipper_id else None
+        if shipper:
+            data['shipper'] = {
+                'shipperId': str(view.shipper_id),
+                'fullname': shipper.fullname,
+                'phone_number': shipper.phone_number,
+                'email': shipper.email
+            }
+
+        return data
+
+    def _to_simple_response(self, order: Union[Order, OrderListView]) -> Dict:
+        """Convert 1 đơn sang simple response dict"""
+        return self._to_simple_responses([order])[0]
 
     def _to_full_response(self, order: Order) -> Dict:
         """Convert Order model to full response dict + shipper details if available"""
@@ -135,9 +175,11 @@ class OrderService:
     # ==================== LAYER 1: MongoDB CRUD Operations ====================
 
     def find_by_id(self, order_id: str) -> Optional[Order]:
-        """Tìm đơn hàng theo ID"""
+        """Tìm đơn hàng theo ID - không có trong orders thì tìm tiếp trong orders_archive"""
         try:
             doc = self.collection.find_one({'_id': ObjectId(order_id)})
+            if not doc:
+                doc = self.archive_collection.find_one({'_id': ObjectId(order_id)})
             return self._to_model(doc) if doc else None
         except Exception as e:
             print(f"Error finding order by id: {e}")
@@ -214,121 +256,52 @@ class OrderService:
                 continue
         return result
 
-    def create_order_in_db(self, req: CreateOrderRequest, user_id: str) -> Optional[Order]:
-        """Tạo đơn hàng mới - Lấy giá từ DB, lưu thông tin denormalized cho shipper"""
-        try:
-            # Kiểm tra items không trống
-            if not req.items or len(req.items) == 0:
-                raise ValueError('Đơn hàng phải có ít nhất 1 món')
-            
-            # ===== Lấy thông tin User (fullname, phone) =====
-            user = self.user_service.find_by_id(user_id)
-            if not user:
-                raise ValueError(f'Không tìm thấy user {user_id}')
-            
-            user_fullname = user.fullname or "Unknown"
-            user_phone = user.phone_number or "Unknown"
-            
-            # ===== Lấy thông tin Restaurant (name, address, hotline) =====
-            restaurant = self.restaurant_service.find_by_id(req.restaurant_id)
-            if not restaurant:
-                raise ValueError(f'Không tìm thấy nhà hàng {req.restaurant_id}')
-            
-            restaurant_name = restaurant.restaurant_name
-            restaurant_address = restaurant.address or "Unknown"
-            restaurant_hotline = restaurant.hotline
-            
-            # ===== Build price map từ menu (Tối ưu: Tránh N+1 query) =====
-            price_map = {}  # {food_name_lower: price}
-            for category in restaurant.menu:
-                for food_item in category.items:
-                    price_map[food_item.name.lower()] = float(food_item.price)
-            
-            # ===== Lấy giá từ price_map (O(1) lookup thay vì N queries) =====
-            items_list: List[OrderItem] = []
-            subtotal = 0
-            
-            for item_req in req.items:
-                # Lookup giá từ price_map (đã build sẵn)
-                food_name_lower = item_req.food_name.lower()
-                if food_name_lower not in price_map:
-                    raise ValueError(f'Món "{item_req.food_name}" không có trong menu nhà hàng')
-                
-                unit_price = price_map[food_name_lower]
-                item_subtotal = item_req.quantity * unit_price
-                
-                item = OrderItem(
-                    food_name=item_req.food_name,
-                    quantity=item_req.quantity,
-                    unit_price=unit_price,  # Từ DB, không phải frontend
-                    subtotal=item_subtotal
-                )
-                items_list.append(item)
-                subtotal += item_subtotal
-            
-            # Áp dụng voucher (nếu có) để tính discount server-side
-            discount = 0.0
-            if req.promo_id:
-                try:
-                    preview_result = voucher_service.preview_discount(
-                        user_id=user_id,
-                        restaurant_id=req.restaurant_id,
-                        subtotal=subtotal,
-                        shipping_fee=req.shipping_fee,
-                        promo_id=req.promo_id
-                    )
-                    discount = preview_result['discount']
-                    print(f"[DEBUG] Voucher applied - promo_id: {req.promo_id}, discount: {discount}, subtotal: {subtotal}, shipping_fee: {req.shipping_fee}")
-                except Exception as e:
-                    print(f"[ERROR] Failed to apply voucher {req.promo_id}: {str(e)}")
-                    raise ValueError(f'Không thể áp dụng voucher: {str(e)}')
+    def _may_be_archived(self, status: Optional[str]) -> bool:
+        """Query theo status này có thể trúng đơn đã lưu trữ không"""
+        return status is None or status in self.ARCHIVABLE_STATUSES
 
-            # Tính total_amount
-            total_amount = subtotal + req.shipping_fee - discount
-            print(f"[DEBUG] Order calculation - subtotal: {subtotal}, shipping_fee: {req.shipping_fee}, discount: {discount}, total_amount: {total_amount}")
-            
-            # ===== Tạo Order object với denormalized data =====
-            order = Order(
-                user_id=ObjectId(user_id),
-                restaurant_id=ObjectId(req.restaurant_id),
-                user_fullname=user_fullname,  # Denormalized
-                user_phone=user_phone,  # Denormalized
-                restaurant_name=restaurant_name,  # Denormalized
-                restaurant_address=restaurant_address,  # Denormalized
-                restaurant_hotline=restaurant_hotline,  # Denormalized
-                items=items_list,
-                address=req.address,
-                note=req.note,
-                subtotal=subtotal,
-                shipping_fee=req.shipping_fee,
-                discount=discount,
-                total_amount=total_amount,
-                promo_id=ObjectId(req.promo_id) if req.promo_id else None,
-                payment_method=req.payment_method,
-                status=OrderStatus.PENDING,
-                created_at=get_vietnam_now(),
-                updated_at=get_vietnam_now(),
-            )
-            
-            # Insert vào MongoDB
-            order_doc = order.to_mongo()
-            print(f"[DEBUG] Saving order to MongoDB - discount: {order_doc.get('discount')}, total_amount: {order_doc.get('total_amount')}, promoId: {order_doc.get('promoId')}")
-            insert_result = self.collection.insert_one(order_doc)
-            created = self.find_by_id(str(insert_result.inserted_id))
-            
-            # Verify the order was saved correctly
-            if created:
-                print(f"[DEBUG] Order created successfully - ID: {created.id}, discount: {created.discount}, total_amount: {created.total_amount}, promoId: {created.promo_id}")
-            else:
-                print(f"[ERROR] Failed to retrieve created order")
-            
-            # NOTE: Không mark voucher ở đây để tránh mất voucher khi payment fail
-            # Voucher sẽ được mark trong create_order() sau khi payment thành công
-            
-            return created
-        except Exception as e:
-            print(f"Error creating order: {e}")
-            raise ValueError(f'Lỗi DB khi tạo đơn hàng: {str(e)}')
+    def _find_page_docs(self, collection: Collection, query: Dict, limit: Optional[int],
+                        cursor: Optional[str]) -> List[Dict]:
+        db_cursor = collection.find(apply_cursor(query, cursor), OrderListView.PROJECTION).sort(KEYSET_SORT)
+        if limit is not None:
+            # Lấy dư 1 document để biết còn trang tiếp theo hay không
+            db_cursor = db_cursor.limit(limit + 1)
+        return list(db_cursor)
+
+    def find_page(self, query: Dict, limit: Optional[int] = None, cursor: Optional[str] = None,
+                  include_archive: bool = False) -> Tuple[List[OrderListView], Optional[str]]:
+        """Lấy 1 trang đơn hàng (card view) theo keyset (createdAt, _id) - Trả về (orders, nextCursor)
+
+        Không truyền limit/cursor thì trả về toàn bộ kết quả (nextCursor = None).
+        Chỉ lấy các field của OrderListView.PROJECTION, không dựng Order model đầy đủ.
+        include_archive: gộp thêm orders_archive (lịch sử) - mỗi collection lấy limit + 1
+        rồi merge theo (createdAt, _id), nên cursor vẫn dùng chung cho cả 2.
+        """
+        limit = normalize_limit(limit, cursor)
+        docs = self._find_page_docs(self.collection, query, limit, cursor)
+        if include_archive:
+            # Đơn đang được chuyển kho có thể nằm ở cả 2 collection → ưu tiên bản ở orders
+            hot_ids = {doc['_id'] for doc in docs}
+            docs += [doc for doc in self._find_page_docs(self.archive_collection, query, limit, cursor)
+                     if doc['_id'] not in hot_ids]
+            docs.sort(key=lambda d: (d['createdAt'], d['_id']), reverse=True)
+            if limit is not None:
+                docs = docs[:limit + 1]
+
+        docs, next_cursor = split_page(docs, limit)
+        result = []
+        for doc in docs:
+            try:
+                result.append(OrderListView.from_mongo(doc))
+            except Exception as e:
+                # Log error nhưng tiếp tục với document tiếp theo
+                print(f"Error parsing order {doc.get('_id', 'unknown')}: {e}")
+        return result, next_cursor
+
+    def create_order_in_db(self, order: Order, session=None) -> Order:
+        """Insert đơn hàng (đã cấp sẵn _id, paymentId) - không đọc lại từ DB"""
+        self.collection.insert_one(order.to_mongo(), session=session)
+        return order
 
     def update_order_status_in_db(self, order_id: str, new_status: str, shipper_id: Optional[str] = None) -> Optional[Order]:
         """Update trạng thái đơn hàng"""
@@ -351,109 +324,322 @@ class OrderService:
         except Exception as e:
             raise ValueError(f'Lỗi DB khi cập nhật trạng thái: {str(e)}')
 
-    def cancel_order_in_db(self, order_id: str, cancelled_by: str, reason: Optional[str] = None) -> Optional[Order]:
-        """Hủy đơn hàng"""
-        try:
-            update_data = {
+    def cancel_order_in_db(self, order_id: str, cancelled_by: str, reason: Optional[str] = None,
+                           precondition: Optional[Dict] = None, session=None) -> Optional[Order]:
+        """Hủy đơn hàng (chỉ khi thỏa precondition) - None nếu không hủy được"""
+        return self.transition_in_db(
+            order_id,
+            precondition or {},
+            {'$set': {
                 'status': OrderStatus.CANCELLED.value,
                 'cancelled_by': cancelled_by,
                 'cancellation_reason': reason,
                 'updatedAt': get_vietnam_now()
-            }
-            
-            result = self.collection.update_one(
-                {'_id': ObjectId(order_id)},
-                {'$set': update_data}
+            }},
+            session=session
+        )
+
+    def find_reviewed_order_ids(self, order_ids: List[ObjectId]) -> set:
+        """Trong các order_ids, trả về tập những đơn đã có review (1 query $in)"""
+        if not order_ids:
+            return set()
+        cursor = reviews_collection.find({'orderId': {'$in': order_ids}}, {'orderId': 1})
+        return {doc['orderId'] for doc in cursor}
+
+    def mark_reviewed_in_db(self, order_ids: List[ObjectId]) -> int:
+        """Đánh dấu isReviewed = True cho nhiều đơn (1 lệnh trên orders + 1 lệnh trên orders_archive)"""
+        if not order_ids:
+            return 0
+        query = {'_id': {'$in': order_ids}, 'isReviewed': {'$ne': True}}
+        update = {'$set': {'isReviewed': True}}
+        return (self.collection.update_many(query, update).modified_count
+                + self.archive_collection.update_many(query, update).modified_count)
+
+    def transition_in_db(self, order_id: str, precondition: Dict, update: Dict, session=None) -> Optional[Order]:
+        """Compare-and-set: cập nhật đơn CHỈ KHI thỏa precondition, trả về document mới (1 round trip)
+
+        Trả về None nếu không có đơn nào thỏa điều kiện (không tồn tại hoặc đã đổi trạng thái).
+        """
+        doc = self.collection.find_one_and_update(
+            {'_id': ObjectId(order_id), **precondition},
+            update,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        return self._to_model(doc) if doc else None
+
+    def _raise_transition_failed(self, order_id: str, explain) -> None:
+        """Chỉ chạy khi CAS thất bại: đọc lại đơn để trả lỗi rõ ràng
+
+        explain(order) trả về message mô tả lý do precondition không còn đúng.
+        """
+        current = self.find_by_id(order_id)
+        if not current:
+            raise ValueError('Không tìm thấy đơn hàng')
+        raise OrderConflictError(explain(current))
+
+    def _write_with_event(self, write, event_type: str, order_id: str) -> Optional[Order]:
+        """Ghi thay đổi của đơn + outbox event trong 1 transaction (nếu deployment hỗ trợ)
+
+        write(session) trả về None khi precondition không còn đúng → event bị hủy theo.
+        Event đã tồn tại trong transaction (request khác vừa chuyển trạng thái) → cũng trả về None.
+        Không có transaction: event được ghi trước, ghi đơn thất bại thì xóa đúng event vừa ghi
+        (theo _id - không đụng event của request thắng; event sót lại chỉ là no-op vì handler
+        luôn kiểm tra lại trạng thái đơn).
+        """
+        inserted = {'event_id': None}
+
+        def callback(session):
+            inserted['event_id'] = outbox_service.add(event_type, order_id, session=session)
+            updated = write(session)
+            if updated is None:
+                raise _WriteSkipped()
+            return updated
+
+        try:
+            return run_in_transaction(callback)
+        except (_WriteSkipped, DuplicateKeyError):
+            if not supports_transactions():
+                outbox_service.discard(inserted['event_id'])
+            return None
+        except Exception:
+            if not supports_transactions():
+                outbox_service.discard(inserted['event_id'])
+            raise
+
+    def _publish_new_pending(self, order: Order) -> None:
+        """Đẩy sự kiện đơn chờ mới cho shipper (payload chỉ build khi có client đang nghe)"""
+        try:
+            payload = self._to_simple_response(order) if order_feed_service.has_subscribers() else None
+            order_feed_service.publish(
+                OrderFeedEvent.NEW_PENDING_ORDER,
+                str(order.id),
+                payload,
+                rejected_shipper_ids=[str(r.shipper_id) for r in order.shipper_rejections]
             )
-            
-            return self.find_by_id(order_id) if result.matched_count > 0 else None
         except Exception as e:
-            raise ValueError(f'Lỗi DB khi hủy đơn hàng: {str(e)}')
+            # Không chặn luồng chính nếu đẩy sự kiện lỗi
+            print(f"Warning: Could not publish order feed event: {e}")
 
     # ==================== LAYER 2: Business Logic ====================
 
-    def create_order(self, req: CreateOrderRequest, user_id: str) -> Dict:
-        """Tạo đơn hàng mới (User flow) - Giá từ DB, xử lý thanh toán theo phương thức"""
-        created = None
-        try:
-            # Kiểm tra items không trống
-            if not req.items or len(req.items) == 0:
-                raise ValueError('Đơn hàng phải có ít nhất 1 món')
-            
-            # BƯỚC 1: Tạo order (giá sẽ được lấy từ DB bên trong create_order_in_db)
-            created = self.create_order_in_db(req, user_id)
-            if not created:
-                raise ValueError('Không thể tạo đơn hàng')
-
-            # BƯỚC 2: Tạo payment và xử lý thanh toán theo phương thức
-            payment_status = PaymentStatus.PENDING
-            payment = None
-            try:
-                print(f"[DEBUG] Payment method: {req.payment_method}")
-                
-                # CHỈ TRỪ BALANCE KHI PAYMENT METHOD LÀ BALANCE
-                if req.payment_method == PaymentMethod.BALANCE:
-                    # Kiểm tra và trừ số dư
-                    print(f"[DEBUG] Deducting balance - user_id: {user_id}, amount: {created.total_amount}, order_id: {created.id}")
-                    self.user_service.deduct_balance(user_id, created.total_amount)
-                    payment_status = PaymentStatus.PAID
-                    print(f"[DEBUG] Balance deducted successfully")
-                elif req.payment_method == PaymentMethod.COD:
-                    # COD: Không trừ balance, payment_status = PENDING
-                    print(f"[DEBUG] COD payment - No balance deduction")
-                    payment_status = PaymentStatus.PENDING
-                else:
-                    print(f"[WARNING] Unknown payment method: {req.payment_method}")
-                    payment_status = PaymentStatus.PENDING
+    def build_order(self, req: CreateOrderRequest, user_id: str) -> Order:
+        """Dựng Order từ request (chưa ghi DB) - Lấy giá từ DB, lưu thông tin denormalized cho shipper
 
-                payment = payment_service.create_payment(
-                    order_id=str(created.id),
-                    user_id=user_id,
-                    amount=created.total_amount,
-                    method=req.payment_method,
-                    status=payment_status
-                )
+        _id và paymentId được cấp trước để insert order + payment không cần đọc lại.
+        """
+        # Kiểm tra items không trống
+        if not req.items or len(req.items) == 0:
+            raise ValueError('Đơn hàng phải có ít nhất 1 món')
+
+        # ===== Lấy thông tin User (fullname, phone) =====
+        user = self.user_service.find_by_id(user_id)
+        if not user:
+            raise ValueError(f'Không tìm thấy user {user_id}')
+
+        # ===== Lấy thông tin Restaurant (name, address, hotline) =====
+        restaurant = self.restaurant_service.find_by_id(req.restaurant_id)
+        if not restaurant:
+            raise ValueError(f'Không tìm thấy nhà hàng {req.restaurant_id}')
 
-                # Gắn paymentId vào order
-                self.collection.update_one(
-                    {'_id': ObjectId(str(created.id))},
-                    {'$set': {'paymentId': payment.id}}
+        # ===== Lấy giá từ food index của nhà hàng (O(1) lookup, build 1 lần mỗi menuVersion) =====
+        items_list: List[OrderItem] = []
+        subtotal = 0
+
+        for item_req in req.items:
+            food = self.restaurant_service.find_food(restaurant, item_req.food_name)
+            if not food:
+                raise ValueError(f'Món "{item_req.food_name}" không có trong menu nhà hàng')
+
+            unit_price = food.price
+            item_subtotal = item_req.quantity * unit_price
+            items_list.append(OrderItem(
+                food_name=item_req.food_name,
+                quantity=item_req.quantity,
+                unit_price=unit_price,  # Từ DB, không phải frontend
+                subtotal=item_subtotal
+            ))
+            subtotal += item_subtotal
+
+        # Áp dụng voucher (nếu có) để tính discount server-side
+        discount = 0.0
+        if req.promo_id:
+            try:
+                preview_result = voucher_service.preview_discount(
+                    user_id=user_id,
+                    restaurant_id=req.restaurant_id,
+                    subtotal=subtotal,
+                    shipping_fee=req.shipping_fee,
+                    promo_id=req.promo_id
                 )
-                
-                # ✅ CHỈ mark voucher SAU KHI payment thành công
-                # Đảm bảo nếu payment fail, voucher không bị mất
-                if req.promo_id:
-                    try:
-                        voucher_service.mark_voucher_used(req.promo_id, user_id)
-                    except Exception as e:
-                        print(f"Warning: Could not mark voucher as used: {e}")
-                        # Không chặn flow nếu mark voucher fail (đơn hàng vẫn thành công)
+                discount = preview_result['discount']
             except Exception as e:
-                # ROLLBACK: Xóa payment (nếu có) và order
-                if payment and payment.id:
-                    try:
-                        payment_service.delete_payment(str(payment.id))
-                    except:
-                        pass
-                if created:
-                    try:
-                        self.collection.delete_one({'_id': ObjectId(str(created.id))})
-                    except:
-                        pass
-                raise ValueError(f'Thanh toán thất bại: {str(e)}')
-            
-            return self._to_full_response(created)
+                print(f"[ERROR] Failed to apply voucher {req.promo_id}: {str(e)}")
+                raise ValueError(f'Không thể áp dụng voucher: {str(e)}')
+
+        # Tính total_amount
+        total_amount = subtotal + req.shipping_fee - discount
+        print(f"[DEBUG] Order calculation - subtotal: {subtotal}, shipping_fee: {req.shipping_fee}, discount: {discount}, total_amount: {total_amount}")
+
+        # Báo lỗi sớm (trước khi ghi gì) nếu số dư chắc chắn không đủ
+        if req.payment_method == PaymentMethod.BALANCE and user.balance < total_amount:
+            raise ValueError('Thanh toán thất bại: Số dư tài khoản không đủ để thanh toán đơn hàng')
+
+        # MongoDB lưu datetime tới millisecond → cắt trước để response khớp với DB
+        now = get_vietnam_now()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+        return Order(
+            order_id=ObjectId(),
+            payment_id=ObjectId(),
+            user_id=ObjectId(user_id),
+            restaurant_id=ObjectId(req.restaurant_id),
+            user_fullname=user.fullname or "Unknown",  # Denormalized
+            user_phone=user.phone_number or "Unknown",  # Denormalized
+            restaurant_name=restaurant.restaurant_name,  # Denormalized
+            restaurant_address=restaurant.address or "Unknown",  # Denormalized
+            restaurant_hotline=restaurant.hotline,  # Denormalized
+            items=items_list,
+            address=req.address,
+            note=req.note,
+            subtotal=subtotal,
+            shipping_fee=req.shipping_fee,
+            discount=discount,
+            total_amount=total_amount,
+            promo_id=ObjectId(req.promo_id) if req.promo_id else None,
+            payment_method=req.payment_method,
+            status=OrderStatus.PENDING,
+            created_at=now,
+            updated_at=now,
+        )
+
+    def create_order(self, req: CreateOrderRequest, user_id: str) -> Dict:
+        """Tạo đơn hàng mới (User flow) - Giá từ DB, xử lý thanh toán theo phương thức
+
+        Pipeline checkout (đo thời gian từng stage, log dạng [TIMING] checkout ...):
+        1. prepare: đọc user, nhà hàng, voucher → dựng Order với _id/paymentId cấp trước
+        2. write: insert order (đã có paymentId) → trừ số dư (BALANCE) → outbox event order.created
+           - Replica set: chạy trong 1 transaction, lỗi thì MongoDB tự rollback
+           - Standalone: lỗi thì tự xóa các bản ghi đã ghi và hoàn lại số dư
+        3. publish / response: không đọc lại đơn vừa tạo
+        Tạo payment + đánh dấu voucher do outbox worker làm (_on_order_created), không nằm trong request.
+        """
+        timer = StageTimer('checkout')
+        transactional = supports_transactions()
+        try:
+            with timer.stage('prepare'):
+                order = self.build_order(req, user_id)
+
+            # CHỈ TRỪ BALANCE KHI PAYMENT METHOD LÀ BALANCE (trừ ngay để không nhận đơn khi thiếu tiền)
+            pay_by_balance = req.payment_method == PaymentMethod.BALANCE
+            written = {'order': False, 'balance': False, 'event': None}
+
+            def write(session):
+                self.create_order_in_db(order, session)
+                written['order'] = True
+                if pay_by_balance:
+                    if not self.user_service.deduct_balance_in_db(user_id, order.total_amount, session):
+                        raise ValueError('Số dư tài khoản không đủ để thanh toán đơn hàng')
+                    written['balance'] = True
+                written['event'] = outbox_service.add(OutboxEvent.ORDER_CREATED, order.id, session=session)
+
+            with timer.stage('write'):
+                try:
+                    run_in_transaction(write)
+                except Exception as e:
+                    if not transactional:
+                        self._rollback_checkout(order, user_id, written)
+                    raise ValueError(f'Thanh toán thất bại: {str(e)}')
+
+            with timer.stage('publish'):
+                self._publish_new_pending(order)
+
+            with timer.stage('response'):
+                response = self._to_full_response(order)
+
+            timer.log(order_id=order.id, method=req.payment_method.value, transaction=transactional)
+            return response
         except ValueError:
+            timer.log(status='failed')
             raise
         except Exception as e:
-            # Nếu có lỗi khác và đã tạo order, cũng rollback
-            if created:
-                try:
-                    self.collection.delete_one({'_id': ObjectId(str(created.id))})
-                except:
-                    pass  # Ignore rollback error
+            timer.log(status='failed')
             raise ValueError(f'Lỗi khi tạo đơn hàng: {str(e)}')
 
+    def _rollback_checkout(self, order: Order, user_id: str, written: Dict) -> None:
+        """Hoàn tác các bước checkout đã ghi (chỉ dùng khi MongoDB không hỗ trợ transaction)"""
+        if written['event']:
+            try:
+                outbox_service.discard(written['event'])
+            except Exception as e:
+                print(f"Warning: Rollback outbox event failed: {e}")
+        if written['balance']:
+            try:
+                self.user_service.credit_balance(user_id, order.total_amount)
+            except Exception as e:
+                print(f"Warning: Rollback balance failed: {e}")
+        if written['order']:
+            try:
+                self.collection.delete_one({'_id': order.id})
+            except Exception as e:
+                print(f"Warning: Rollback order failed: {e}")
+
+    def reconcile_reviewed_flags(self, batch_size: int = 500) -> int:
+        """Job đối soát: đánh dấu isReviewed cho các đơn đã có review nhưng cờ chưa bật
+
+        Quét các review MỚI theo _id từ mốc lưu trong counters (lùi RECONCILE_OVERLAP), không quét lại
+        toàn bộ đơn chưa đánh giá: cờ chỉ lệch khi ghi review xong mà update đơn lỗi, nên mỗi review
+        chỉ cần xét 1 lần (lần chạy đầu tiên xét toàn bộ reviews - dữ liệu cũ trước khi có cờ).
+        Mỗi batch: 1 find reviews (index _id) + update_many theo _id đơn, rồi lưu mốc.
+        Returns: số đơn đã được sửa
+        """
+        state = counters_collection.find_one({'_id': self.RECONCILE_COUNTER_ID}) or {}
+        last_id = state.get('lastReviewId')
+        if last_id is not None:
+            last_id = ObjectId.from_datetime(last_id.generation_time - self.RECONCILE_OVERLAP)
+        fixed = 0
+        while True:
+            query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+            docs = list(reviews_collection.find(query, {'orderId': 1}).sort('_id', 1).limit(batch_size))
+            if not docs:
+                return fixed
+            fixed += self.mark_reviewed_in_db([doc['orderId'] for doc in docs if doc.get('orderId')])
+            last_id = docs[-1]['_id']
+            counters_collection.update_one(
+                {'_id': self.RECONCILE_COUNTER_ID}, {'$max': {'lastReviewId': last_id}}, upsert=True
+            )
+
+    def archive_terminal_orders(self, older_than_days: int, batch_size: int = 500) -> int:
+        """Chuyển đơn Completed/Cancelled tạo trước older_than_days ngày sang orders_archive
+
+        Mỗi batch: copy sang archive bằng ReplaceOne upsert (chạy lại không tạo bản trùng),
+        rồi xóa khỏi orders với điều kiện document chưa đổi (updatedAt, isReviewed như lúc copy).
+        Dừng giữa chừng thì lần chạy sau tự làm tiếp: đơn còn trong orders luôn là bản chính.
+        Returns: số đơn đã chuyển
+        """
+        cutoff = get_vietnam_now() - timedelta(days=older_than_days)
+        query = {'status': {'$in': list(self.ARCHIVABLE_STATUSES)}, 'createdAt': {'$lt': cutoff}}
+        skipped: List[ObjectId] = []
+        moved = 0
+        while True:
+            batch_query = dict(query, _id={'$nin': skipped}) if skipped else query
+            docs = list(self.collection.find(batch_query).sort(KEYSET_SORT).limit(batch_size))
+            if not docs:
+                return moved
+
+            self.archive_collection.bulk_write(
+                [ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in docs], ordered=False
+            )
+            result = self.collection.bulk_write([
+                DeleteOne({'_id': doc['_id'], 'updatedAt': doc.get('updatedAt'), 'isReviewed': doc.get('isReviewed')})
+                for doc in docs
+            ], ordered=False)
+            moved += result.deleted_count
+            if result.deleted_count < len(docs):
+                # Đơn vừa bị cập nhật trong lúc copy → để lần chạy sau copy lại bản mới
+                still_hot = self.collection.find({'_id': {'$in': [doc['_id'] for doc in docs]}}, {'_id': 1})
+                skipped.extend(d['_id'] for d in still_hot)
+
     def get_order_by_id(self, order_id: str) -> Dict:
         """Lấy chi tiết đơn hàng"""
         order = self.find_by_id(order_id)
@@ -462,31 +648,29 @@ class OrderService:
         
         return self._to_full_response(order)
 
-    def get_user_orders(self, user_id: str) -> List[Dict]:
-        """Lấy danh sách đơn hàng của user - tự động sync isReviewed từ reviews collection"""
+    def get_user_orders(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Lấy danh sách đơn hàng của user - isReviewed được đối chiếu với reviews collection
+
+        - 1 query $in cho các đơn Completed chưa đánh dấu review trong trang (không phải 1 query/đơn)
+        - Khi job đối soát nền đang chạy (REVIEW_RECONCILE_INTERVAL_SECONDS > 0) thì chỉ sửa response,
+          việc ghi lại DB để job làm; ngược lại sửa DB bằng 1 lệnh update_many
+
+        Returns: (orders, nextCursor) - phân trang keyset theo index (userId, createdAt)
+        """
         try:
-            from db.connection import reviews_collection
-            
-            orders = self.find_by_user_id(user_id)
-            result = []
-            
-            for order in orders:
-                order_dict = self._to_simple_response(order)
-                
-                # Sync isReviewed: kiểm tra xem order đã có review chưa
-                if order.status.value == 'Completed' and not order.is_reviewed:
-                    existing_review = reviews_collection.find_one({'orderId': order.id})
-                    if existing_review:
-                        # Cập nhật DB và response
-                        self.collection.update_one(
-                            {'_id': order.id},
-                            {'$set': {'isReviewed': True}}
-                        )
+            orders, next_cursor = self.find_page({'userId': ObjectId(user_id)}, limit, cursor, include_archive=True)
+            result = self._to_simple_responses(orders)
+
+            candidates = [o.id for o in orders if o.status == OrderStatus.COMPLETED and not o.is_reviewed]
+            reviewed = self.find_reviewed_order_ids(candidates)
+            if reviewed:
+                for order, order_dict in zip(orders, result):
+                    if order.id in reviewed:
                         order_dict['isReviewed'] = True
-                
-                result.append(order_dict)
-            
-            return result
+                if config.REVIEW_RECONCILE_INTERVAL_SECONDS <= 0:
+                    self.mark_reviewed_in_db(list(reviewed))
+
+            return result, next_cursor
         except Exception as e:
             raise ValueError(f'Lỗi khi lấy danh sách đơn: {str(e)}')
 
@@ -498,197 +682,95 @@ class OrderService:
             if status not in valid_statuses:
                 raise ValueError(f'Trạng thái không hợp lệ. Các giá trị hợp lệ: {', '.join(valid_statuses)}')
             
-            orders = []
-            for doc in self.collection.find({'userId': ObjectId(user_id), 'status': status}).sort('createdAt', -1):
-                orders.append(self._to_model(doc))
-            
-            return [self._to_simple_response(o) for o in orders]
+            query = {'userId': ObjectId(user_id), 'status': status}
+            orders, _ = self.find_page(query, include_archive=self._may_be_archived(status))
+            return self._to_simple_responses(orders)
         except ValueError:
             raise
         except Exception as e:
             raise ValueError(f'Lỗi khi lấy đơn hàng theo trạng thái: {str(e)}')
 
-    def get_restaurant_orders(self, restaurant_id: str) -> List[Dict]:
-        """Lấy đơn hàng cho nhà hàng"""
+    def get_restaurant_orders(self, restaurant_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Lấy đơn hàng cho nhà hàng - Returns: (orders, nextCursor)"""
         try:
-            orders = self.find_by_restaurant_id(restaurant_id)
-            return [self._to_simple_response(o) for o in orders]
+            orders, next_cursor = self.find_page({'restaurantId': ObjectId(restaurant_id)}, limit, cursor, include_archive=True)
+            return self._to_simple_responses(orders), next_cursor
         except Exception as e:
             raise ValueError(f'Lỗi khi lấy đơn hàng nhà hàng: {str(e)}')
 
-    def get_pending_orders(self, shipper_id: str) -> List[Dict]:
+    def get_pending_orders(self, shipper_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
         """Lấy đơn hàng đang chờ (PENDING) - cho Shipper xem
         
         Chỉ trả về những đơn:
         - Status = PENDING
         - Chưa có shipperId (chưa có ai nhận) hoặc shipperId is null
         - Shipper này chưa từ chối (không có trong shipperRejections với shipperId này)
+
+        Returns: (orders, nextCursor)
         """
         try:
-            shipper_object_id = ObjectId(shipper_id)
-            
-            # Tìm tất cả đơn PENDING và chưa có shipper nhận
-            # MongoDB: shipperId có thể là null hoặc không tồn tại
+            # Lọc ngay trong DB (dùng partial index pending_feed):
+            # - shipperId: None khớp cả null lẫn không tồn tại
+            # - shipperRejections.shipperId $ne: bỏ các đơn shipper này đã từ chối
             query = {
                 'status': OrderStatus.PENDING.value,
-                '$or': [
-                    {'shipperId': None},
-                    {'shipperId': {'$exists': False}}
-                ]
+                'shipperId': None,
+                'shipperRejections.shipperId': {'$ne': ObjectId(shipper_id)}
             }
             
-            orders = []
-            for doc in self.collection.find(query).sort('createdAt', -1):
-                order = self._to_model(doc)
-                
-                # Kiểm tra shipper này đã từ chối đơn này chưa
-                has_declined = False
-                if order.shipper_rejections:
-                    for rejection in order.shipper_rejections:
-                        if rejection.shipper_id == shipper_object_id:
-                            has_declined = True
-                            break
-                
-                # Chỉ thêm vào danh sách nếu shipper này chưa từ chối
-                if not has_declined:
-                    orders.append(order)
-            
-            return [self._to_simple_response(o) for o in orders]
+            orders, next_cursor = self.find_page(query, limit, cursor)
+            return self._to_simple_responses(orders), next_cursor
         except Exception as e:
             raise ValueError(f'Lỗi khi lấy đơn chờ: {str(e)}')
 
-    def get_shipper_orders(self, shipper_id: str) -> List[Dict]:
-        """Lấy đơn hàng của shipper"""
+    def get_shipper_orders(self, shipper_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Lấy đơn hàng của shipper - Returns: (orders, nextCursor)"""
         try:
-            orders = self.find_by_shipper_id(shipper_id)
-            return [self._to_simple_response(o) for o in orders]
+            if not shipper_id:
+                return [], None
+            orders, next_cursor = self.find_page({'shipperId': ObjectId(shipper_id)}, limit, cursor, include_archive=True)
+            return self._to_simple_responses(orders), next_cursor
         except Exception as e:
             raise ValueError(f'Lỗi khi lấy đơn của shipper: {str(e)}')
 
-    def get_all_orders(self) -> List[Dict]:
-        """Lấy tất cả đơn (Admin only) - Optimized với batch lookup"""
+    def get_all_orders(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Lấy tất cả đơn (Admin only) - Optimized với batch lookup
+
+        Returns: (orders, nextCursor) - phân trang keyset theo (createdAt, _id)
+        """
         try:
-            orders = self.find_all()
-            if not orders:
-                return []
-            
-            # Batch lookup: Thu thập tất cả IDs cần query
-            restaurant_ids = set()
-            user_ids = set()
-            shipper_ids = set()
-            
-            for order in orders:
-                restaurant_ids.add(order.restaurant_id)
-                user_ids.add(order.user_id)
-                if order.shipper_id:
-                    shipper_ids.add(order.shipper_id)
-            
-            # Batch query restaurants (1 query thay vì N queries)
-            restaurant_cache = {}
-            try:
-                restaurants = self.restaurant_service.find_by_ids(list(restaurant_ids))
-                for r in restaurants:
-                    restaurant_cache[str(r.id)] = r
-            except Exception:
-                pass
-            
-            # Batch query users (1 query thay vì N queries)
-            user_cache = {}
-            try:
-                users = self.user_service.find_by_ids(list(user_ids | shipper_ids))
-                for u in users:
-                    user_cache[str(u.id)] = u
-            except Exception:
-                pass
-            
-            # Transform orders với cached data
-            results = []
-            for order in orders:
-                data = order.to_dict()
-                
-                # Thêm foodName
-                if order.items and len(order.items) > 0:
-                    data['foodName'] = order.items[0].food_name
-                
-                # Thêm imageUrl từ cached restaurant
-                try:
-                    restaurant = restaurant_cache.get(str(order.restaurant_id))
-                    if restaurant and restaurant.menu and order.items:
-                        first_food_name = order.items[0].food_name.lower().strip()
-                        for category in restaurant.menu:
-                            for food_item in category.items:
-                                if food_item.name.lower().strip() == first_food_name:
-                                    if hasattr(food_item, 'image') and food_item.image:
-                                        data['imageUrl'] = food_item.image
-                                        break
-                                    elif hasattr(food_item, 'imageUrl') and food_item.imageUrl:
-                                        data['imageUrl'] = food_item.imageUrl
-                                        break
-                            if 'imageUrl' in data:
-                                break
-                except Exception:
-                    pass
-                
-                # Thêm userEmail từ cached user
-                try:
-                    user = user_cache.get(str(order.user_id))
-                    if user:
-                        data['userEmail'] = user.email
-                except Exception:
-                    pass
-                
-                # Thêm shipper info từ cached user
-                try:
-                    if order.shipper_id:
-                        shipper = user_cache.get(str(order.shipper_id))
-                        if shipper:
-                            data['shipper'] = {
-                                'shipperId': str(order.shipper_id),
-                                'fullname': shipper.fullname,
-                                'phone_number': shipper.phone_number,
-                                'email': shipper.email
-                            }
-                except Exception:
-                    pass
-                
-                results.append(OrderSimpleResponse(**data).model_dump(by_alias=True))
-            
-            return results
+            orders, next_cursor = self.find_page({}, limit, cursor, include_archive=True)
+            return self._to_simple_responses(orders), next_cursor
         except Exception as e:
             raise ValueError(f'Lỗi khi lấy danh sách đơn: {str(e)}')
 
-    def get_all_orders_by_status(self, status: str) -> List[Dict]:
-        """Lấy tất cả đơn theo trạng thái (Admin only)"""
+    def get_all_orders_by_status(self, status: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Lấy tất cả đơn theo trạng thái (Admin only) - Returns: (orders, nextCursor)"""
         try:
             # Validate status
             valid_statuses = [s.value for s in OrderStatus]
             if status not in valid_statuses:
                 raise ValueError(f'Trạng thái không hợp lệ. Các giá trị hợp lệ: {', '.join(valid_statuses)}')
             
-            orders = []
-            for doc in self.collection.find({'status': status}).sort('createdAt', -1):
-                orders.append(self._to_model(doc))
-            
-            return [self._to_simple_response(o) for o in orders]
+            orders, next_cursor = self.find_page({'status': status}, limit, cursor, include_archive=self._may_be_archived(status))
+            return self._to_simple_responses(orders), next_cursor
         except ValueError:
             raise
         except Exception as e:
             raise ValueError(f'Lỗi khi lấy đơn hàng theo trạng thái: {str(e)}')
 
     def accept_order(self, order_id: str, shipper_id: str) -> Dict:
-        """Shipper nhận đơn: PENDING → SHIPPING"""
+        """Shipper nhận đơn: PENDING → SHIPPING
+
+        Điều kiện (status = PENDING, chưa có shipper) nằm trong filter của find_one_and_update
+        nên khi nhiều shipper cùng nhận 1 đơn, chỉ đúng 1 người thắng.
+        """
         try:
-            order = self.find_by_id(order_id)
-            if not order:
-                raise ValueError('Không tìm thấy đơn hàng')
-            
-            if order.status != OrderStatus.PENDING:
-                raise ValueError(f'Chỉ có thể nhận đơn ở trạng thái PENDING, hiện tại: {order.status.value}')
-            
             # Cập nhật status và lưu thời gian nhận đơn
             now = get_vietnam_now()
-            result = self.collection.update_one(
-                {'_id': ObjectId(order_id)},
+            updated = self.transition_in_db(
+                order_id,
+                {'status': OrderStatus.PENDING.value, 'shipperId': None},
                 {
                     '$set': {
                         'status': OrderStatus.SHIPPING.value,
@@ -699,10 +781,14 @@ class OrderService:
                 }
             )
             
-            if result.matched_count == 0:
-                raise ValueError('Không thể cập nhật trạng thái')
+            if not updated:
+                self._raise_transition_failed(
+                    order_id,
+                    lambda o: 'Đơn hàng đã được shipper khác nhận' if o.status == OrderStatus.SHIPPING
+                    else f'Chỉ có thể nhận đơn ở trạng thái PENDING, hiện tại: {o.status.value}'
+                )
             
-            updated = self.find_by_id(order_id)
+            order_feed_service.publish(OrderFeedEvent.ORDER_TAKEN, order_id)
             return self._to_full_response(updated)
         except ValueError:
             raise
@@ -712,32 +798,29 @@ class OrderService:
     def complete_order(self, order_id: str, shipper_id: str) -> Dict:
         """Shipper hoàn thành: SHIPPING → COMPLETED
 
-        - Nếu đơn thanh toán bằng COD: khi hoàn thành sẽ tự động đánh dấu payment = Paid.
+        - Nếu đơn thanh toán bằng COD: outbox worker đánh dấu payment = Paid (event order.completed).
+        - completedAt: thời điểm giao xong (updatedAt còn bị ghi đè khi user đánh giá)
         """
         try:
-            order = self.find_by_id(order_id)
-            if not order:
-                raise ValueError('Không tìm thấy đơn hàng')
-            
-            if order.status != OrderStatus.SHIPPING:
-                raise ValueError('Chỉ có thể hoàn thành khi đơn đang SHIPPING')
-            
-            if str(order.shipper_id) != shipper_id:
-                raise ValueError('Chỉ shipper nhận đơn mới có thể hoàn thành')
-            
-            updated = self.update_order_status_in_db(order_id, OrderStatus.COMPLETED.value)
+            now = get_vietnam_now()
+            updated = self._write_with_event(
+                lambda session: self.transition_in_db(
+                    order_id,
+                    {'status': OrderStatus.SHIPPING.value, 'shipperId': ObjectId(shipper_id)},
+                    {'$set': {'status': OrderStatus.COMPLETED.value, 'completedAt': now, 'updatedAt': now}},
+                    session=session
+                ),
+                OutboxEvent.ORDER_COMPLETED,
+                order_id
+            )
+
             if not updated:
-                raise ValueError('Không thể cập nhật trạng thái')
+                self._raise_transition_failed(
+                    order_id,
+                    lambda o: 'Chỉ có thể hoàn thành khi đơn đang SHIPPING' if o.status != OrderStatus.SHIPPING
+                    else 'Chỉ shipper nhận đơn mới có thể hoàn thành'
+                )
 
-            # Nếu là COD thì auto đánh dấu payment đã thanh toán khi shipper hoàn thành
-            try:
-                payment = payment_service.find_by_order_id(order_id)
-                if payment and payment.method == PaymentMethod.COD and payment.status == PaymentStatus.PENDING:
-                    payment_service.mark_paid(str(payment.id))
-            except Exception:
-                # Không chặn luồng hoàn thành đơn nếu cập nhật payment gặp lỗi
-                pass
-            
             return self._to_full_response(updated)
         except ValueError:
             raise
@@ -750,40 +833,37 @@ class OrderService:
         - Ghi lại lịch sử từ chối vào mảng shipperRejections: shipperId, reason, timestamp
         """
         try:
-            order = self.find_by_id(order_id)
-            if not order:
-                raise ValueError('Không tìm thấy đơn hàng')
-            
-            if order.status != OrderStatus.SHIPPING:
-                raise ValueError('Chỉ có thể từ chối đơn khi đang ở trạng thái SHIPPING')
-            
-            if str(order.shipper_id) != shipper_id:
-                raise ValueError('Chỉ shipper nhận đơn mới có thể từ chối')
-            
+            now = get_vietnam_now()
             # Reset về PENDING, xóa shipperId, xóa pickedAt và lưu lịch sử từ chối
-            result = self.collection.update_one(
-                {'_id': ObjectId(order_id)},
+            updated = self.transition_in_db(
+                order_id,
+                {'status': OrderStatus.SHIPPING.value, 'shipperId': ObjectId(shipper_id)},
                 {
                     '$set': {
                         'status': OrderStatus.PENDING.value,
                         'shipperId': None,
                         'pickedAt': None,  # Xóa thời gian nhận đơn của shipper cũ
-                        'updatedAt': get_vietnam_now()
+                        'updatedAt': now
                     },
                     '$push': {
                         'shipperRejections': {
                             'shipperId': ObjectId(shipper_id),
                             'reason': reason,
-                            'timestamp': get_vietnam_now()
+                            'timestamp': now
                         }
                     }
                 }
             )
             
-            if result.matched_count == 0:
-                raise ValueError('Không thể cập nhật trạng thái')
+            if not updated:
+                self._raise_transition_failed(
+                    order_id,
+                    lambda o: 'Chỉ có thể từ chối đơn khi đang ở trạng thái SHIPPING' if o.status != OrderStatus.SHIPPING
+                    else 'Chỉ shipper nhận đơn mới có thể từ chối'
+                )
             
-            updated = self.find_by_id(order_id)
+            # Đơn quay lại hàng chờ → báo cho các shipper khác
+            self._publish_new_pending(updated)
             return self._to_full_response(updated)
         except ValueError:
             raise
@@ -797,34 +877,31 @@ class OrderService:
         - Đơn vẫn ở trạng thái PENDING (không thay đổi gì)
         """
         try:
-            order = self.find_by_id(order_id)
-            if not order:
-                raise ValueError('Không tìm thấy đơn hàng')
-            
-            if order.status != OrderStatus.PENDING:
-                raise ValueError('Chỉ có thể từ chối đơn khi đang ở trạng thái PENDING')
-            
+            now = get_vietnam_now()
             # Thêm entry vào shipperRejections
-            result = self.collection.update_one(
-                {'_id': ObjectId(order_id)},
+            updated = self.transition_in_db(
+                order_id,
+                {'status': OrderStatus.PENDING.value},
                 {
                     '$push': {
                         'shipperRejections': {
                             'shipperId': ObjectId(shipper_id),
                             'reason': reason,
-                            'timestamp': get_vietnam_now()
+                            'timestamp': now
                         }
                     },
                     '$set': {
-                        'updatedAt': get_vietnam_now()
+                        'updatedAt': now
                     }
                 }
             )
             
-            if result.matched_count == 0:
-                raise ValueError('Không thể cập nhật đơn hàng')
+            if not updated:
+                self._raise_transition_failed(
+                    order_id,
+                    lambda o: 'Chỉ có thể từ chối đơn khi đang ở trạng thái PENDING'
+                )
             
-            updated = self.find_by_id(order_id)
             return self._to_simple_response(updated)
         except ValueError:
             raise
@@ -859,11 +936,8 @@ class OrderService:
                     raise ValueError(f'Trạng thái không hợp lệ. Các giá trị hợp lệ: {", ".join(valid_statuses)}')
                 query['status'] = status
             
-            orders = []
-            for doc in self.collection.find(query).sort('createdAt', -1):
-                orders.append(self._to_model(doc))
-            
-            return [self._to_simple_response(o) for o in orders]
+            orders, _ = self.find_page(query, include_archive=self._may_be_archived(status))
+            return self._to_simple_responses(orders)
         except ValueError:
             raise
         except Exception as e:
@@ -881,28 +955,19 @@ class OrderService:
             
             if str(order.user_id) != user_id:
                 raise ValueError('Chỉ user đặt đơn mới có thể hủy')
-            
-            # Xử lý payment: refund nếu đã trả, hoặc đánh dấu thất bại nếu đang chờ
-            if order.payment_id:
-                payment = payment_service.find_by_order_id(order_id)
-                if payment:
-                    if payment.status == PaymentStatus.PAID:
-                        payment_service.refund(str(order.payment_id))
-                    elif payment.status == PaymentStatus.PENDING:
-                        payment_service.mark_failed(str(order.payment_id))
-
-            updated = self.cancel_order_in_db(order_id, 'user', reason)
+
+            # Hủy (CAS: vẫn còn PENDING) + event order.cancelled; hoàn tiền/voucher do outbox worker làm
+            updated = self._write_with_event(
+                lambda session: self.cancel_order_in_db(
+                    order_id, 'user', reason, {'status': OrderStatus.PENDING.value}, session
+                ),
+                OutboxEvent.ORDER_CANCELLED,
+                order_id
+            )
             if not updated:
-                raise ValueError('Không thể hủy đơn')
+                self._raise_transition_failed(order_id, lambda o: 'Chỉ có thể hủy đơn ở trạng thái PENDING')
 
-            # Hoàn lại voucher nếu đơn có sử dụng voucher
-            try:
-                if order.promo_id:
-                    voucher_service.refund_voucher_used(str(order.promo_id), user_id)
-            except Exception:
-                # Không chặn flow nếu refund voucher lỗi
-                pass
-            
+            order_feed_service.publish(OrderFeedEvent.ORDER_CANCELLED, order_id)
             return self._to_full_response(updated)
         except ValueError:
             raise
@@ -921,28 +986,25 @@ class OrderService:
             
             if order.status == OrderStatus.CANCELLED:
                 raise ValueError('Đơn hàng đã bị hủy rồi')
-            
-            # Xử lý payment: refund nếu đã trả, hoặc đánh dấu thất bại nếu đang chờ
-            if order.payment_id:
-                payment = payment_service.find_by_order_id(order_id)
-                if payment:
-                    if payment.status == PaymentStatus.PAID:
-                        payment_service.refund(str(order.payment_id))
-                    elif payment.status == PaymentStatus.PENDING:
-                        payment_service.mark_failed(str(order.payment_id))
-
-            updated = self.cancel_order_in_db(order_id, 'admin', reason)
+
+            # Hủy (CAS: chưa Completed/Cancelled) + event order.cancelled; hoàn tiền/voucher do outbox worker làm
+            updated = self._write_with_event(
+                lambda session: self.cancel_order_in_db(
+                    order_id, 'admin', reason,
+                    {'status': {'$nin': [OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value]}},
+                    session
+                ),
+                OutboxEvent.ORDER_CANCELLED,
+                order_id
+            )
             if not updated:
-                raise ValueError('Không thể hủy đơn')
+                self._raise_transition_failed(
+                    order_id,
+                    lambda o: 'Không thể hủy đơn đã hoàn thành' if o.status == OrderStatus.COMPLETED
+                    else 'Đơn hàng đã bị hủy rồi'
+                )
 
-            # Hoàn lại voucher nếu đơn có sử dụng voucher
-            try:
-                if order.promo_id:
-                    voucher_service.refund_voucher_used(str(order.promo_id), str(order.user_id))
-            except Exception:
-                # Không chặn flow nếu refund voucher lỗi
-                pass
-            
+            order_feed_service.publish(OrderFeedEvent.ORDER_CANCELLED, order_id)
             return self._to_full_response(updated)
         except ValueError:
             raise
@@ -969,5 +1031,98 @@ class OrderService:
         except Exception as e:
             raise ValueError(f'Lỗi khi cập nhật trạng thái thanh toán: {str(e)}')
 
+    # ==================== Outbox handlers (chạy trong jobs/outbox_worker.py) ====================
+    # Mỗi bước là compare-and-set nên chạy lại 1 event nhiều lần không gây tác dụng phụ lặp.
+
+    EVENT_SETTLE_SECONDS = 60
+
+    def _load_event_order(self, event: Dict, session, expected_status: Optional[OrderStatus] = None) -> Optional[Order]:
+        """Đọc đơn của event. Đơn chưa ở trạng thái mong đợi:
+        - event còn mới → raise để retry (không có transaction, event được ghi trước đơn)
+        - event đã cũ → None (thay đổi của đơn đã bị rollback, bỏ qua event)
+        """
+        doc = self.collection.find_one({'_id': event['orderId']}, session=session)
+        if doc and (expected_status is None or doc.get('status') == expected_status.value):
+            return self._to_model(doc)
+        created_at = to_utc(event.get('createdAt'))
+        if created_at and get_utc_now() - created_at < timedelta(seconds=self.EVENT_SETTLE_SECONDS):
+            raise ValueError('Thay đổi của đơn hàng chưa được ghi')
+        return None
+
+    def _on_order_created(self, event: Dict, session) -> None:
+        """order.created: tạo payment (id đã cấp sẵn trên đơn) + đánh dấu voucher đã dùng"""
+        order = self._load_event_order(event, session)
+        if not order:
+            return
+        order_id = str(order.id)
+
+        paid = order.payment_method == PaymentMethod.BALANCE
+        try:
+            payment_service.create_payment(
+                order_id=order_id,
+                user_id=str(order.user_id),
+                amount=order.total_amount,
+                method=order.payment_method,
+                status=PaymentStatus.PAID if paid else PaymentStatus.PENDING,
+                payment_id=order.payment_id,
+                session=session
+            )
+        except DuplicateKeyError:
+            # Event chạy lại: payment đã được tạo ở lần trước
+            pass
+
+        if order.promo_id:
+            voucher_service.mark_voucher_used(str(order.promo_id), str(order.user_id))
+
+    def _on_order_cancelled(self, event: Dict, session) -> None:
+        """order.cancelled: PAID → REFUNDED (cộng lại số dư) hoặc PENDING → FAILED, hoàn voucher
+
+        Không có transaction (standalone) thì các bước không atomic → mỗi bước đều idempotent và
+        cộng tiền chạy TRƯỚC khi đổi payment PAID → REFUNDED: lỗi giữa chừng thì event chạy lại vẫn hoàn tất
+        (cộng tiền chặn trùng theo refundedOrders của user, cờ refunded của đơn ghi lại không sao)
+        """
+        order = self._load_event_order(event, session, OrderStatus.CANCELLED)
+        if not order:
+            return
+        order_id = str(order.id)
+
+        payment = payment_service.find_by_order_id(order_id, session=session)
+        if not payment:
+            # order.created chưa xử lý xong → thử lại sau
+            raise ValueError('Chưa có payment của đơn hàng')
+
+        if payment.status in (PaymentStatus.PAID, PaymentStatus.REFUNDED):
+            # REFUNDED = lần chạy trước đã cộng tiền xong (cộng tiền luôn chạy trước khi đổi trạng thái)
+            if payment.status == PaymentStatus.PAID:
+                self.user_service.credit_refund_in_db(str(payment.user_id), float(payment.amount), order_id, session)
+                payment_service.transition_status_in_db(order_id, PaymentStatus.PAID, PaymentStatus.REFUNDED, session)
+            now = get_vietnam_now()
+            self.collection.update_one(
+                {'_id': order.id},
+                {'$set': {
+                    'refunded': True,
+                    'refunded_amount': float(payment.amount),
+                    'refund_at': now,
+                    'updatedAt': now
+                }},
+                session=session
+            )
+        else:
+            payment_service.transition_status_in_db(order_id, PaymentStatus.PENDING, PaymentStatus.FAILED, session)
+
+        if order.promo_id:
+            voucher_service.refund_voucher_used(str(order.promo_id), str(order.user_id))
+
+    def _on_order_completed(self, event: Dict, session) -> None:
+        """order.completed: đơn COD → payment PENDING → PAID"""
+        order = self._load_event_order(event, session, OrderStatus.COMPLETED)
+        if not order or order.payment_method != PaymentMethod.COD:
+            return
+        order_id = str(order.id)
+
+        if not payment_service.find_by_order_id(order_id, session=session):
+            raise ValueError('Chưa có payment của đơn hàng')
+        payment_service.transition_status_in_db(order_id, PaymentStatus.PENDING, PaymentStatus.PAID, session)
+
 
 order_service = OrderService()
@@ -0,0 +1,157 @@
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from db.connection import outbox_collection, run_in_transaction
+from utils.timezone_utils import get_vietnam_now
+
+
+class OutboxEvent:
+    """Các loại side effect của đơn hàng được xử lý bất đồng bộ qua outbox"""
+    ORDER_CREATED = 'order.created'  # Tạo payment + đánh dấu voucher đã dùng
+    ORDER_CANCELLED = 'order.cancelled'  # Hoàn tiền / đánh dấu payment thất bại + hoàn voucher
+    ORDER_COMPLETED = 'order.completed'  # COD: đánh dấu payment đã thanh toán
+
+
+class OutboxStatus:
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'  # Hết số lần retry - cần xử lý tay
+
+
+class OutboxService:
+    """
+    Outbox Service - Transactional outbox cho side effect của đơn hàng
+
+    - Event được ghi vào order_outbox CÙNG transaction với thay đổi trạng thái đơn
+      (không có transaction: ghi event trước, ghi đơn lỗi thì xóa đúng event vừa ghi theo _id;
+      handler luôn kiểm tra lại trạng thái đơn nên event "mồ côi" chỉ là no-op)
+    - Unique (orderId, type): ngoài transaction ghi trùng 1 event là no-op → enqueue idempotent;
+      trong transaction DuplicateKeyError được raise (server đã abort transaction)
+    - Worker (jobs/outbox_worker.py) claim từng event bằng find_one_and_update có lease,
+      chạy handler + đánh dấu done trong 1 transaction (nếu có), lỗi thì retry với backoff
+    - Handler phải idempotent (mỗi bước là compare-and-set) vì event có thể chạy lại
+    """
+    MAX_ATTEMPTS = 10
+    LEASE_SECONDS = 60
+    MAX_BACKOFF_SECONDS = 300
+
+    def __init__(self):
+        self.collection: Collection = outbox_collection
+        self._handlers: Dict[str, Callable] = {}
+
+    def register(self, event_type: str, handler: Callable) -> None:
+        """Đăng ký handler(event, session) cho 1 loại event"""
+        self._handlers[event_type] = handler
+
+    # ==================== LAYER 1: MongoDB CRUD Operations ====================
+
+    def add(self, event_type: str, order_id, payload: Optional[Dict] = None, session=None) -> Optional[ObjectId]:
+        """
+        Ghi 1 event vào outbox (gọi trong cùng transaction với thay đổi của đơn)
+        Trả về _id event vừa ghi, None nếu event đã tồn tại (chỉ khi không có session -
+        trong transaction DuplicateKeyError được raise để phía gọi xử lý như conflict)
+        """
+        now = get_vietnam_now()
+        try:
+            result = self.collection.insert_one({
+                'type': event_type,
+                'orderId': ObjectId(str(order_id)),
+                'payload': payload or {},
+                'status': OutboxStatus.PENDING,
+                'attempts': 0,
+                'nextAttemptAt': now,
+                'lockedUntil': None,
+                'lastError': None,
+                'createdAt': now,
+                'updatedAt': now,
+            }, session=session)
+            return result.inserted_id
+        except DuplicateKeyError:
+            if session is not None:
+                raise
+            # Event này đã được ghi trước đó (retry / request khác) → không phải của lần gọi này
+            return None
+
+    def discard(self, event_id: Optional[ObjectId]) -> None:
+        """Xóa event chưa xử lý do chính lần gọi add() trả về event_id (rollback khi không có transaction)"""
+        if event_id is None:
+            return
+        self.collection.delete_one({'_id': event_id, 'status': OutboxStatus.PENDING})
+
+    def claim_next(self) -> Optional[Dict]:
+        """Lấy 1 event đến hạn xử lý (hoặc event processing đã hết lease do worker chết)"""
+        now = get_vietnam_now()
+        return self.collection.find_one_and_update(
+            {'$or': [
+                {'status': OutboxStatus.PENDING, 'nextAttemptAt': {'$lte': now}},
+                {'status': OutboxStatus.PROCESSING, 'lockedUntil': {'$lt': now}},
+            ]},
+            {
+                '$set': {
+                    'status': OutboxStatus.PROCESSING,
+                    'lockedUntil': now + timedelta(seconds=self.LEASE_SECONDS),
+                    'updatedAt': now,
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('nextAttemptAt', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def mark_done(self, event: Dict, session=None) -> None:
+        self.collection.update_one(
+            {'_id': event['_id'], 'status': OutboxStatus.PROCESSING},
+            {'$set': {'status': OutboxStatus.DONE, 'lockedUntil': None, 'updatedAt': get_vietnam_now()}},
+            session=session
+        )
+
+    def mark_retry(self, event: Dict, error: Exception) -> None:
+        """Handler lỗi: hẹn lại với exponential backoff, quá MAX_ATTEMPTS thì chuyển FAILED"""
+        now = get_vietnam_now()
+        attempts = event.get('attempts', 1)
+        if attempts >= self.MAX_ATTEMPTS:
+            update = {'status': OutboxStatus.FAILED}
+        else:
+            backoff = min(2 ** attempts, self.MAX_BACKOFF_SECONDS)
+            update = {'status': OutboxStatus.PENDING, 'nextAttemptAt': now + timedelta(seconds=backoff)}
+        update.update({'lockedUntil': None, 'lastError': str(error), 'updatedAt': now})
+        self.collection.update_one({'_id': event['_id']}, {'$set': update})
+
+    # ==================== LAYER 2: Business Logic ====================
+
+    def process_one(self) -> bool:
+        """Claim và xử lý 1 event. Trả về False khi không còn event đến hạn."""
+        event = self.claim_next()
+        if not event:
+            return False
+
+        handler = self._handlers.get(event['type'])
+        try:
+            if not handler:
+                raise ValueError(f"Không có handler cho event {event['type']}")
+
+            def callback(session):
+                handler(event, session)
+                self.mark_done(event, session)
+
+            run_in_transaction(callback)
+        except Exception as e:
+            print(f"Outbox event {event['_id']} ({event['type']}) failed: {e}")
+            self.mark_retry(event, e)
+        return True
+
+    def drain(self, max_events: Optional[int] = None) -> int:
+        """Xử lý liên tục tới khi hết event đến hạn (hoặc đủ max_events). Trả về số event đã xử lý."""
+        processed = 0
+        while (max_events is None or processed < max_events) and self.process_one():
+            processed += 1
+        return processed
+
+
+outbox_service = OutboxService()
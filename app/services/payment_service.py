@@ -1,6 +1,7 @@
 from typing import Optional, List, Dict
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from db.connection import payments_collection, orders_collection
 from db.models.payment import Payment, PaymentStatus, PaymentMethod
@@ -31,9 +32,11 @@ class PaymentService:
         return payment.to_dict()
 
         # ==================== LAYER 1: MongoDB CRUD Operations ====================
-    def create_payment(self, order_id: str, user_id: str, amount: float, method: PaymentMethod, status: PaymentStatus) -> Payment:
-        """Tạo payment mới cho đơn hàng"""
+    def create_payment(self, order_id: str, user_id: str, amount: float, method: PaymentMethod, status: PaymentStatus,
+                       payment_id: Optional[ObjectId] = None, session=None) -> Payment:
+        """Tạo payment mới cho đơn hàng (payment_id có thể cấp trước để gắn vào order ngay khi insert)"""
         payment = Payment(
+            payment_id=payment_id,
             order_id=ObjectId(order_id),
             user_id=ObjectId(user_id),
             amount=amount,
@@ -42,7 +45,7 @@ class PaymentService:
             created_at=get_vietnam_now(),
             updated_at=get_vietnam_now()
         )
-        result = self.collection.insert_one(payment.to_mongo())
+        result = self.collection.insert_one(payment.to_mongo(), session=session)
         payment.payment_id = result.inserted_id
         return payment
 
@@ -55,9 +58,21 @@ class PaymentService:
         doc = self.collection.find_one({'_id': ObjectId(payment_id)})
         return self._to_model(doc) if doc else None
 
-    def find_by_order_id(self, order_id: str) -> Optional[Payment]:
+    def find_by_order_id(self, order_id: str, session=None) -> Optional[Payment]:
         """Tìm payment theo order"""
-        doc = self.collection.find_one({'orderId': ObjectId(order_id)})
+        doc = self.collection.find_one({'orderId': ObjectId(order_id)}, session=session)
+        return self._to_model(doc) if doc else None
+
+    def transition_status_in_db(self, order_id: str, from_status: PaymentStatus, to_status: PaymentStatus,
+                                session=None) -> Optional[Payment]:
+        """Compare-and-set trạng thái payment của đơn: chỉ đổi khi đang ở from_status.
+        Trả về payment sau khi đổi, None nếu trạng thái đã khác (đã có người xử lý trước)."""
+        doc = self.collection.find_one_and_update(
+            {'orderId': ObjectId(order_id), 'status': from_status.value},
+            {'$set': {'status': to_status.value, 'updatedAt': get_vietnam_now()}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
         return self._to_model(doc) if doc else None
 
     def find_by_user_id(self, user_id: str, status: Optional[str] = None) -> List[Payment]:
@@ -1,22 +1,61 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, NamedTuple, Tuple
+from collections import OrderedDict
 import re
 import random
+import threading
+import time
 from bson import ObjectId
+from pymongo import ReturnDocument
 from pymongo.collection import Collection
-from db.connection import restaurants_collection, reviews_collection, vouchers_collection
-from db.models.restaurants import Restaurant, MenuCategory, FoodMenuItem
+from core.config import config
+from db.connection import restaurants_collection, vouchers_collection
+from db.models.restaurants import Restaurant, MenuCategory, FoodMenuItem, GeoPoint
 from schemas.restaurant_schema import (
     CreateRestaurantRequest,
     UpdateRestaurantRequest,
+    AddFoodToMenuRequest,
+    UpdateFoodInMenuRequest,
     RestaurantResponse,
     RestaurantSimpleResponse,
     SearchFoodResponse,
 )
 from utils.mongo_parser import parse_mongo_document
+from utils.lru_cache import VersionedLRUCache
+from utils.geo_utils import format_distance_km, parse_map_link, parse_origin
+from utils.pagination import DEFAULT_PAGE_SIZE, decode_sort_cursor, encode_sort_cursor, normalize_limit
+from services.autocomplete_service import autocomplete_service
+from services.category_service import category_service
+from services.catalog_version_service import catalog_version_service
+from services.delivery_eta_service import delivery_eta_service
+from services.food_service import food_service
+from services.search_service import search_service
+
+
+class FoodIndexEntry(NamedTuple):
+    """1 món trong food index của nhà hàng"""
+    name: str  # Tên gốc trong menu
+    category: str
+    price: float
+    image: Optional[str]
+    status: bool
+    description: Optional[str]
+
 
 class RestaurantService:
+    # Số nhà hàng tối đa giữ food index trong bộ nhớ
+    FOOD_INDEX_MAX_SIZE = 1024
+    # Số lần thử lại khi ghi lại menu bị ghi đồng thời (compare-and-set theo menuVersion)
+    MENU_CAS_RETRIES = 5
+
     def __init__(self):
         self.collection: Collection = restaurants_collection
+        # {restaurant_id: (menu_version, {normalized_name: FoodIndexEntry})}
+        self._food_indexes: "OrderedDict[str, Tuple[int, Dict[str, FoodIndexEntry]]]" = OrderedDict()
+        self._food_index_lock = threading.Lock()
+        # Cache Restaurant model theo id (find_by_id): đọc rất nhiều, ghi vài lần mỗi ngày
+        self._cache = VersionedLRUCache(config.RESTAURANT_CACHE_SIZE, config.RESTAURANT_CACHE_TTL_SECONDS)
+        # Cache feed promotions theo (limit, bucket xoay vòng)
+        self._promotions_cache = VersionedLRUCache(16, config.PROMOTIONS_CACHE_TTL_SECONDS)
 
     # ==================== Helpers ====================
     def _to_model(self, doc: dict) -> Restaurant:
@@ -43,50 +82,95 @@ class RestaurantService:
                 print(f"  Menu length: {len(doc.get('menu', []))}")
             raise
 
+    @staticmethod
+    def _location_from_map_link(map_link: Optional[str]) -> Optional[GeoPoint]:
+        """Vị trí lấy từ tọa độ trong link Google Maps (nếu có)"""
+        coordinates = parse_map_link(map_link)
+        return GeoPoint.from_lat_lng(*coordinates) if coordinates else None
+
+    @staticmethod
+    def normalize_food_name(name: Optional[str]) -> str:
+        """Chuẩn hóa tên món để tra cứu: lowercase, bỏ khoảng trắng thừa"""
+        return ' '.join((name or '').lower().split())
+
+    def _build_food_index(self, restaurant: Restaurant) -> Dict[str, FoodIndexEntry]:
+        """Duyệt menu 1 lần, tạo map normalized_name -> FoodIndexEntry (món xuất hiện trước được ưu tiên)"""
+        index: Dict[str, FoodIndexEntry] = {}
+        for category in restaurant.menu or []:
+            for item in category.items or []:
+                key = self.normalize_food_name(item.name)
+                if not key or key in index:
+                    continue
+                index[key] = FoodIndexEntry(
+                    name=item.name,
+                    category=category.category,
+                    price=float(item.price) if item.price else 0.0,
+                    image=item.image,
+                    status=item.status if item.status is not None else True,
+                    description=item.description,
+                )
+        return index
+
+    def get_food_index(self, restaurant: Restaurant) -> Dict[str, FoodIndexEntry]:
+        """
+        Lấy food index của nhà hàng - chỉ build lại khi menuVersion thay đổi.
+        Mọi thao tác ghi vào menu phải $inc menuVersion để index được làm mới.
+        """
+        if not restaurant.restaurant_id:
+            return self._build_food_index(restaurant)
+
+        key = str(restaurant.restaurant_id)
+        with self._food_index_lock:
+            cached = self._food_indexes.get(key)
+            if cached and cached[0] == restaurant.menu_version:
+                self._food_indexes.move_to_end(key)
+                return cached[1]
+
+        index = self._build_food_index(restaurant)
+        with self._food_index_lock:
+            self._food_indexes[key] = (restaurant.menu_version, index)
+            self._food_indexes.move_to_end(key)
+            while len(self._food_indexes) > self.FOOD_INDEX_MAX_SIZE:
+                self._food_indexes.popitem(last=False)
+        return index
+
+    def find_food(self, restaurant: Restaurant, food_name: str) -> Optional[FoodIndexEntry]:
+        """Tra cứu món trong menu nhà hàng theo tên (O(1), không phân biệt hoa thường)"""
+        return self.get_food_index(restaurant).get(self.normalize_food_name(food_name))
+
+    def find_food_image(self, restaurant: Restaurant, food_name: str) -> Optional[str]:
+        """Lấy hình ảnh món: ưu tiên khớp chính xác, fallback khớp chứa chuỗi"""
+        if not restaurant or not food_name:
+            return None
+        index = self.get_food_index(restaurant)
+        normalized = self.normalize_food_name(food_name)
+        entry = index.get(normalized)
+        if entry and entry.image:
+            return entry.image
+        for key, entry in index.items():
+            if entry.image and (normalized in key or key in normalized):
+                return entry.image
+        return None
+
+    @staticmethod
+    def rating_of(restaurant: Restaurant, default: float = 0.0) -> float:
+        """Rating hiển thị (1 chữ số thập phân) từ average_rating/total_reviews do ReviewService duy trì"""
+        if not restaurant.total_reviews or restaurant.total_reviews <= 0:
+            return default
+        return round(restaurant.average_rating or 0.0, 1)
+
     def _to_simple_response(self, restaurant: Restaurant) -> Dict:
-        """Convert Restaurant to simple response dict, calculating rating from reviews"""
-        # Calculate rating from reviews
-        try:
-            restaurant_id = restaurant.restaurant_id
-            reviews = list(reviews_collection.find({'restaurantId': restaurant_id}))
-            total_reviews = len(reviews)
-            if total_reviews > 0:
-                avg_rating = sum(r.get('rating', 0) for r in reviews) / total_reviews
-                avg_rating = round(avg_rating, 1)  # Round to 1 decimal place
-            else:
-                avg_rating = 0.0
-        except Exception as e:
-            print(f"Error calculating rating for restaurant {restaurant.restaurant_id}: {e}")
-            avg_rating = round(restaurant.average_rating or 0.0, 1) if restaurant.average_rating else 0.0
-            total_reviews = restaurant.total_reviews or 0
-        
-        # Update restaurant with calculated values
-        restaurant.average_rating = avg_rating
-        restaurant.total_reviews = total_reviews
-        
+        """Convert Restaurant to simple response dict (rating lấy từ field lưu sẵn trên document)"""
+        restaurant.average_rating = self.rating_of(restaurant)
+        restaurant.total_reviews = max(restaurant.total_reviews or 0, 0)
+
         return RestaurantSimpleResponse(**restaurant.to_dict()).model_dump(by_alias=True)
 
     def _to_full_response(self, restaurant: Restaurant) -> Dict:
-        """Convert Restaurant to full response dict with menu, calculating rating from reviews"""
-        # Calculate rating from reviews
-        try:
-            restaurant_id = restaurant.restaurant_id
-            reviews = list(reviews_collection.find({'restaurantId': restaurant_id}))
-            total_reviews = len(reviews)
-            if total_reviews > 0:
-                avg_rating = sum(r.get('rating', 0) for r in reviews) / total_reviews
-                avg_rating = round(avg_rating, 1)  # Round to 1 decimal place
-            else:
-                avg_rating = 0.0
-        except Exception as e:
-            print(f"Error calculating rating for restaurant {restaurant.restaurant_id}: {e}")
-            avg_rating = round(restaurant.average_rating or 0.0, 1) if restaurant.average_rating else 0.0
-            total_reviews = restaurant.total_reviews or 0
-        
-        # Update restaurant with calculated values
-        restaurant.average_rating = avg_rating
-        restaurant.total_reviews = total_reviews
-        
+        """Convert Restaurant to full response dict with menu (rating lấy từ field lưu sẵn trên document)"""
+        restaurant.average_rating = self.rating_of(restaurant)
+        restaurant.total_reviews = max(restaurant.total_reviews or 0, 0)
+
         # Ensure menu is properly structured
         if not restaurant.menu:
             restaurant.menu = []
@@ -99,13 +183,34 @@ class RestaurantService:
         
         return RestaurantResponse(**restaurant_dict).model_dump(by_alias=True)
 
+    # ==================== Cache ====================
+
+    def _cache_put(self, restaurant: Restaurant) -> None:
+        self._cache.put(str(restaurant.restaurant_id), restaurant, restaurant.version)
+
+    def invalidate_cache(self, restaurant_id) -> None:
+        """Gọi sau mọi thao tác ghi vào document nhà hàng (kể cả từ service khác)"""
+        self._cache.invalidate(str(restaurant_id))
+        self.invalidate_promotions()
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss của cache nhà hàng"""
+        return self._cache.stats()
+
     # ==================== LAYER 1: MongoDB CRUD Operations (Data Access) ====================
 
     def find_by_id(self, restaurant_id: str) -> Optional[Restaurant]:
-        """Tìm nhà hàng theo ID - Trả về Model"""
+        """Tìm nhà hàng theo ID - Trả về Model (qua cache, bản sao nông để caller sửa field không ảnh hưởng cache)"""
         try:
+            cached = self._cache.get(str(restaurant_id))
+            if cached is not None:
+                return cached.model_copy()
             doc = self.collection.find_one({'_id': ObjectId(restaurant_id)})
-            return self._to_model(doc) if doc else None
+            if not doc:
+                return None
+            restaurant = self._to_model(doc)
+            self._cache_put(restaurant)
+            return restaurant.model_copy()
         except Exception as e:
             print(f"Error finding restaurant by id: {e}")
             return None
@@ -152,10 +257,15 @@ class RestaurantService:
                 open_time=req.open_time,
                 close_time=req.close_time,
                 map_link=req.map_link,
+                location=req.location or self._location_from_map_link(req.map_link),
                 status=req.status if req.status is not None else True,
                 menu=menu_list
             )
-            insert_result = self.collection.insert_one(restaurant.to_mongo())
+            insert_result = self.collection.insert_one({
+                **restaurant.to_mongo(), **search_service.restaurant_fields(restaurant.restaurant_name)
+            })
+            self._sync_catalog(insert_result.inserted_id)
+            self.invalidate_promotions()
             return self.find_by_id(str(insert_result.inserted_id))
         except Exception as e:
             print(f"Error creating restaurant: {e}")
@@ -168,116 +278,157 @@ class RestaurantService:
             update_data = req.model_dump(by_alias=True, exclude_none=True)
             if not update_data:
                 raise ValueError('Không có dữ liệu để cập nhật')
+            if 'name' in update_data:
+                update_data.update(search_service.restaurant_fields(update_data['name']))
+            if 'location' not in update_data and req.map_link:
+                location = self._location_from_map_link(req.map_link)
+                if location:
+                    update_data['location'] = location.to_dict()
             
-            result = self.collection.update_one(
-                {'_id': ObjectId(restaurant_id)},
-                {'$set': update_data}
-            )
-            return self.find_by_id(restaurant_id) if result.matched_count > 0 else None
+            return self._update_and_cache(restaurant_id, {'$set': update_data})
         except Exception as e:
             raise ValueError(f'Lỗi DB khi cập nhật nhà hàng: {str(e)}')
 
+    def _update_and_cache(self, restaurant_id: str, update: Dict, query: Optional[Dict] = None,
+                          array_filters: Optional[List[Dict]] = None) -> Optional[Restaurant]:
+        """Update + tăng version, đưa bản mới vào cache (1 round trip).
+        None nếu không tìm thấy (hoặc không thỏa điều kiện thêm trong query)."""
+        update = {**update, '$inc': {**update.get('$inc', {}), 'version': 1}}
+        doc = self.collection.find_one_and_update(
+            {'_id': ObjectId(restaurant_id), **(query or {})},
+            update,
+            array_filters=array_filters,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            self._sync_catalog(restaurant_id, doc)
+        # Sau khi ghi xong cả document lẫn categories/foods: request đọc xen giữa không thể
+        # gắn nội dung cũ với version catalog (ETag) mới
+        self.invalidate_cache(restaurant_id)
+        if not doc:
+            return None
+        restaurant = self._to_model(doc)
+        self._cache_put(restaurant)
+        return restaurant.model_copy()
+
+    def find_nearby(self, lat: float, lng: float, radius_m: float, limit: int,
+                    after: Optional[Tuple[float, ObjectId]] = None) -> List[Dict]:
+        """
+        Nhà hàng đang hoạt động trong bán kính, gần nhất trước ($geoNear trên index 2dsphere, không đọc menu)
+        after = (distance, _id) của document cuối trang trước (keyset theo (distance, _id))
+        """
+        geo_near = {
+            'near': {'type': 'Point', 'coordinates': [lng, lat]},
+            'distanceField': 'distance',
+            'maxDistance': radius_m,
+            'spherical': True,
+            'query': {'status': True},
+        }
+        pipeline: List[Dict] = [{'$geoNear': geo_near}]
+        if after:
+            geo_near['minDistance'] = after[0]
+            pipeline.append({'$match': {'$or': [
+                {'distance': {'$gt': after[0]}},
+                {'distance': after[0], '_id': {'$gt': after[1]}},
+            ]}})
+        pipeline += [
+            {'$sort': {'distance': 1, '_id': 1}},
+            {'$limit': limit},
+            {'$project': {'menu': 0, 'searchGrams': 0, 'nameFolded': 0}},
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def _update_menu(self, restaurant_id: str, update: Dict, query: Optional[Dict] = None,
+                     array_filters: Optional[List[Dict]] = None) -> Optional[Restaurant]:
+        """Update 1 phần menu (positional / arrayFilters) + tăng menuVersion"""
+        update = {**update, '$inc': {**update.get('$inc', {}), 'menuVersion': 1}}
+        return self._update_and_cache(restaurant_id, update, query, array_filters)
+
+    def _rewrite_menu(self, restaurant_id: str, transform) -> Restaurant:
+        """
+        Ghi lại toàn bộ menu = transform(menu hiện tại) - compare-and-set theo menuVersion
+        Chỉ dùng cho thao tác đổi cấu trúc (chuyển món sang category khác, đổi thứ tự category)
+        """
+        for _ in range(self.MENU_CAS_RETRIES):
+            doc = self.collection.find_one({'_id': ObjectId(restaurant_id)}, {'menu': 1, 'menuVersion': 1})
+            if not doc:
+                raise ValueError('Không tìm thấy nhà hàng')
+            menu = transform(doc.get('menu') or [])
+            version_query = {'menuVersion': doc['menuVersion']} if 'menuVersion' in doc \
+                else {'menuVersion': {'$exists': False}}
+            updated = self._update_menu(restaurant_id, {'$set': {'menu': menu}}, version_query)
+            if updated:
+                return updated
+        raise ValueError('Menu đang được cập nhật đồng thời, vui lòng thử lại')
+
     def delete_restaurant_from_db(self, restaurant_id: str) -> bool:
         """Xóa document - Output là Bool"""
         try:
             result = self.collection.delete_one({'_id': ObjectId(restaurant_id)})
+            self._sync_catalog(restaurant_id)
+            self.invalidate_cache(restaurant_id)
             return result.deleted_count > 0
         except Exception as e:
             print(f"Error deleting restaurant: {e}")
             return False
 
-    def search_foods_by_name_and_category(self, query: str) -> List[Dict]:
-        """Tìm món ăn (Aggregation phức tạp) - CHỈ TÌM Ở QUÁN ĐANG HOẠT ĐỘNG - Trả về List Dict (đã format sẵn để dùng)"""
-        results: List[Dict] = []
-        
-        # 1. Pipeline Search món ăn
-        pipeline_food = [
-            {'$match': {'status': True}},  # CHỈ LẤY QUÁN ĐANG HOẠT ĐỘNG
-            {'$unwind': {'path': '$menu', 'preserveNullAndEmptyArrays': False}},
-            {'$unwind': {'path': '$menu.items', 'preserveNullAndEmptyArrays': False}},
-            {'$match': {'menu.items.name': {'$regex': query, '$options': 'i'}}},
-            {
-                '$project': {
-                    '_id': 1, 'name': 1, 'address': 1, 'hotline': 1, 
-                    'openTime': 1, 'closeTime': 1, 'mapLink': 1,
-                    'average_rating': 1,  # Thêm để hiển thị rating
-                    'total_reviews': 1,   # Thêm để hiển thị số đánh giá
-                    'category': '$menu.category', 'food': '$menu.items'
-                }
-            }
-        ]
-        food_results = list(self.collection.aggregate(pipeline_food))
-        
-        # Helper function để format kết quả search
-        def _format_item(item):
-            food_data = FoodMenuItem(**{
-                'name': item['food'].get('name'),
-                'price': float(item['food'].get('price', 0)),
-                'description': item['food'].get('description'),
-                'image': item['food'].get('image'),
-                'status': item['food'].get('status', True)
-            })
+    def _to_search_food_responses(self, food_docs: List[Dict]) -> List[Dict]:
+        """Format kết quả tìm món (foods documents) - thông tin nhà hàng lấy bằng 1 query cho cả trang"""
+        restaurant_ids = list({doc['restaurantId'] for doc in food_docs})
+        restaurants = {
+            doc['_id']: doc for doc in self.collection.find(
+                {'_id': {'$in': restaurant_ids}}, search_service.RESTAURANT_PROJECTION
+            )
+        } if restaurant_ids else {}
+
+        results = []
+        for doc in food_docs:
+            restaurant = restaurants.get(doc['restaurantId'])
+            if not restaurant:
+                continue
+            food_data = FoodMenuItem(
+                name=doc.get('name'),
+                price=float(doc.get('price') or 0),
+                description=doc.get('description') or None,
+                image=doc.get('imageUrl') or None,
+                status=doc.get('status', True)
+            )
             restaurant_simple = RestaurantSimpleResponse(**{
-                '_id': str(item['_id']),
-                'name': item.get('name'),
-                'address': item.get('address'),
-                'hotline': item.get('hotline'),
-                'openTime': item.get('openTime'),
-                'closeTime': item.get('closeTime'),
-                'mapLink': item.get('mapLink'),
-                'averageRating': item.get('average_rating', 0.0),
-                'totalReviews': item.get('total_reviews', 0),
+                '_id': str(restaurant['_id']),
+                'name': restaurant.get('name'),
+                'address': restaurant.get('address'),
+                'hotline': restaurant.get('hotline'),
+                'openTime': restaurant.get('openTime'),
+                'closeTime': restaurant.get('closeTime'),
+                'mapLink': restaurant.get('mapLink'),
+                'averageRating': round(restaurant.get('average_rating') or 0.0, 1),
+                'totalReviews': restaurant.get('total_reviews', 0),
             })
-            return SearchFoodResponse(
+            results.append(SearchFoodResponse(
                 food=food_data,
-                category=item.get('category'),
+                category=doc.get('category'),
                 restaurant=restaurant_simple
-            ).model_dump()
-
-        for item in food_results:
-            results.append(_format_item(item))
-        
-        # 2. Pipeline Search Category
-        pipeline_category = [
-            {'$match': {'status': True}},  # CHỈ LẤY QUÁN ĐANG HOẠT ĐỘNG
-            {'$unwind': {'path': '$menu', 'preserveNullAndEmptyArrays': False}},
-            {'$match': {'menu.category': {'$regex': query, '$options': 'i'}}},
-            {'$unwind': {'path': '$menu.items', 'preserveNullAndEmptyArrays': False}},
-            {
-                '$project': {
-                    '_id': 1, 'name': 1, 'address': 1, 'hotline': 1, 
-                    'openTime': 1, 'closeTime': 1, 'mapLink': 1,
-                    'average_rating': 1,  # Thêm để hiển thị rating
-                    'total_reviews': 1,   # Thêm để hiển thị số đánh giá
-                    'category': '$menu.category', 'food': '$menu.items'
-                }
-            }
-        ]
-        category_results = list(self.collection.aggregate(pipeline_category))
-        
-        # Tránh trùng lặp
-        added_keys = set(f"{item['_id']}_{item['category']}_{item['food']['name']}" for item in food_results)
-        
-        for item in category_results:
-            key = f"{item['_id']}_{item['category']}_{item['food']['name']}"
-            if key not in added_keys:
-                results.append(_format_item(item))
-                added_keys.add(key)
-        
+            ).model_dump())
         return results
 
-    def search_restaurants_by_name(self, query: str) -> List[Dict]:
-        """Tìm nhà hàng theo tên (CHỈ QUÁN ĐANG HOẠT ĐỘNG) - Trả về List Simple Response Dict"""
-        restaurants_cursor = self.collection.find({
-            'name': {'$regex': query, '$options': 'i'},
-            'status': True  # Chỉ tìm quán đang hoạt động
-        })
-        return [self._to_simple_response(self._to_model(doc)) for doc in restaurants_cursor]
+    def search_foods_by_name_and_category(self, query: str, page: Optional[int] = None,
+                                          limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """Tìm món ăn theo tên món / category (không phân biệt dấu, xếp hạng theo độ liên quan)
+        - CHỈ TÌM Ở QUÁN ĐANG HOẠT ĐỘNG - Trả về (List Dict đã format, tổng số kết quả)"""
+        food_docs, total = search_service.search_foods(query, page, limit)
+        return self._to_search_food_responses(food_docs), total
+
+    def search_restaurants_by_name(self, query: str, page: Optional[int] = None,
+                                   limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """Tìm nhà hàng theo tên (CHỈ QUÁN ĐANG HOẠT ĐỘNG) - Trả về (List Simple Response Dict, tổng số)"""
+        docs, total = search_service.search_restaurants(query, False, page, limit)
+        return [self._to_simple_response(self._to_model(doc)) for doc in docs], total
 
-    def admin_search_restaurants_by_name(self, query: str) -> List[Dict]:
-        """Admin tìm nhà hàng theo tên (TẤT CẢ) - Trả về List Simple Response Dict"""
-        restaurants_cursor = self.collection.find({'name': {'$regex': query, '$options': 'i'}})
-        return [self._to_simple_response(self._to_model(doc)) for doc in restaurants_cursor]
+    def admin_search_restaurants_by_name(self, query: str, page: Optional[int] = None,
+                                         limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """Admin tìm nhà hàng theo tên (TẤT CẢ) - Trả về (List Simple Response Dict, tổng số)"""
+        docs, total = search_service.search_restaurants(query, True, page, limit)
+        return [self._to_simple_response(self._to_model(doc)) for doc in docs], total
 
     def _exists_by_name_address(self, name: Optional[str], address: Optional[str], exclude_id: Optional[str] = None) -> bool:
         """Kiểm tra nhà hàng trùng theo (name + address) - không phân biệt hoa thường"""
@@ -383,22 +534,31 @@ class RestaurantService:
         
         return {'message': 'Xóa nhà hàng thành công'}
 
-    def search_for_users(self, query: str) -> List[Dict]:
-        """Search cho USER: Chỉ cần gọi CRUD food search"""
+    def search_for_users(self, query: str, page: Optional[int] = None,
+                         limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """Search cho USER: Chỉ cần gọi CRUD food search - Trả về (kết quả, tổng số)"""
         try:
-            return self.search_foods_by_name_and_category(query)
+            return self.search_foods_by_name_and_category(query, page, limit)
+        except ValueError:
+            raise
         except Exception as e:
             raise ValueError(f'Lỗi khi tìm kiếm: {str(e)}')
     
-    def search_for_admin(self, query: str) -> Dict:
+    def search_for_admin(self, query: str, page: Optional[int] = None, limit: Optional[int] = None) -> Dict:
         """Search cho ADMIN: Kết hợp 2 hàm CRUD khác nhau (TẤT CẢ NHÀ HÀNG)"""
         try:
             # Logic: Admin cần cả 2 luồng dữ liệu riêng biệt
+            restaurants, total_restaurants = self.admin_search_restaurants_by_name(query, page, limit)  # Lấy tất cả
+            foods, total_foods = self.search_foods_by_name_and_category(query, page, limit)  # Vẫn chỉ active (để test search)
             result = {
-                'restaurants': self.admin_search_restaurants_by_name(query),  # Lấy tất cả
-                'foods': self.search_foods_by_name_and_category(query)  # Vẫn chỉ active (để test search)
+                'restaurants': restaurants,
+                'foods': foods,
+                'totalRestaurants': total_restaurants,
+                'totalFoods': total_foods,
             }
             return result
+        except ValueError:
+            raise
         except Exception as e:
             raise ValueError(f'Lỗi khi tìm kiếm: {str(e)}')
 
@@ -409,11 +569,9 @@ class RestaurantService:
             if not restaurant:
                 raise ValueError(f'Không tìm thấy nhà hàng {restaurant_id}')
             
-            # Tìm food item trong menu
-            for category in restaurant.menu:
-                for item in category.items:
-                    if item.name.lower() == food_name.lower():
-                        return float(item.price)
+            entry = self.find_food(restaurant, food_name)
+            if entry:
+                return entry.price
             
             raise ValueError(f'Không tìm thấy món ăn "{food_name}" trong nhà hàng')
         except Exception as e:
@@ -427,15 +585,10 @@ class RestaurantService:
             raise ValueError('Không tìm thấy nhà hàng')
         
         # Cập nhật trạng thái
-        result = self.collection.update_one(
-            {'_id': ObjectId(restaurant_id)},
-            {'$set': {'status': status}}
-        )
-        
-        if result.matched_count == 0:
+        updated_restaurant = self._update_and_cache(restaurant_id, {'$set': {'status': status}})
+        if not updated_restaurant:
             raise ValueError('Không thể cập nhật trạng thái nhà hàng')
         
-        updated_restaurant = self.find_by_id(restaurant_id)
         action = "kích hoạt" if status else "vô hiệu hóa"
         
         return {
@@ -443,371 +596,393 @@ class RestaurantService:
             'restaurant': self._to_simple_response(updated_restaurant)
         }
 
+    def get_nearby_restaurants(self, lat: Optional[float], lng: Optional[float], radius_km: Optional[float] = None,
+                               limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Nhà hàng gần vị trí người dùng (gần nhất trước) + khoảng cách thực + ETA giao hàng
+        Trả về (List Simple Response Dict kèm distance/deliveryTime/etaMinutes, nextCursor)
+        """
+        origin = parse_origin(lat, lng)
+        if origin is None:
+            raise ValueError('Thiếu tham số lat/lng')
+        radius_km = config.NEARBY_DEFAULT_RADIUS_KM if radius_km is None else radius_km
+        if radius_km <= 0 or radius_km > config.NEARBY_MAX_RADIUS_KM:
+            raise ValueError(f'radius phải trong khoảng (0, {config.NEARBY_MAX_RADIUS_KM:g}] km')
+        limit = normalize_limit(limit) or DEFAULT_PAGE_SIZE
+        after = None
+        if cursor:
+            distance, doc_id = decode_sort_cursor(cursor)
+            try:
+                after = (float(distance), ObjectId(doc_id))
+            except Exception:
+                raise ValueError('Cursor không hợp lệ')
+
+        docs = self.find_nearby(origin[0], origin[1], radius_km * 1000, limit + 1, after)
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_sort_cursor(docs[-1]['distance'], docs[-1]['_id'])
+
+        results = []
+        for doc in docs:
+            distance_km = doc.pop('distance') / 1000
+            item = self._to_simple_response(self._to_model(doc))
+            item['distance'] = format_distance_km(distance_km)
+            item.update(delivery_eta_service.estimate(doc['_id'], distance_km))
+            results.append(item)
+        return results, next_cursor
+
+    # ==================== Menu (thao tác trên từng món / category) ====================
+
+    def _get_menu_item(self, restaurant_id: str, food_name: str) -> Tuple[Restaurant, FoodIndexEntry]:
+        restaurant = self.find_by_id(restaurant_id)
+        if not restaurant:
+            raise ValueError('Không tìm thấy nhà hàng')
+        entry = self.find_food(restaurant, food_name)
+        if not entry:
+            raise ValueError(f'Không tìm thấy món "{food_name}" trong menu')
+        return restaurant, entry
+
+    @staticmethod
+    def _item_filters(food_name: str) -> List[Dict]:
+        """arrayFilters trỏ tới món theo tên gốc: $[c] = category chứa món, $[i] = món"""
+        return [{'c.items.name': food_name}, {'i.name': food_name}]
+
+    def _menu_updated(self, updated: Optional[Restaurant], restaurant_id: str) -> Dict:
+        """Kết quả update menu: None = document đã đổi giữa lúc đọc và ghi (cache cũ / ghi đồng thời)"""
+        if not updated:
+            self.invalidate_cache(restaurant_id)
+            raise ValueError('Menu vừa thay đổi, vui lòng tải lại và thử lại')
+        return self._to_full_response(updated)
+
+    def add_menu_item(self, restaurant_id: str, req: AddFoodToMenuRequest) -> Dict:
+        """Thêm 1 món vào category (category chưa có → tạo mới ở cuối menu) - $push, không ghi lại menu"""
+        restaurant = self.find_by_id(restaurant_id)
+        if not restaurant:
+            raise ValueError('Không tìm thấy nhà hàng')
+        name = ' '.join((req.name or '').split())
+        category = ' '.join((req.category or '').split())
+        if not name or not category:
+            raise ValueError('Tên món và category không được để trống')
+        if self.find_food(restaurant, name):
+            raise ValueError(f'Món "{name}" đã có trong menu')
+        if req.price < 0:
+            raise ValueError('Giá món không được âm')
+
+        item = FoodMenuItem(
+            name=name, price=req.price, description=req.description, image=req.image,
+            status=req.status if req.status is not None else True
+        ).to_dict()
+        existing = next(
+            (c.category for c in restaurant.menu or []
+             if self.normalize_food_name(c.category) == self.normalize_food_name(category)),
+            None
+        )
+        if existing is not None:
+            updated = self._update_menu(
+                restaurant_id, {'$push': {'menu.$[c].items': item}},
+                query={'menu.category': existing, 'menu.items.name': {'$ne': name}},
+                array_filters=[{'c.category': existing}]
+            )
+        else:
+            updated = self._update_menu(
+                restaurant_id, {'$push': {'menu': {'category': category, 'items': [item]}}},
+                query={'menu.category': {'$ne': category}, 'menu.items.name': {'$ne': name}}
+            )
+        return self._menu_updated(updated, restaurant_id)
+
+    def update_menu_item(self, restaurant_id: str, food_name: str, req: UpdateFoodInMenuRequest) -> Dict:
+        """
+        Sửa 1 món (food_name = tên hiện tại): chỉ $set các field thay đổi qua arrayFilters
+        Đổi category → chuyển món (ghi lại menu, compare-and-set theo menuVersion)
+        """
+        restaurant, entry = self._get_menu_item(restaurant_id, food_name)
+        changes = req.model_dump(exclude_none=True, exclude={'category'})
+        if changes.get('price', 0) < 0:
+            raise ValueError('Giá món không được âm')
+        if 'name' in changes:
+            changes['name'] = ' '.join(changes['name'].split())
+            if not changes['name']:
+                raise ValueError('Tên món không được để trống')
+            other = self.find_food(restaurant, changes['name'])
+            if other and other.name != entry.name:
+                raise ValueError(f'Món "{changes["name"]}" đã có trong menu')
+
+        new_category = ' '.join((req.category or '').split())
+        if new_category and self.normalize_food_name(new_category) != self.normalize_food_name(entry.category):
+            return self._menu_updated(
+                self._rewrite_menu(restaurant_id, lambda menu: self._move_item(menu, entry.name, new_category, changes)),
+                restaurant_id
+            )
+        if not changes:
+            raise ValueError('Không có dữ liệu để cập nhật')
+
+        query = {'menu.items.name': entry.name}
+        if changes.get('name', entry.name) != entry.name:
+            query = {'$and': [query, {'menu.items.name': {'$ne': changes['name']}}]}
+        updated = self._update_menu(
+            restaurant_id,
+            {'$set': {f'menu.$[c].items.$[i].{field}': value for field, value in changes.items()}},
+            query=query, array_filters=self._item_filters(entry.name)
+        )
+        return self._menu_updated(updated, restaurant_id)
+
+    @staticmethod
+    def _move_item(menu: List[Dict], food_name: str, category: str, changes: Dict) -> List[Dict]:
+        """Menu mới sau khi chuyển món sang category khác (category chưa có → tạo ở cuối)"""
+        menu = [dict(c, items=list(c.get('items') or [])) for c in menu]
+        item = None
+        for c in menu:
+            for i, current in enumerate(c['items']):
+                if current.get('name') == food_name:
+                    item = {**c['items'].pop(i), **changes}
+                    break
+            if item:
+                break
+        if item is None:
+            raise ValueError(f'Không tìm thấy món "{food_name}" trong menu')
+        key = RestaurantService.normalize_food_name(category)
+        target = next((c for c in menu if RestaurantService.normalize_food_name(c.get('category')) == key), None)
+        if target is None:
+            menu.append({'category': category, 'items': [item]})
+        else:
+            target['items'].append(item)
+        return menu
+
+    def remove_menu_item(self, restaurant_id: str, food_name: str) -> Dict:
+        """Xóa 1 món khỏi menu - $pull trong category chứa món"""
+        _, entry = self._get_menu_item(restaurant_id, food_name)
+        updated = self._update_menu(
+            restaurant_id, {'$pull': {'menu.$[c].items': {'name': entry.name}}},
+            query={'menu.items.name': entry.name}, array_filters=[{'c.items.name': entry.name}]
+        )
+        return self._menu_updated(updated, restaurant_id)
+
+    def toggle_menu_item_status(self, restaurant_id: str, food_name: str, status: bool) -> Dict:
+        """Bật/tắt 1 món (hết món / còn món) - $set đúng 1 field"""
+        _, entry = self._get_menu_item(restaurant_id, food_name)
+        updated = self._update_menu(
+            restaurant_id, {'$set': {'menu.$[c].items.$[i].status': bool(status)}},
+            query={'menu.items.name': entry.name}, array_filters=self._item_filters(entry.name)
+        )
+        return self._menu_updated(updated, restaurant_id)
+
+    def move_menu_category(self, restaurant_id: str, category: str, position: int) -> Dict:
+        """Đổi vị trí 1 category trong menu (position tính từ 0, lớn hơn số category → cuối menu)"""
+        if position < 0:
+            raise ValueError('position phải >= 0')
+        key = self.normalize_food_name(category)
+
+        def transform(menu: List[Dict]) -> List[Dict]:
+            index = next((i for i, c in enumerate(menu) if self.normalize_food_name(c.get('category')) == key), None)
+            if index is None:
+                raise ValueError(f'Không tìm thấy category "{category}" trong menu')
+            menu = list(menu)
+            moved = menu.pop(index)
+            menu.insert(min(position, len(menu)), moved)
+            return menu
+
+        return self._menu_updated(self._rewrite_menu(restaurant_id, transform), restaurant_id)
+
+    # Ảnh mặc định cho promotion khi món đầu tiên không có ảnh (theo từ khóa trong tên nhà hàng)
+    PROMOTION_FALLBACK_IMAGES = [
+        (("kfc",), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462793/Screenshot_2025-11-29_092812_fgyur2.png"),
+        (("mcdonald",), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462710/Screenshot_2025-11-30_072620_ak9ylz.png"),
+        (("phúc long", "phuclong"), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462712/Screenshot_2025-11-30_072914_omsuvg.png"),
+        (("sushi",), "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462283/Screenshot_2025-11-30_072347_zzyj7x.png"),
+        (("pizza",), "https://images.unsplash.com/photo-1513104890138-7c749659a591?q=80&w=800"),
+        (("bánh mì", "banh mi"), "https://images.unsplash.com/photo-1541529086526-db283c563270?q=80&w=800"),
+        (("phở", "pho"), "https://images.unsplash.com/photo-1582878826618-c05326eff935?q=80&w=800"),
+        (("coffee",), "https://images.unsplash.com/photo-1509042239860-f550ce710b93?q=80&w=800"),
+    ]
+    PROMOTION_DEFAULT_IMAGE = "https://images.unsplash.com/photo-1513104890138-7c749659a591?q=80&w=800"
+
+    def invalidate_promotions(self) -> None:
+        """Xóa cache promotions + tăng version catalog (ETag) - gọi SAU khi ghi nhà hàng / review / voucher"""
+        self._promotions_cache.clear()
+        catalog_version_service.bump()
+
+    def promotions_rotation(self) -> Tuple[int, int]:
+        """(bucket hiện tại, số giây còn lại của bucket) - voucher hiển thị đổi theo từng bucket"""
+        period = max(config.PROMOTIONS_ROTATION_SECONDS, 1)
+        now = int(time.time())
+        return now // period, period - now % period
+
+    def promotions_max_age(self) -> int:
+        """Số giây client/CDN được cache response promotions (không vượt quá bucket hiện tại)"""
+        return max(0, min(int(config.PROMOTIONS_CACHE_TTL_SECONDS), self.promotions_rotation()[1]))
+
+    @staticmethod
+    def _promotion_action(voucher: Optional[Dict]) -> str:
+        """Nhãn ưu đãi hiển thị từ voucher"""
+        if not voucher:
+            # Fallback nếu không có vouchers
+            return "Ưu đãi đặc biệt"
+        voucher_type = voucher.get('type', 'Percent')
+        voucher_value = voucher.get('value', 10)
+        if voucher_type == 'Freeship':
+            return "Free Ship"
+        if voucher_type == 'Fixed':
+            # Format: Giảm 30K
+            return f"Giảm {int(voucher_value/1000)}K"
+        if voucher_type == 'Percent':
+            # Format: Giảm 15%
+            return f"Giảm {int(voucher_value)}%"
+        return "Ưu đãi"
+
+    def _promotion_image(self, restaurant_name: str, food_image: Optional[str], map_link: Optional[str]) -> str:
+        """Lấy image từ food hoặc restaurant, fallback theo tên nhà hàng"""
+        if food_image:
+            return food_image
+        if map_link:
+            return map_link
+        name_lower = (restaurant_name or '').lower()
+        for keywords, url in self.PROMOTION_FALLBACK_IMAGES:
+            if any(k in name_lower for k in keywords):
+                return url
+        return self.PROMOTION_DEFAULT_IMAGE
+
     def get_promotions(self, limit: int = 8) -> List[Dict]:
         """
         Lấy danh sách promotions từ restaurants có reviews tốt nhất
-        Dựa trên reviews_data.json thông qua reviews_collection
+        Dựa trên rating lưu sẵn trên restaurant (average_rating / total_reviews)
         Nếu không có reviews, vẫn hiển thị restaurants với promotions mặc định
+
+        - 2 query cố định: 1 aggregation (lọc + sắp xếp + limit + món đầu tiên) và 1 query vouchers
+        - Voucher của mỗi nhà hàng chọn "ngẫu nhiên" theo seed (bucket, restaurantId) → cùng 1 bucket
+          PROMOTIONS_ROTATION_SECONDS luôn ra cùng kết quả, cache được ở HTTP layer
+        - Kết quả cache in-process PROMOTIONS_CACHE_TTL_SECONDS, xóa khi nhà hàng/review/voucher đổi
+        - Lỗi DB được raise (controller trả 500)
         """
         try:
-            # Lấy tất cả restaurants đang hoạt động
-            restaurants = self.find_all()
-            active_restaurants = [r for r in restaurants if r.status]
-            
-            if not active_restaurants:
-                return []
-            
-            # Lấy reviews cho mỗi restaurant và tính điểm
+            bucket, _ = self.promotions_rotation()
+            cache_key = (limit, bucket)
+            cached = self._promotions_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            pipeline = [
+                {'$match': {'status': True}},
+                {'$project': {
+                    'name': 1,
+                    'mapLink': 1,
+                    'average_rating': 1,
+                    'total_reviews': 1,
+                    # Món đầu tiên của category đầu tiên
+                    'firstFood': {'$arrayElemAt': [{'$ifNull': [{'$arrayElemAt': ['$menu.items', 0]}, []]}, 0]},
+                    'hasReviews': {'$gt': [{'$ifNull': ['$total_reviews', 0]}, 0]},
+                }},
+                # Sắp xếp theo rating và số lượng reviews (restaurants có reviews được ưu tiên)
+                {'$sort': {'hasReviews': -1, 'average_rating': -1, 'total_reviews': -1, '_id': 1}},
+                {'$limit': max(int(limit), 0) or 1},
+            ]
+            docs = list(self.collection.aggregate(pipeline))
+
+            # Danh sách vouchers đang active (chỉ voucher áp dụng chung) - 1 query cho cả feed
+            active_vouchers = list(vouchers_collection.find(
+                {'active': True, 'first_order_only': False},
+                {'type': 1, 'value': 1}
+            ).sort('_id', 1))
+
             promotions = []
-            for restaurant in active_restaurants:
-                if not restaurant.restaurant_id:
-                    continue
-                
-                restaurant_id = restaurant.restaurant_id
-                restaurant_id_str = str(restaurant_id)
-                
-                # Đếm số reviews và tính rating trung bình
-                # restaurantId trong MongoDB là ObjectId, không phải string
-                reviews = list(reviews_collection.find({'restaurantId': restaurant_id}))
-                total_reviews = len(reviews)
-                
-                # Tính rating trung bình (mặc định 4.0 nếu không có reviews)
-                if total_reviews > 0:
-                    avg_rating = sum(r.get('rating', 0) for r in reviews) / total_reviews
-                else:
-                    avg_rating = 4.0  # Rating mặc định cho restaurants chưa có reviews
-                    total_reviews = 0
-                
-                # Lấy món ăn đầu tiên từ menu làm foodId
-                food_id = None
-                food_name = None
-                food_image = None
-                if restaurant.menu and len(restaurant.menu) > 0:
-                    first_category = restaurant.menu[0]
-                    if first_category.items and len(first_category.items) > 0:
-                        first_food = first_category.items[0]
-                        food_id = f"{restaurant_id_str}-{first_food.name}" if first_food.name else None
-                        food_name = first_food.name
-                        food_image = first_food.image if hasattr(first_food, 'image') and first_food.image else None
-                
-                # Lấy danh sách vouchers đang active từ database
-                active_vouchers = list(vouchers_collection.find({
-                    'active': True,
-                    'first_order_only': False  # Chỉ lấy voucher áp dụng chung
-                }))
-                
-                # Tạo action dựa trên voucher thực
+            for doc in docs[:limit]:
+                restaurant_id_str = str(doc['_id'])
+                restaurant_name = doc.get('name') or ''
+                first_food = doc.get('firstFood') or {}
+                food_name = first_food.get('name')
+                food_id = f"{restaurant_id_str}-{food_name}" if food_name else None
+
+                total_reviews = max(doc.get('total_reviews') or 0, 0)
+                # Rating trung bình (mặc định 4.0 nếu không có reviews)
+                avg_rating = round(doc.get('average_rating') or 0.0, 1) if total_reviews > 0 else 4.0
+
+                voucher = None
                 if active_vouchers:
-                    # Random một voucher từ danh sách
-                    voucher = random.choice(active_vouchers)
-                    voucher_type = voucher.get('type', 'Percent')
-                    voucher_value = voucher.get('value', 10)
-                    
-                    if voucher_type == 'Freeship':
-                        action = "Free Ship"
-                    elif voucher_type == 'Fixed':
-                        # Format: Giảm 30K
-                        action = f"Giảm {int(voucher_value/1000)}K"
-                    elif voucher_type == 'Percent':
-                        # Format: Giảm 15%
-                        action = f"Giảm {int(voucher_value)}%"
-                    else:
-                        action = "Ưu đãi"
-                else:
-                    # Fallback nếu không có vouchers
-                    action = "Ưu đãi đặc biệt"
-                
-                # Lấy image từ food hoặc restaurant
-                image_url = food_image
-                if not image_url and hasattr(restaurant, 'map_link') and restaurant.map_link:
-                    image_url = restaurant.map_link
-                
-                # Fallback images dựa trên tên nhà hàng
-                if not image_url:
-                    name_lower = restaurant.restaurant_name.lower()
-                    if "kfc" in name_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462793/Screenshot_2025-11-29_092812_fgyur2.png"
-                    elif "mcdonald" in name_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462710/Screenshot_2025-11-30_072620_ak9ylz.png"
-                    elif "phúc long" in name_lower or "phuclong" in name_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462712/Screenshot_2025-11-30_072914_omsuvg.png"
-                    elif "sushi" in name_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764462283/Screenshot_2025-11-30_072347_zzyj7x.png"
-                    elif "pizza" in name_lower:
-                        image_url = "https://images.unsplash.com/photo-1513104890138-7c749659a591?q=80&w=800"
-                    elif "bánh mì" in name_lower or "banh mi" in name_lower:
-                        image_url = "https://images.unsplash.com/photo-1541529086526-db283c563270?q=80&w=800"
-                    elif "phở" in name_lower or "pho" in name_lower:
-                        image_url = "https://images.unsplash.com/photo-1582878826618-c05326eff935?q=80&w=800"
-                    elif "coffee" in name_lower:
-                        image_url = "https://images.unsplash.com/photo-1509042239860-f550ce710b93?q=80&w=800"
-                    else:
-                        image_url = "https://images.unsplash.com/photo-1513104890138-7c749659a591?q=80&w=800"
-                
+                    voucher = random.Random(f"{bucket}:{restaurant_id_str}").choice(active_vouchers)
+
                 promotions.append({
                     'id': restaurant_id_str,
-                    'name': food_name or restaurant.restaurant_name,  # Tên món ăn (hoặc fallback tên nhà hàng)
+                    'name': food_name or restaurant_name,  # Tên món ăn (hoặc fallback tên nhà hàng)
                     'foodName': food_name,  # Tên món ăn
-                    'restaurantName': restaurant.restaurant_name,  # Tên nhà hàng
-                    'vendor': restaurant.restaurant_name,  # Vendor là tên nhà hàng
-                    'image': image_url,
-                    'action': action,
+                    'restaurantName': restaurant_name,  # Tên nhà hàng
+                    'vendor': restaurant_name,  # Vendor là tên nhà hàng
+                    'image': self._promotion_image(restaurant_name, first_food.get('image'), doc.get('mapLink')),
+                    'action': self._promotion_action(voucher),
                     'foodId': food_id or restaurant_id_str,
-                    'rating': round(avg_rating, 1),
+                    'rating': avg_rating,
                     'totalReviews': total_reviews
                 })
-            
-            # Sắp xếp theo rating và số lượng reviews (restaurants có reviews được ưu tiên)
-            promotions.sort(key=lambda x: (x['totalReviews'] > 0, x['rating'], x['totalReviews']), reverse=True)
-            
-            # Giới hạn số lượng
-            return promotions[:limit]
-            
+
+            self._promotions_cache.put(cache_key, promotions)
+            return promotions
+
         except Exception as e:
             print(f"Error getting promotions: {e}")
             import traceback
             traceback.print_exc()
-            return []
+            # Không trả [] - response được cache theo ETag, list rỗng do lỗi sẽ bị giữ lại
+            raise
 
-    def get_categories(self) -> List[Dict]:
+    def get_categories(self, seed: Optional[str] = None) -> List[Dict]:
         """
-        Lấy danh sách categories từ tất cả restaurants
-        Mỗi category sẽ có một hình ảnh random từ items trong category đó
-        Loại bỏ các categories trùng lặp bằng cách normalize tên
+        Lấy danh sách categories (đã chuẩn hóa tên, loại trùng) từ materialized view categories
+        Mỗi category có một hình ảnh random từ mẫu ảnh món trong category đó
+        (seed: cùng seed → cùng ảnh, để response ổn định theo ETag)
+        Lỗi DB được raise (không trả [] - tránh list rỗng bị client/CDN cache lại)
         """
         try:
-            import random
-            
-            # Lấy tất cả restaurants đang hoạt động
-            restaurants = self.find_all()
-            active_restaurants = [r for r in restaurants if r.status]
-            
-            # Dictionary để lưu categories và danh sách images
-            # Key là normalized name để tránh trùng lặp
-            categories_dict: Dict[str, Dict] = {}
-            
-            def normalize_category_name(name: str) -> str:
-                """Chuẩn hóa tên category để loại bỏ trùng lặp"""
-                if not name:
-                    return ""
-                # Chuyển về lowercase và loại bỏ khoảng trắng thừa
-                normalized = name.strip().lower()
-                # Loại bỏ các ký tự đặc biệt và chuẩn hóa
-                normalized = normalized.replace('  ', ' ')
-                return normalized
-            
-            # Duyệt qua tất cả restaurants và thu thập categories
-            for restaurant in active_restaurants:
-                if not restaurant.menu:
-                    continue
-                
-                for menu_category in restaurant.menu:
-                    category_name = menu_category.category
-                    if not category_name:
-                        continue
-                    
-                    # Chuẩn hóa tên category để loại bỏ trùng lặp
-                    normalized_name = normalize_category_name(category_name)
-                    if not normalized_name:
-                        continue
-                    
-                    # Sử dụng normalized name làm key, nhưng lưu original name để hiển thị
-                    if normalized_name not in categories_dict:
-                        categories_dict[normalized_name] = {
-                            'original_name': category_name,
-                            'images': []
-                        }
-                    
-                    # Thu thập images từ items trong category
-                    if menu_category.items:
-                        for item in menu_category.items:
-                            # Kiểm tra image từ FoodMenuItem
-                            item_image = None
-                            if isinstance(item, FoodMenuItem):
-                                item_image = item.image
-                            elif isinstance(item, dict):
-                                item_image = item.get('image')
-                            elif hasattr(item, 'image'):
-                                item_image = item.image
-                            
-                            if item_image and item_image not in categories_dict[normalized_name]['images']:
-                                # Chỉ thêm nếu chưa có trong list để tránh duplicate images
-                                categories_dict[normalized_name]['images'].append(item_image)
-            
-            # Tạo danh sách categories với hình ảnh random
-            categories = []
-            seen_names = set()  # Track để đảm bảo không có duplicate
-            
-            for normalized_name, category_data in categories_dict.items():
-                original_name = category_data['original_name']
-                images = category_data['images']
-                
-                # Kiểm tra xem đã có category này chưa (theo original name)
-                if original_name in seen_names:
-                    continue
-                
-                seen_names.add(original_name)
-                
-                # Chọn một hình ảnh random từ danh sách
-                image_url = random.choice(images) if images else None
-                
-                # Nếu không có hình ảnh, sử dụng fallback dựa trên tên category
-                if not image_url:
-                    category_lower = normalized_name
-                    if "phở" in category_lower or "pho" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070845_fcckkb.png"
-                    elif "bún" in category_lower or "bun" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070845_fcckkb.png"
-                    elif "cơm" in category_lower or "com" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764460831/Screenshot_2025-11-30_070009_s8hzez.png"
-                    elif "đồ uống" in category_lower or "drink" in category_lower or ("trà" in category_lower and "trà sữa" not in category_lower and "trà trái" not in category_lower):
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070905_sde2iv.png"
-                    elif "bánh" in category_lower or "banh" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070813_ldmmy9.png"
-                    elif "xôi" in category_lower or "xoi" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764460831/Screenshot_2025-11-30_070009_s8hzez.png"
-                    elif "lẩu" in category_lower or "lau" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461746/Screenshot_2025-11-30_070845_fcckkb.png"
-                    elif "nướng" in category_lower or "nuong" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_070923_miqawt.png"
-                    elif "xào" in category_lower or "xao" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_070923_miqawt.png"
-                    elif "kem" in category_lower:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_071007_euepva.png"
-                    else:
-                        image_url = "https://res.cloudinary.com/dvobb8q7p/image/upload/v1764461748/Screenshot_2025-11-30_070923_miqawt.png"
-                
-                # Tạo ID từ normalized name
-                category_id = normalized_name.replace(' ', '-').replace('đ', 'd').replace('ộ', 'o').replace('ồ', 'o').replace('á', 'a').replace('à', 'a').replace('ả', 'a').replace('ã', 'a').replace('ạ', 'a')
-                
-                categories.append({
-                    'id': category_id,
-                    'name': original_name,  # Sử dụng original name để hiển thị
-                    'image': image_url
-                })
-            
-            # Sắp xếp theo tên để có thứ tự nhất quán
-            categories.sort(key=lambda x: x['name'])
-            
-            return categories
-            
+            return category_service.get_categories(seed)
         except Exception as e:
             print(f"Error getting categories: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+            raise
 
-    def get_all_foods(self) -> List[Dict]:
-        """
-        Lấy tất cả foods từ tất cả restaurants đang hoạt động
-        Format: [{id, name, price, description, imageUrl, category, restaurantId, rating, ...}]
-        """
+    def _sync_catalog(self, restaurant_id, restaurant_doc: Optional[Dict] = None) -> None:
+        """Cập nhật categories + foods + autocomplete sau khi nhà hàng thay đổi
+        (lệch thì jobs/category_rebuild.py / jobs/food_rebuild.py sửa, autocomplete tự dựng lại định kỳ)"""
         try:
-            foods = []
-            restaurants = self.find_all()
-            active_restaurants = [r for r in restaurants if r.status]
-            
-            for restaurant in active_restaurants:
-                if not restaurant.restaurant_id or not restaurant.menu:
-                    continue
-                
-                restaurant_id_str = str(restaurant.restaurant_id)
-                
-                # Lấy reviews để tính rating
-                reviews = list(reviews_collection.find({'restaurantId': restaurant.restaurant_id}))
-                
-                for menu_category in restaurant.menu:
-                    category_name = menu_category.category
-                    if not menu_category.items:
-                        continue
-                    
-                    for item in menu_category.items:
-                        # Tạo unique ID cho food: restaurantId-foodName
-                        food_id = f"{restaurant_id_str}-{item.name}" if item.name else None
-                        if not food_id:
-                            continue
-                        
-                        # Tính rating từ reviews (có thể lấy từ food name hoặc restaurant)
-                        # Tạm thời dùng restaurant rating
-                        avg_rating = sum(r.get('rating', 0) for r in reviews) / len(reviews) if reviews else 4.0
-                        
-                        foods.append({
-                            'id': food_id,
-                            'name': item.name,
-                            'price': float(item.price) if item.price else 0.0,
-                            'description': item.description or '',
-                            'imageUrl': item.image or '',
-                            'category': category_name,
-                            'restaurantId': restaurant_id_str,
-                            'restaurantName': restaurant.restaurant_name,
-                            'rating': round(avg_rating, 1),
-                            'distance': '1.5',  # Default
-                            'deliveryTime': '15-20 phút',  # Default
-                            'status': item.status if hasattr(item, 'status') else True
-                        })
-            
-            return foods
-            
+            category_service.refresh_restaurant(restaurant_id, restaurant_doc)
         except Exception as e:
-            print(f"Error getting all foods: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+            print(f"Warning: Could not refresh categories for restaurant {restaurant_id}: {e}")
+        try:
+            food_service.sync_restaurant(restaurant_id, restaurant_doc)
+        except Exception as e:
+            print(f"Warning: Could not sync foods for restaurant {restaurant_id}: {e}")
+        try:
+            autocomplete_service.refresh_restaurant(restaurant_id, restaurant_doc)
+        except Exception as e:
+            print(f"Warning: Could not refresh autocomplete for restaurant {restaurant_id}: {e}")
+
+    def get_all_foods(self, category: Optional[str] = None, restaurant_id: Optional[str] = None,
+                      min_price: Optional[float] = None, max_price: Optional[float] = None,
+                      min_rating: Optional[float] = None, sort: Optional[str] = None,
+                      limit: Optional[int] = None, cursor: Optional[str] = None,
+                      lat: Optional[float] = None, lng: Optional[float] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Lấy foods của restaurants đang hoạt động (từ collection foods) - có lọc, sort, phân trang keyset
+        Format: [{id, name, price, description, imageUrl, category, restaurantId, rating, distance, deliveryTime, ...}]
+        """
+        return food_service.get_foods(category, restaurant_id, min_price, max_price, min_rating, sort, limit, cursor,
+                                      lat, lng)
 
-    def get_food_by_id(self, food_id: str) -> Optional[Dict]:
+    def get_food_by_id(self, food_id: str, lat: Optional[float] = None,
+                       lng: Optional[float] = None) -> Optional[Dict]:
         """
         Lấy food item theo ID
         Format food_id: "restaurantId-foodName"
         """
+        parse_origin(lat, lng)  # Vị trí sai → ValueError (400), không nuốt lỗi như lỗi DB
         try:
-            # Parse food_id: format "restaurantId-foodName"
-            parts = food_id.split('-', 1)
-            if len(parts) != 2:
-                return None
-            
-            restaurant_id_str, food_name = parts
-            try:
-                restaurant_id = ObjectId(restaurant_id_str)
-            except:
-                return None
-            
-            # Tìm restaurant
-            restaurant = self.find_by_id(restaurant_id_str)
-            if not restaurant or not restaurant.status or not restaurant.menu:
-                return None
-            
-            # Tìm food trong menu
-            for menu_category in restaurant.menu:
-                if not menu_category.items:
-                    continue
-                
-                for item in menu_category.items:
-                    if item.name == food_name:
-                        # Lấy reviews để tính rating
-                        reviews = list(reviews_collection.find({'restaurantId': restaurant_id}))
-                        avg_rating = sum(r.get('rating', 0) for r in reviews) / len(reviews) if reviews else 4.0
-                        
-                        return {
-                            'id': food_id,
-                            'name': item.name,
-                            'price': float(item.price) if item.price else 0.0,
-                            'description': item.description or '',
-                            'imageUrl': item.image or '',
-                            'category': menu_category.category,
-                            'restaurantId': restaurant_id_str,
-                            'restaurantName': restaurant.restaurant_name,
-                            'rating': round(avg_rating, 1),
-                            'distance': '1.5',
-                            'deliveryTime': '15-20 phút',
-                            'status': item.status if hasattr(item, 'status') else True
-                        }
-            
-            return None
-            
+            return food_service.get_food_by_id(food_id, lat, lng)
         except Exception as e:
             print(f"Error getting food by id: {e}")
-            import traceback
-            traceback.print_exc()
             return None
-            
+
+    def autocomplete(self, prefix: str, limit: Optional[int] = None,
+                     types: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Gợi ý nhà hàng / món / category theo tiền tố (search-as-you-type) - từ index trong RAM
+        Format: [{type, text, restaurantId? (type=restaurant), slug? (type=category)}]
+        """
+        return autocomplete_service.suggest(prefix, limit, types)
+
 restaurant_service = RestaurantService()
\ No newline at end of file
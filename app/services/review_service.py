@@ -1,14 +1,24 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
-from db.connection import reviews_collection, orders_collection, restaurants_collection, users_collection
+from core.config import config
+from db.connection import reviews_collection, orders_collection, orders_archive_collection, restaurants_collection, users_collection
 from db.models.review import Review
 from db.models.order import OrderStatus
+from services.restaurant_service import restaurant_service
+from services.food_service import food_service
+from services.order_service import order_service
 from utils.mongo_parser import parse_mongo_document
+from utils.pagination import KEYSET_SORT, apply_cursor, normalize_limit, split_page
 from utils.timezone_utils import get_vietnam_now
 
 
+# Số sao hợp lệ của review (histogram rating_counts trên restaurant có khóa '1'..'5')
+STARS = range(1, 6)
+
+
 class ReviewService:
     """
     Review Service - Xử lý nghiệp vụ đánh giá nhà hàng
@@ -19,6 +29,8 @@ class ReviewService:
     - Tính toán rating trung bình cho nhà hàng
     - Lấy danh sách reviews theo user/restaurant
     """
+    USER_PROJECTION = {'fullname': 1, 'avatar': 1}
+
     def __init__(self):
         self.collection = reviews_collection
 
@@ -33,6 +45,45 @@ class ReviewService:
         """Chuyển Review model thành dict để trả về API"""
         return review.to_dict()
 
+    def _find_page(self, query: Dict, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        """1 trang reviews mới nhất trước, keyset (createdAt, _id). Không truyền limit/cursor: trả về toàn bộ"""
+        limit = normalize_limit(limit, cursor)
+        query_cursor = self.collection.find(apply_cursor(query, cursor)).sort(KEYSET_SORT)
+        if limit is not None:
+            query_cursor = query_cursor.limit(limit + 1)
+        return split_page(list(query_cursor), limit)
+
+    def _to_dicts_with_users(self, docs: List[Dict], with_avatar: bool = True) -> List[Dict]:
+        """Review dicts kèm tên (+ avatar) người viết - 1 query $in cho cả trang"""
+        user_ids = list({doc['userId'] for doc in docs if doc.get('userId')})
+        users = {
+            user['_id']: user
+            for user in users_collection.find({'_id': {'$in': user_ids}}, self.USER_PROJECTION)
+        } if user_ids else {}
+        reviews = []
+        for doc in docs:
+            review_dict = self._to_dict(self._to_model(doc))
+            user = users.get(doc.get('userId'))
+            if user:
+                review_dict['userFullname'] = user.get('fullname', 'Anonymous')
+                if with_avatar:
+                    review_dict['userAvatar'] = user.get('avatar')
+            reviews.append(review_dict)
+        return reviews
+
+    def _find_order_doc(self, order_id: str) -> Optional[Dict]:
+        """Tìm đơn theo ID trong orders, không có thì tìm trong orders_archive (đơn cũ đã lưu trữ)"""
+        order = orders_collection.find_one({'_id': ObjectId(order_id)})
+        if not order:
+            order = orders_archive_collection.find_one({'_id': ObjectId(order_id)})
+        return order
+
+    def _set_order_reviewed(self, order_id: ObjectId, is_reviewed: bool) -> None:
+        """Cập nhật cờ isReviewed của đơn (ở orders, hoặc orders_archive nếu đơn đã lưu trữ)"""
+        update = {'$set': {'isReviewed': is_reviewed, 'updatedAt': get_vietnam_now()}}
+        if orders_collection.update_one({'_id': order_id}, update).matched_count == 0:
+            orders_archive_collection.update_one({'_id': order_id}, update)
+
     # ==================== LAYER 1: MongoDB CRUD Operations ====================
     
     def create(self, order_id: str, user_id: str, rating: int, comment: Optional[str] = None) -> Dict:
@@ -45,7 +96,7 @@ class ReviewService:
         - Order chưa được review (check orderId unique)
         """
         # Kiểm tra order
-        order = orders_collection.find_one({'_id': ObjectId(order_id)})
+        order = self._find_order_doc(order_id)
         if not order:
             raise ValueError('Không tìm thấy đơn hàng')
         
@@ -75,13 +126,10 @@ class ReviewService:
         created = self.find_by_id(str(result.inserted_id))
         
         # Cập nhật order: đánh dấu đã review
-        orders_collection.update_one(
-            {'_id': ObjectId(order_id)},
-            {'$set': {'isReviewed': True, 'updatedAt': get_vietnam_now()}}
-        )
+        self._set_order_reviewed(ObjectId(order_id), True)
         
-        # Cập nhật rating nhà hàng
-        self._update_restaurant_rating(str(order['restaurantId']))
+        # Cập nhật rating nhà hàng (cộng dồn, không quét lại reviews)
+        self._apply_rating_delta(str(order['restaurantId']), {rating: 1})
         
         return self._to_dict(created)
 
@@ -105,11 +153,15 @@ class ReviewService:
         if comment is not None:
             updates['comment'] = comment
         
-        self.collection.update_one({'_id': ObjectId(review_id)}, {'$set': updates})
+        # Lấy bản TRƯỚC khi update để tính chênh lệch số sao đúng cả khi 2 request sửa đồng thời
+        before = self.collection.find_one_and_update(
+            {'_id': ObjectId(review_id)}, {'$set': updates}, return_document=ReturnDocument.BEFORE
+        )
         updated = self.find_by_id(review_id)
         
-        # Cập nhật rating nhà hàng
-        self._update_restaurant_rating(str(review.restaurant_id))
+        # Cập nhật rating nhà hàng (chỉ khi đổi số sao)
+        if before and rating is not None and rating != before.get('rating'):
+            self._apply_rating_delta(str(review.restaurant_id), {before.get('rating'): -1, rating: 1})
         
         return self._to_dict(updated)
 
@@ -130,17 +182,15 @@ class ReviewService:
         restaurant_id = str(review.restaurant_id)
         order_id = review.order_id
         
-        self.collection.delete_one({'_id': ObjectId(review_id)})
+        result = self.collection.delete_one({'_id': ObjectId(review_id)})
         
         # Cập nhật order: đánh dấu chưa review
         if order_id:
-            orders_collection.update_one(
-                {'_id': order_id},
-                {'$set': {'isReviewed': False, 'updatedAt': get_vietnam_now()}}
-            )
+            self._set_order_reviewed(order_id, False)
         
-        # Cập nhật rating nhà hàng
-        self._update_restaurant_rating(restaurant_id)
+        # Cập nhật rating nhà hàng (chỉ khi thực sự xóa được - tránh trừ 2 lần khi xóa đồng thời)
+        if result.deleted_count:
+            self._apply_rating_delta(restaurant_id, {review.rating: -1})
 
     # ==================== LAYER 2: Business Logic ====================
 
@@ -154,145 +204,201 @@ class ReviewService:
         doc = self.collection.find_one({'orderId': ObjectId(order_id)})
         return self._to_model(doc) if doc else None
 
-    def find_by_user_id(self, user_id: str) -> List[Dict]:
-        """Lấy tất cả reviews của user"""
-        cursor = self.collection.find({'userId': ObjectId(user_id)}).sort('createdAt', -1)
+    def find_by_user_id(self, user_id: str, limit: Optional[int] = None,
+                         cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Lấy reviews của user (mới nhất trước, keyset pagination), kèm tên nhà hàng - 1 query $in / trang"""
+        docs, next_cursor = self._find_page({'userId': ObjectId(user_id)}, limit, cursor)
+        restaurant_ids = list({doc['restaurantId'] for doc in docs if doc.get('restaurantId')})
+        names = {
+            restaurant['_id']: restaurant.get('name')
+            for restaurant in restaurants_collection.find({'_id': {'$in': restaurant_ids}}, {'name': 1})
+        } if restaurant_ids else {}
         reviews = []
-        for doc in cursor:
-            review = self._to_model(doc)
-            review_dict = self._to_dict(review)
-            # Hydrate thông tin restaurant
-            restaurant = restaurants_collection.find_one({'_id': review.restaurant_id})
-            if restaurant:
-                review_dict['restaurantName'] = restaurant.get('name')
+        for doc in docs:
+            review_dict = self._to_dict(self._to_model(doc))
+            if doc.get('restaurantId') in names:
+                review_dict['restaurantName'] = names[doc['restaurantId']]
             reviews.append(review_dict)
-        return reviews
+        return reviews, next_cursor
 
-    def find_by_restaurant_id(self, restaurant_id: str) -> List[Dict]:
-        """Lấy tất cả reviews của nhà hàng"""
-        cursor = self.collection.find({'restaurantId': ObjectId(restaurant_id)}).sort('createdAt', -1)
-        reviews = []
-        for doc in cursor:
-            review = self._to_model(doc)
-            review_dict = self._to_dict(review)
-            # Hydrate thông tin user
-            user = users_collection.find_one({'_id': review.user_id})
-            if user:
-                review_dict['userFullname'] = user.get('fullname', 'Anonymous')
-            reviews.append(review_dict)
-        return reviews
+    def find_by_restaurant_id(self, restaurant_id: str, limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Lấy reviews của nhà hàng (mới nhất trước, keyset pagination), kèm tên người viết"""
+        docs, next_cursor = self._find_page({'restaurantId': ObjectId(restaurant_id)}, limit, cursor)
+        return self._to_dicts_with_users(docs, with_avatar=False), next_cursor
 
-    def find_by_food_id(self, food_id: str) -> List[Dict]:
+    def find_by_food_id(self, food_id: str, limit: Optional[int] = None,
+                        cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
         """
-        Lấy tất cả reviews của một món ăn
-        Format food_id: "restaurantId-foodName"
+        Lấy reviews của một món ăn (mới nhất trước, keyset pagination), kèm tên + avatar người viết
+        Format food_id: "restaurantId-foodName" (không hợp lệ → danh sách rỗng)
+        Review có foodName: chỉ lấy đúng món; review không có foodName (review cả đơn) vẫn được lấy
+        → lọc ngay trong query trên index (restaurantId, foodName, createdAt, _id)
         """
+        parts = food_id.split('-', 1)
+        if len(parts) != 2:
+            return [], None
+        restaurant_id_str, food_name = parts
         try:
-            # Parse food_id: format "restaurantId-foodName"
-            parts = food_id.split('-', 1)
-            if len(parts) != 2:
-                return []
-            
-            restaurant_id_str, food_name = parts
-            try:
-                restaurant_id = ObjectId(restaurant_id_str)
-            except:
-                return []
-            
-            # Lấy tất cả reviews của restaurant
-            cursor = self.collection.find({'restaurantId': restaurant_id}).sort('createdAt', -1)
-            reviews = []
-            
-            for doc in cursor:
-                review = self._to_model(doc)
-                review_dict = self._to_dict(review)
-                
-                # Kiểm tra xem review có foodName không, nếu có thì filter theo foodName
-                # Nếu không có foodName trong review, thì lấy tất cả reviews của restaurant (fallback)
-                if 'foodName' in doc and doc['foodName']:
-                    if doc['foodName'] != food_name:
-                        continue
-                # Nếu không có foodName, vẫn lấy review (để hiển thị reviews của restaurant)
-                
-                # Hydrate thông tin user
-                user = users_collection.find_one({'_id': review.user_id})
-                if user:
-                    review_dict['userFullname'] = user.get('fullname', 'Anonymous')
-                    review_dict['userAvatar'] = user.get('avatar')
-                
-                reviews.append(review_dict)
-            
-            return reviews
-        except Exception as e:
-            print(f"Error finding reviews by food_id: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+            restaurant_id = ObjectId(restaurant_id_str)
+        except Exception:
+            return [], None
+
+        # $in với None khớp cả review không có field foodName
+        query = {'restaurantId': restaurant_id, 'foodName': {'$in': [food_name, None, '']}}
+        docs, next_cursor = self._find_page(query, limit, cursor)
+        return self._to_dicts_with_users(docs), next_cursor
+
+    @staticmethod
+    def _empty_histogram() -> Dict[str, int]:
+        return {str(i): 0 for i in STARS}
+
+    @classmethod
+    def _stored_histogram(cls, restaurant_doc: Dict) -> Dict[str, int]:
+        """Histogram lưu trên restaurant (thiếu sao nào coi như 0)"""
+        counts = restaurant_doc.get('rating_counts') or {}
+        return {star: int(counts.get(star) or 0) for star in cls._empty_histogram()}
+
+    @classmethod
+    def _histogram_consistent(cls, restaurant_doc: Dict) -> bool:
+        """Histogram khớp total_reviews / rating_sum (nhà hàng cũ chưa backfill → False)"""
+        histogram = cls._stored_histogram(restaurant_doc)
+        total = restaurant_doc.get('total_reviews') or 0
+        if total == 0:
+            return not any(histogram.values())
+        return (sum(histogram.values()) == total
+                and sum(int(star) * count for star, count in histogram.items()) == restaurant_doc.get('rating_sum'))
+
+    def _aggregate_histograms(self, restaurant_ids: List[ObjectId]) -> Dict[ObjectId, Dict[str, int]]:
+        """Histogram thực tế từ reviews cho nhiều nhà hàng (1 aggregation, tối đa 5 dòng / nhà hàng)"""
+        histograms: Dict[ObjectId, Dict[str, int]] = {}
+        for row in self.collection.aggregate([
+            {'$match': {'restaurantId': {'$in': restaurant_ids}}},
+            {'$group': {'_id': {'restaurantId': '$restaurantId', 'rating': '$rating'}, 'count': {'$sum': 1}}}
+        ]):
+            histogram = histograms.setdefault(row['_id']['restaurantId'], self._empty_histogram())
+            star = str(row['_id']['rating'])
+            if star in histogram:
+                histogram[star] += row['count']
+        return histograms
 
     def get_restaurant_rating_stats(self, restaurant_id: str) -> Dict:
         """
-        Tính toán thống kê rating cho nhà hàng
-        - Average rating
-        - Total reviews
-        - Rating distribution (1-5 sao)
+        Thống kê rating nhà hàng: average, total, phân bố 1-5 sao
+        Đọc histogram duy trì sẵn trên restaurant (rating_counts / rating_sum / total_reviews - O(1));
+        nhà hàng chưa backfill histogram (jobs/rating_backfill.py --fix) → tính từ reviews
         """
-        pipeline = [
-            {'$match': {'restaurantId': ObjectId(restaurant_id)}},
-            {
-                '$group': {
-                    '_id': None,
-                    'averageRating': {'$avg': '$rating'},
-                    'totalReviews': {'$sum': 1},
-                    'ratings': {'$push': '$rating'}
-                }
-            }
-        ]
-        
-        result = list(self.collection.aggregate(pipeline))
-        
-        if not result:
-            return {
-                'restaurantId': restaurant_id,
-                'averageRating': 0.0,
-                'totalReviews': 0,
-                'ratingDistribution': {str(i): 0 for i in range(1, 6)}
-            }
-        
-        data = result[0]
-        ratings = data['ratings']
-        
-        # Tính phân bố rating
-        distribution = {str(i): 0 for i in range(1, 6)}
-        for r in ratings:
-            distribution[str(r)] += 1
-        
+        restaurant_oid = ObjectId(restaurant_id)
+        doc = restaurants_collection.find_one(
+            {'_id': restaurant_oid}, {'rating_counts': 1, 'rating_sum': 1, 'total_reviews': 1}
+        )
+        if doc and self._histogram_consistent(doc):
+            distribution = self._stored_histogram(doc)
+        else:
+            distribution = self._aggregate_histograms([restaurant_oid]).get(restaurant_oid, self._empty_histogram())
+
+        total = sum(distribution.values())
+        rating_sum = sum(int(star) * count for star, count in distribution.items())
         return {
             'restaurantId': restaurant_id,
-            'averageRating': round(data['averageRating'], 2),
-            'totalReviews': data['totalReviews'],
+            'averageRating': round(rating_sum / total, 2) if total else 0.0,
+            'totalReviews': total,
             'ratingDistribution': distribution
         }
 
-    def _update_restaurant_rating(self, restaurant_id: str) -> None:
+    def _apply_rating_delta(self, restaurant_id: str, star_deltas: Dict[int, int]) -> None:
         """
-        Cập nhật rating trung bình vào restaurant document
-        Gọi sau khi create/update/delete review
+        Cập nhật rating nhà hàng theo kiểu cộng dồn (1 update, O(1)) - gọi sau khi create/update/delete review
+        star_deltas: số review thay đổi theo số sao, vd tạo 5 sao {5: 1}, sửa 3 → 5 sao {3: -1, 5: 1}
+        - rating_counts (histogram 1-5 sao), rating_sum, total_reviews là nguồn dữ liệu chính,
+          average_rating được tính lại trong cùng update
+        - Document chưa có rating_sum (dữ liệu cũ): suy ra từ average_rating * total_reviews,
+          sai lệch do làm tròn / histogram thiếu được sửa bởi jobs/rating_backfill.py
         Dùng snake_case cho MongoDB fields để đồng bộ với model
         """
+        star_deltas = {star: delta for star, delta in star_deltas.items() if star and delta}
+        if not star_deltas:
+            return
+        rating_delta = sum(star * delta for star, delta in star_deltas.items())
+        count_delta = sum(star_deltas.values())
         try:
-            stats = self.get_restaurant_rating_stats(restaurant_id)
-            restaurants_collection.update_one(
+            rating_sum = {'$add': [
+                {'$ifNull': ['$rating_sum', {'$multiply': [
+                    {'$ifNull': ['$average_rating', 0]}, {'$ifNull': ['$total_reviews', 0]}
+                ]}]},
+                rating_delta
+            ]}
+            total = {'$add': [{'$ifNull': ['$total_reviews', 0]}, count_delta]}
+            rating_counts = {
+                f'rating_counts.{star}': {'$add': [{'$ifNull': [f'$rating_counts.{star}', 0]}, delta]}
+                for star, delta in star_deltas.items()
+            }
+            updated = restaurants_collection.find_one_and_update(
                 {'_id': ObjectId(restaurant_id)},
-                {
-                    '$set': {
-                        'average_rating': stats['averageRating'],  # snake_case trong DB
-                        'total_reviews': stats['totalReviews']
-                    }
-                }
+                [
+                    {'$set': {'rating_sum': rating_sum, 'total_reviews': total, **rating_counts}},
+                    {'$set': {
+                        'average_rating': {'$cond': [
+                            {'$gt': ['$total_reviews', 0]}, {'$divide': ['$rating_sum', '$total_reviews']}, 0.0
+                        ]},
+                        'version': {'$add': [{'$ifNull': ['$version', 0]}, 1]}
+                    }}
+                ],
+                projection={'average_rating': 1, 'total_reviews': 1},
+                return_document=ReturnDocument.AFTER
             )
+            if updated:
+                food_service.set_restaurant_rating(restaurant_id, updated)
+            restaurant_service.invalidate_cache(restaurant_id)
         except Exception as e:
             print(f"Error updating restaurant rating: {e}")
 
+    def recompute_restaurant_ratings(self, fix: bool = False, batch_size: int = 500) -> Dict:
+        """
+        Đối soát rating lưu trên restaurants (rating_counts / rating_sum / total_reviews / average_rating)
+        với reviews thực tế - duyệt nhà hàng theo _id từng batch, mỗi batch 1 aggregation reviews
+        fix=True: ghi lại giá trị đúng cho các nhà hàng bị lệch
+        """
+        checked, drifted = 0, []
+        last_id = None
+        projection = {'rating_counts': 1, 'rating_sum': 1, 'total_reviews': 1, 'average_rating': 1}
+        while True:
+            query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+            docs = list(restaurants_collection.find(query, projection).sort('_id', 1).limit(batch_size))
+            if not docs:
+                break
+            last_id = docs[-1]['_id']
+            actual_histograms = self._aggregate_histograms([doc['_id'] for doc in docs])
+
+            for doc in docs:
+                checked += 1
+                histogram = actual_histograms.get(doc['_id'], self._empty_histogram())
+                count = sum(histogram.values())
+                rating_sum = sum(int(star) * n for star, n in histogram.items())
+                average = rating_sum / count if count else 0.0
+                if (doc.get('rating_sum') == rating_sum and doc.get('total_reviews') == count
+                        and self._stored_histogram(doc) == histogram
+                        and abs((doc.get('average_rating') or 0.0) - average) < 1e-9):
+                    continue
+                drifted.append({
+                    'restaurantId': str(doc['_id']),
+                    'stored': {'ratingSum': doc.get('rating_sum'), 'totalReviews': doc.get('total_reviews'),
+                               'ratingCounts': doc.get('rating_counts')},
+                    'actual': {'ratingSum': rating_sum, 'totalReviews': count, 'ratingCounts': histogram},
+                })
+                if fix:
+                    restaurants_collection.update_one(
+                        {'_id': doc['_id']},
+                        {
+                            '$set': {'rating_counts': histogram, 'rating_sum': rating_sum,
+                                     'total_reviews': count, 'average_rating': average},
+                            '$inc': {'version': 1}
+                        }
+                    )
+                    food_service.set_restaurant_rating(doc['_id'], {'average_rating': average, 'total_reviews': count})
+                    restaurant_service.invalidate_cache(doc['_id'])
+        return {'checked': checked, 'drifted': len(drifted), 'fixed': fix, 'details': drifted}
+
     def check_order_reviewable(self, order_id: str, user_id: str) -> Dict:
         """
         Kiểm tra đơn hàng có thể đánh giá không
@@ -303,7 +409,7 @@ class ReviewService:
         - existingReview: object (nếu đã review)
         """
         # Kiểm tra order
-        order = orders_collection.find_one({'_id': ObjectId(order_id)})
+        order = self._find_order_doc(order_id)
         if not order:
             return {'canReview': False, 'reason': 'Không tìm thấy đơn hàng'}
         
@@ -324,25 +430,62 @@ class ReviewService:
         
         return {'canReview': True}
 
-    def get_reviewable_orders(self, user_id: str) -> List[Dict]:
+    REVIEWABLE_ORDER_PROJECTION = {'restaurantId': 1, 'restaurantName': 1, 'total_amount': 1, 'createdAt': 1, 'status': 1}
+
+    def _find_reviewable_docs(self, collection, query: Dict, limit: Optional[int], cursor: Optional[str]) -> List[Dict]:
+        """Tối đa limit + 1 đơn (mới nhất trước, keyset) của 1 collection orders / orders_archive"""
+        query_cursor = collection.find(apply_cursor(query, cursor), self.REVIEWABLE_ORDER_PROJECTION).sort(KEYSET_SORT)
+        if limit is not None:
+            query_cursor = query_cursor.limit(limit + 1)
+        return list(query_cursor)
+
+    def get_reviewable_orders(self, user_id: str, limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
         """
-        Lấy danh sách đơn hàng của user ở trạng thái Completed và CHƯA có review
-        Dùng cho màn hình "Đánh giá ngay"
+        Lấy danh sách đơn hàng của user ở trạng thái Completed và CHƯA có review (mới nhất trước)
+        Dùng cho màn hình "Đánh giá ngay" - gồm cả đơn cũ đã chuyển sang orders_archive
+        (create / check_order_reviewable cũng nhận đơn đã lưu trữ)
+
+        Mỗi trang cố định 4 query (không phụ thuộc số đơn):
+        1. orders + orders_archive theo cờ isReviewed trên index (userId, status, isReviewed, createdAt, _id)
+           + keyset, mỗi collection lấy limit + 1 rồi merge theo (createdAt, _id) như OrderService.find_page
+        2. reviews $in các đơn trong trang - loại đơn có review nhưng cờ chưa bật (job đối soát chưa chạy tới),
+           tự sửa cờ nếu job đối soát nền đang tắt (như OrderService.get_user_orders)
+        3. restaurants $in lấy rating
+        Returns: (orders, nextCursor)
         """
-        # Lấy tất cả orders Completed của user
-        orders_cursor = orders_collection.find({
+        limit = normalize_limit(limit, cursor)
+        query = {
             'userId': ObjectId(user_id),
-            'status': OrderStatus.COMPLETED.value
-        }).sort('createdAt', -1)
+            'status': OrderStatus.COMPLETED.value,
+            'isReviewed': {'$in': [False, None]},
+        }
+        docs = self._find_reviewable_docs(orders_collection, query, limit, cursor)
+        # Đơn đang được chuyển kho có thể nằm ở cả 2 collection → ưu tiên bản ở orders
+        hot_ids = {doc['_id'] for doc in docs}
+        docs += [doc for doc in self._find_reviewable_docs(orders_archive_collection, query, limit, cursor)
+                 if doc['_id'] not in hot_ids]
+        docs.sort(key=lambda d: (d['createdAt'], d['_id']), reverse=True)
+        if limit is not None:
+            docs = docs[:limit + 1]
+        order_docs, next_cursor = split_page(docs, limit)
 
-        result: List[Dict] = []
-        for order_doc in orders_cursor:
-            # Bỏ qua nếu đã có review
-            existing = self.collection.find_one({'orderId': order_doc['_id']})
-            if existing:
-                continue
+        reviewed = order_service.find_reviewed_order_ids([doc['_id'] for doc in order_docs])
+        if reviewed:
+            order_docs = [doc for doc in order_docs if doc['_id'] not in reviewed]
+            if config.REVIEW_RECONCILE_INTERVAL_SECONDS <= 0:
+                order_service.mark_reviewed_in_db(list(reviewed))
 
-            # Build response item
+        restaurant_ids = list({doc['restaurantId'] for doc in order_docs if doc.get('restaurantId')})
+        restaurants = {
+            doc['_id']: doc
+            for doc in restaurants_collection.find(
+                {'_id': {'$in': restaurant_ids}}, {'average_rating': 1, 'total_reviews': 1}
+            )
+        } if restaurant_ids else {}
+
+        result: List[Dict] = []
+        for order_doc in order_docs:
             item = {
                 'orderId': str(order_doc['_id']),
                 'restaurantId': str(order_doc.get('restaurantId')) if order_doc.get('restaurantId') else None,
@@ -351,17 +494,12 @@ class ReviewService:
                 'createdAt': order_doc.get('createdAt'),
                 'status': order_doc.get('status')
             }
-
-            # Thêm meta từ restaurant (rating) nếu cần
-            if order_doc.get('restaurantId'):
-                restaurant = restaurants_collection.find_one({'_id': order_doc.get('restaurantId')})
-                if restaurant:
-                    item['averageRating'] = float(restaurant.get('average_rating', 0.0))
-                    item['totalReviews'] = int(restaurant.get('total_reviews', 0))
-
+            restaurant = restaurants.get(order_doc.get('restaurantId'))
+            if restaurant:
+                item['averageRating'] = float(restaurant.get('average_rating', 0.0))
+                item['totalReviews'] = int(restaurant.get('total_reviews', 0))
             result.append(item)
 
-        return result
-
+        return result, next_cursor
 
 review_service = ReviewService()
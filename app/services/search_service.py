@@ -0,0 +1,164 @@
+from typing import Optional, List, Dict, Tuple
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+
+from db.connection import foods_collection, restaurants_collection
+from utils.text_utils import fold, tokenize, search_grams, query_grams
+
+
+class SearchService:
+    """
+    Search Service - Tìm món / nhà hàng không phân biệt dấu ("pho" khớp "phở")
+
+    Index (inverted index dạng gram, lưu ngay trên document + index multikey):
+    - foods.searchGrams: gram của tên món + tên category, foods.searchText / categoryText: bản đã bỏ dấu
+    - restaurants.searchGrams / nameFolded: gram + tên đã bỏ dấu
+    Gram = trigram của từng từ + tiền tố 1-2 ký tự (xem utils/text_utils.search_grams)
+    → foods được ghi lại mỗi khi menu/status nhà hàng đổi (FoodService.sync_restaurant),
+      restaurants khi tạo/đổi tên (RestaurantService)
+
+    Tìm kiếm:
+    1. Lấy TẤT CẢ ứng viên bằng {searchGrams: {$all: gram của từ khóa}} theo thứ tự index, chỉ đọc các field
+       cần để chấm điểm (không cắt theo rating trước khi xếp hạng → tổng số chính xác)
+    2. Xác minh: mọi từ của từ khóa phải xuất hiện trong text đã bỏ dấu (loại false positive của gram)
+    3. Xếp hạng theo mức độ khớp (tên trùng khớp > bắt đầu bằng > chứa cụm > khớp từ > khớp category),
+       cộng điểm nếu khớp đúng cả dấu, hòa điểm thì rating cao hơn trước
+    4. Đọc document đầy đủ chỉ cho trang kết quả (1 query $in _id)
+    """
+    # Số kết quả tối đa trả về khi không truyền limit (tổng số vẫn là tổng thật)
+    MAX_RESULTS = 1000
+
+    # Điểm theo mức độ khớp
+    SCORE_EXACT = 100
+    SCORE_PREFIX = 80
+    SCORE_PHRASE = 60
+    SCORE_WORD_PREFIX = 50
+    SCORE_WORDS = 40
+    SCORE_CATEGORY = 20
+    BONUS_ACCENT = 5
+
+    FOOD_PROJECTION = {'searchGrams': 0}
+    RESTAURANT_PROJECTION = {'searchGrams': 0, 'menu': 0}
+    # Field cần để chấm điểm ứng viên
+    FOOD_SCORE_PROJECTION = {'name': 1, 'searchText': 1, 'categoryText': 1, 'rating': 1}
+    RESTAURANT_SCORE_PROJECTION = {'name': 1, 'nameFolded': 1, 'average_rating': 1}
+
+    def __init__(self):
+        self.foods: Collection = foods_collection
+        self.restaurants: Collection = restaurants_collection
+
+    # ==================== Index fields ====================
+
+    @staticmethod
+    def food_fields(name: Optional[str], category: Optional[str]) -> Dict:
+        """Các field search ghi kèm document foods"""
+        return {
+            'searchGrams': search_grams(name or '', category or ''),
+            'searchText': fold(name or ''),
+            'categoryText': fold(category or ''),
+        }
+
+    @staticmethod
+    def restaurant_fields(name: Optional[str]) -> Dict:
+        """Các field search ghi kèm document restaurants"""
+        return {'searchGrams': search_grams(name or ''), 'nameFolded': fold(name or '')}
+
+    # ==================== Ranking ====================
+
+    def _score(self, query: str, name: str, folded_name: str, folded_extra: str = '') -> Optional[int]:
+        """Điểm liên quan của 1 ứng viên, None nếu không thực sự khớp"""
+        folded_query = fold(query)
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        words = folded_name.split()
+
+        if folded_name == folded_query:
+            score = self.SCORE_EXACT
+        elif folded_name.startswith(folded_query):
+            score = self.SCORE_PREFIX
+        elif folded_query in folded_name:
+            score = self.SCORE_PHRASE
+        elif all(any(w.startswith(t) for w in words) for t in tokens):
+            score = self.SCORE_WORD_PREFIX
+        elif all(t in folded_name for t in tokens):
+            score = self.SCORE_WORDS
+        elif all(t in f'{folded_name} {folded_extra}' for t in tokens):
+            score = self.SCORE_CATEGORY
+        else:
+            return None
+
+        if query.strip().lower() in (name or '').lower():
+            score += self.BONUS_ACCENT
+        return score
+
+    def _paginate(self, ranked: List, page: Optional[int], limit: Optional[int]) -> Tuple[List, int]:
+        total = len(ranked)
+        if limit is None:
+            return ranked[:self.MAX_RESULTS], total
+        if limit < 1 or (page is not None and page < 1):
+            raise ValueError('Tham số page/limit phải lớn hơn 0')
+        start = ((page or 1) - 1) * limit
+        return ranked[start:start + limit], total
+
+    # ==================== LAYER 1: MongoDB CRUD Operations ====================
+
+    def _candidates(self, collection: Collection, query: str, extra_filter: Dict, projection: Dict) -> List[Dict]:
+        """Tất cả document khớp gram của từ khóa (thứ tự index, chỉ các field trong projection)"""
+        grams = query_grams(query)
+        if not grams:
+            return []
+        return list(collection.find({'searchGrams': {'$all': grams}, **extra_filter}, projection))
+
+    @staticmethod
+    def _find_by_ids(collection: Collection, ids: List, projection: Dict) -> List[Dict]:
+        """Document đầy đủ theo list _id, giữ nguyên thứ tự của ids (1 query)"""
+        if not ids:
+            return []
+        docs = {doc['_id']: doc for doc in collection.find({'_id': {'$in': ids}}, projection)}
+        return [docs[_id] for _id in ids if _id in docs]
+
+    # ==================== LAYER 2: Business Logic ====================
+
+    def search_foods(self, query: str, page: Optional[int] = None,
+                     limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """Tìm món theo tên món / tên category (chỉ quán đang hoạt động). Trả về (documents foods, tổng số)"""
+        ranked = []
+        for doc in self._candidates(self.foods, query, {}, self.FOOD_SCORE_PROJECTION):
+            score = self._score(query, doc.get('name'), doc.get('searchText', ''), doc.get('categoryText', ''))
+            if score is not None:
+                ranked.append((score, doc))
+        ranked.sort(key=lambda x: (-x[0], -(x[1].get('rating') or 0), x[1].get('searchText', '')))
+        page_ids, total = self._paginate([doc['_id'] for _, doc in ranked], page, limit)
+        return self._find_by_ids(self.foods, page_ids, self.FOOD_PROJECTION), total
+
+    def search_restaurants(self, query: str, include_inactive: bool = False, page: Optional[int] = None,
+                           limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """Tìm nhà hàng theo tên. Trả về (documents restaurants không kèm menu, tổng số)"""
+        extra = {} if include_inactive else {'status': True}
+        ranked = []
+        for doc in self._candidates(self.restaurants, query, extra, self.RESTAURANT_SCORE_PROJECTION):
+            score = self._score(query, doc.get('name'), doc.get('nameFolded', ''))
+            if score is not None:
+                ranked.append((score, doc))
+        ranked.sort(key=lambda x: (-x[0], -(x[1].get('average_rating') or 0), x[1].get('nameFolded', '')))
+        page_ids, total = self._paginate([doc['_id'] for _, doc in ranked], page, limit)
+        return self._find_by_ids(self.restaurants, page_ids, self.RESTAURANT_PROJECTION), total
+
+    def reindex_restaurants(self, batch_size: int = 500) -> int:
+        """Ghi lại searchGrams / nameFolded cho tất cả nhà hàng (dữ liệu cũ), trả về số nhà hàng"""
+        ops, total = [], 0
+        for doc in self.restaurants.find({}, {'name': 1}):
+            ops.append(UpdateOne({'_id': doc['_id']}, {'$set': self.restaurant_fields(doc.get('name'))}))
+            if len(ops) >= batch_size:
+                self.restaurants.bulk_write(ops, ordered=False)
+                total += len(ops)
+                ops = []
+        if ops:
+            self.restaurants.bulk_write(ops, ordered=False)
+            total += len(ops)
+        return total
+
+
+search_service = SearchService()
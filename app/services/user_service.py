@@ -142,6 +142,39 @@ class UserService:
         """Xóa user khỏi MongoDB"""
         result = self.collection.delete_one({'_id': ObjectId(user_id)})
         return result.deleted_count > 0
+
+    def deduct_balance_in_db(self, user_id: str, amount: float, session=None) -> bool:
+        """Trừ số dư trong 1 lệnh update có điều kiện (balance >= amount). False nếu không trừ được."""
+        result = self.collection.update_one(
+            {'_id': ObjectId(user_id), 'balance': {'$gte': float(amount)}},
+            {'$inc': {'balance': -float(amount)}, '$set': {'updated_at': datetime.now()}},
+            session=session
+        )
+        return result.modified_count > 0
+
+    def credit_balance_in_db(self, user_id: str, amount: float, session=None) -> bool:
+        """Cộng số dư trong 1 lệnh update. False nếu không tìm thấy user."""
+        result = self.collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$inc': {'balance': float(amount)}, '$set': {'updated_at': datetime.now()}},
+            session=session
+        )
+        return result.matched_count > 0
+
+    def credit_refund_in_db(self, user_id: str, amount: float, order_id: str, session=None) -> bool:
+        """Hoàn tiền 1 đơn vào số dư - idempotent: mỗi đơn chỉ được cộng 1 lần (refundedOrders).
+        False nếu đơn đã được hoàn trước đó (hoặc không tìm thấy user)."""
+        order_oid = ObjectId(order_id)
+        result = self.collection.update_one(
+            {'_id': ObjectId(user_id), 'refundedOrders': {'$ne': order_oid}},
+            {
+                '$inc': {'balance': float(amount)},
+                '$push': {'refundedOrders': order_oid},
+                '$set': {'updated_at': datetime.now()}
+            },
+            session=session
+        )
+        return result.modified_count > 0
         
 
 # ==================== Business Logic ==================== dùng để xử lý yêu cầu của users
@@ -283,20 +316,12 @@ class UserService:
         if amount <= 0:
             raise ValueError('Số tiền trừ phải lớn hơn 0')
 
-        user = self.find_by_id(user_id)
-        if not user:
-            raise ValueError('Không tìm thấy user')
-
-        if user.balance < amount:
+        if not self.deduct_balance_in_db(user_id, amount):
+            # Chỉ đọc lại khi trừ thất bại để trả lỗi rõ ràng
+            if not self.find_by_id(user_id):
+                raise ValueError('Không tìm thấy user')
             raise ValueError('Số dư tài khoản không đủ để thanh toán đơn hàng')
 
-        result = self.collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$inc': {'balance': -float(amount)}, '$set': {'updated_at': datetime.now()}}
-        )
-        if result.matched_count == 0:
-            raise ValueError('Không thể cập nhật số dư user')
-
         return self.find_by_id(user_id)
 
     def top_up_balance(self, user_id: str, topup: UserTopUpRequest) -> Dict:
@@ -1,10 +1,12 @@
+import itertools
 from typing import Optional, List, Dict
 from datetime import datetime, date
 from bson import ObjectId
 
-from db.connection import vouchers_collection, orders_collection
+from db.connection import vouchers_collection, orders_collection, orders_archive_collection
 from db.models.vouchers import Promotion, PromotionType
 from db.models.order import OrderStatus
+from services.restaurant_service import restaurant_service
 from utils.mongo_parser import parse_mongo_document
 
 
@@ -64,6 +66,7 @@ class VoucherService:
             updated_at=datetime.now()
         )
         result = self.collection.insert_one(promo.to_mongo())
+        restaurant_service.invalidate_promotions()
         created = self.find_by_id(str(result.inserted_id))
         return self._to_dict(created)
 
@@ -96,6 +99,7 @@ class VoucherService:
             updates['description'] = data['description']
 
         self.collection.update_one({'_id': ObjectId(promo_id)}, {'$set': updates})
+        restaurant_service.invalidate_promotions()
         updated = self.find_by_id(promo_id)
         if not updated:
             raise ValueError('Không tìm thấy voucher')
@@ -104,6 +108,7 @@ class VoucherService:
     def delete(self, promo_id: str) -> None:
         """Xóa voucher khỏi database"""
         self.collection.delete_one({'_id': ObjectId(promo_id)})
+        restaurant_service.invalidate_promotions()
 
     def find_by_id(self, promo_id: str) -> Optional[Promotion]:
         """Tìm voucher theo ID - Trả về Model"""
@@ -161,12 +166,16 @@ class VoucherService:
         try:
             user_oid = ObjectId(user_id)
             
-            # Tìm tất cả đơn hàng của user có sử dụng voucher (trừ đơn bị hủy)
-            orders_with_voucher = orders_collection.find({
+            # Tìm tất cả đơn hàng của user có sử dụng voucher (trừ đơn bị hủy) - gồm cả đơn đã lưu trữ
+            query = {
                 'userId': user_oid,
                 'promoId': {'$ne': None},  # Có voucher
                 'status': {'$ne': 'Cancelled'}  # Không bị hủy
-            }, {'promoId': 1})  # Chỉ lấy promoId để tối ưu
+            }
+            orders_with_voucher = itertools.chain(
+                orders_collection.find(query, {'promoId': 1}),  # Chỉ lấy promoId để tối ưu
+                orders_archive_collection.find(query, {'promoId': 1})
+            )
             
             # Kiểm tra từng voucher xem có first_order_only không
             for order in orders_with_voucher:
@@ -213,8 +222,10 @@ class VoucherService:
                 'status': {'$ne': 'Cancelled'}  # Chỉ đếm đơn không bị hủy
             }
             
-            count = orders_collection.count_documents(query)
-            return count > 0
+            # Đơn đã lưu trữ (orders_archive) cũng tính là đã dùng
+            if orders_collection.count_documents(query, limit=1) > 0:
+                return True
+            return orders_archive_collection.count_documents(query, limit=1) > 0
         except Exception as e:
             print(f"Error in _has_user_used_voucher: {e}")
             import traceback
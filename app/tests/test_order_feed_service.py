@@ -0,0 +1,47 @@
+"""
+Test: feed đơn hàng cho shipper (OrderFeedService) khi client reconnect / process restart
+
+Không cần MongoDB (backend 'memory'); MONGO_URI chỉ để import db.connection (client kết nối lazy).
+CÁCH CHẠY (từ thư mục app):
+    MONGO_URI=mongodb://localhost:27017 python -m pytest tests/test_order_feed_service.py
+"""
+from services.order_feed_service import OrderFeedService
+
+
+def _caught_up(feed: OrderFeedService) -> str:
+    feed.publish('new_pending_order', 'o1')
+    feed.publish('order_taken', 'o1')
+    start = feed.wait_for_events('s1', None, 0)['lastEventId']
+    feed.publish('new_pending_order', 'o2')
+    result = feed.wait_for_events('s1', start, 0)
+    assert not result['resync']
+    assert [e['orderId'] for e in result['events']] == ['o2']
+    return result['lastEventId']
+
+
+def test_reconnect_same_process_resumes_after_last_event_id():
+    feed = OrderFeedService()
+    last = _caught_up(feed)
+    feed.publish('new_pending_order', 'o3')
+    result = feed.wait_for_events('s1', last, 0)
+    assert not result['resync']
+    assert [e['orderId'] for e in result['events']] == ['o3']
+
+
+def test_reconnect_after_restart_resyncs_even_when_counter_passed_old_id():
+    last = _caught_up(OrderFeedService())
+    restarted = OrderFeedService()
+    for i in range(10):
+        restarted.publish('new_pending_order', f'x{i}')
+    assert restarted.wait_for_events('s1', last, 0)['resync']
+
+    stream = restarted.stream('s1', last)
+    next(stream)  # retry
+    assert next(stream) == f'id: {restarted.last_event_id}\nevent: resync\ndata: {{}}\n\n'
+
+
+def test_unusable_last_event_id_resyncs():
+    feed = OrderFeedService()
+    _caught_up(feed)
+    for since in (f'{feed.epoch}-99', '3', f'{feed.epoch}-x'):
+        assert feed.wait_for_events('s1', since, 0)['resync']
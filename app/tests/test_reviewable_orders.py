@@ -0,0 +1,68 @@
+"""
+Test: màn "Đánh giá ngay" (ReviewService.get_reviewable_orders) gồm cả đơn đã chuyển sang orders_archive
+
+Cần MongoDB thật, chỉ chạy trên database riêng có tên kết thúc bằng '_test' (không đụng dữ liệu thật).
+CÁCH CHẠY (từ thư mục app):
+    MONGO_URI=mongodb://localhost:27017 MONGO_DB_NAME=fooddelivery_test python -m pytest tests
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from core.config import config
+
+if not config.MONGO_DB_NAME.endswith('_test'):
+    pytest.skip("Cần MONGO_DB_NAME kết thúc bằng '_test'", allow_module_level=True)
+
+from db.connection import orders_collection, orders_archive_collection, reviews_collection, restaurants_collection
+from db.models.order import OrderStatus
+from services.review_service import review_service
+
+
+def _order(user_id: ObjectId, restaurant_id: ObjectId, created_at: datetime, is_reviewed: bool = False) -> dict:
+    return {
+        '_id': ObjectId(), 'userId': user_id, 'restaurantId': restaurant_id, 'restaurantName': 'Quán Test',
+        'total_amount': 50000.0, 'status': OrderStatus.COMPLETED.value, 'isReviewed': is_reviewed,
+        'createdAt': created_at, 'updatedAt': created_at,
+    }
+
+
+@pytest.fixture
+def orders():
+    user_id, restaurant_id = ObjectId(), ObjectId()
+    now = datetime(2026, 1, 1)
+    restaurants_collection.insert_one({'_id': restaurant_id, 'name': f'Quán Test {restaurant_id}',
+                                       'address': 'Test', 'average_rating': 4.5, 'total_reviews': 2})
+    hot = _order(user_id, restaurant_id, now)
+    archived = _order(user_id, restaurant_id, now - timedelta(days=200))
+    archived_reviewed = _order(user_id, restaurant_id, now - timedelta(days=201), is_reviewed=True)
+    # Cờ chưa bật nhưng đã có review (job đối soát chưa chạy tới)
+    archived_stale_flag = _order(user_id, restaurant_id, now - timedelta(days=202))
+    orders_collection.insert_one(hot)
+    orders_archive_collection.insert_many([archived, archived_reviewed, archived_stale_flag])
+    reviews_collection.insert_one({'orderId': archived_stale_flag['_id'], 'userId': user_id,
+                                   'restaurantId': restaurant_id, 'rating': 5, 'createdAt': now, 'updatedAt': now})
+    yield user_id, [str(hot['_id']), str(archived['_id'])]
+    for collection in (orders_collection, orders_archive_collection, reviews_collection):
+        collection.delete_many({'userId': user_id})
+    restaurants_collection.delete_one({'_id': restaurant_id})
+
+
+def test_archived_unreviewed_order_is_reviewable(orders):
+    user_id, expected = orders
+    result, next_cursor = review_service.get_reviewable_orders(str(user_id))
+    assert [item['orderId'] for item in result] == expected
+    assert next_cursor is None
+    assert result[1]['averageRating'] == 4.5
+
+
+def test_pagination_spans_orders_and_archive(orders):
+    user_id, expected = orders
+    seen, cursor = [], None
+    while True:
+        page, cursor = review_service.get_reviewable_orders(str(user_id), 1, cursor)
+        seen += [item['orderId'] for item in page]
+        if not cursor:
+            break
+    assert seen == expected
@@ -0,0 +1,52 @@
+import math
+import re
+from typing import Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Tọa độ trong link Google Maps: ".../@10.77,106.70,17z", "?q=10.77,106.70", "&ll=...", "!3d10.77!4d106.70"
+_MAP_LINK_PATTERNS = [
+    re.compile(r'!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)'),
+    re.compile(r'@(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)'),
+    re.compile(r'[?&](?:q|ll|query|destination)=(-?\d+(?:\.\d+)?)(?:,|%2C)\s*(-?\d+(?:\.\d+)?)', re.IGNORECASE),
+]
+
+
+def is_valid_lat_lng(lat: float, lng: float) -> bool:
+    return -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def parse_origin(lat: Optional[float], lng: Optional[float]) -> Optional[Tuple[float, float]]:
+    """Vị trí người dùng từ query params: (lat, lng), None nếu không gửi. Raise ValueError nếu thiếu 1 trong 2 / sai."""
+    if lat is None and lng is None:
+        return None
+    if lat is None or lng is None or not is_valid_lat_lng(lat, lng):
+        raise ValueError('Tham số lat/lng không hợp lệ')
+    return lat, lng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Khoảng cách đường chim bay (km) giữa 2 tọa độ"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def parse_map_link(map_link: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Lấy (lat, lng) từ link Google Maps, None nếu link không chứa tọa độ (vd link rút gọn goo.gl)"""
+    if not map_link:
+        return None
+    for pattern in _MAP_LINK_PATTERNS:
+        match = pattern.search(map_link)
+        if match:
+            lat, lng = float(match.group(1)), float(match.group(2))
+            if is_valid_lat_lng(lat, lng):
+                return lat, lng
+    return None
+
+
+def format_distance_km(km: float) -> str:
+    """Khoảng cách hiển thị (km, 1 chữ số thập phân): 1.46 → '1.5'"""
+    return f"{km:.1f}"
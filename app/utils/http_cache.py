@@ -0,0 +1,60 @@
+"""
+HTTP caching helpers - Conditional GET (ETag / Last-Modified → 304) cho endpoint public
+
+CÁCH SỬ DỤNG (trong controller):
+    etag = make_etag('foods', catalog_version, request.query_string)
+    return conditional_json(etag, last_modified, max_age, lambda: restaurant_service.get_all_foods(...))
+- ETag chỉ sinh từ dữ liệu quyết định nội dung response (version + tham số), không cần build response
+- Luôn là weak ETag (W/"...") cho cả 200 lẫn 304: body có thể được nén gzip hoặc không
+  (middlewares/compression.py, tùy kích thước) nhưng ETag client nhận được luôn giống nhau
+- Request có If-None-Match khớp (hoặc If-Modified-Since không cũ hơn) → 304, build() không được gọi
+- Chỉ truyền last_modified khi nội dung CHỈ phụ thuộc version catalog; ETag có thêm thành phần khác
+  (bucket xoay vòng, thống kê ETA...) → truyền None, vì If-Modified-Since không thấy được các thay đổi đó
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from flask import Response, jsonify, request
+
+
+def make_etag(*parts: Any) -> str:
+    """Giá trị ETag (không kèm W/) từ các thành phần quyết định nội dung"""
+    raw = '|'.join(p.decode() if isinstance(p, bytes) else str(p) for p in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def _is_not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    # If-None-Match được ưu tiên hơn If-Modified-Since và so khớp weak (RFC 9110):
+    # response đã nén gzip mang ETag W/"..." (middlewares/compression.py)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _set_cache_headers(response: Response, etag: str, last_modified: Optional[datetime], max_age: int) -> Response:
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+    response.headers['Cache-Control'] = f'public, max-age={max(0, int(max_age))}'
+    return response
+
+
+def conditional_json(etag: str, last_modified: Optional[datetime], max_age: int,
+                     build: Callable[[], Any]) -> Response:
+    """
+    304 nếu client đã có bản mới nhất, ngược lại gọi build() → {'success': True, 'data': ..., **extra}
+    build() trả về data, hoặc dict có sẵn khóa 'data' (kèm các khóa khác như nextCursor)
+    """
+    if last_modified and not last_modified.tzinfo:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    if _is_not_modified(etag, last_modified):
+        return _set_cache_headers(Response(status=304), etag, last_modified, max_age)
+
+    result = build()
+    body = result if isinstance(result, dict) and 'data' in result else {'data': result}
+    response = jsonify({'success': True, **body})
+    return _set_cache_headers(response, etag, last_modified, max_age)
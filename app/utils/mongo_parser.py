@@ -87,7 +87,7 @@ def parse_mongo_document(doc: Dict[str, Any]) -> Dict[str, Any]:
             parsed[key] = [parse_mongo_document(item) if isinstance(item, dict) else item for item in value]
         else:
             # Try to parse date strings
-            if key in ['start_date', 'end_date', 'createdAt', 'created_at', 'updatedAt', 'updated_at', 'birthday', 'createdAt', 'pickedAt', 'deliveredAt', 'refund_at']:
+            if key in ['start_date', 'end_date', 'createdAt', 'created_at', 'updatedAt', 'updated_at', 'birthday', 'createdAt', 'pickedAt', 'completedAt', 'deliveredAt', 'refund_at']:
                 parsed[key] = parse_mongo_date(value)
             elif key in ['_id', 'userId', 'restaurantId', 'shipperId', 'paymentId', 'promoId', 'orderId', 'restaurant_id', 'user_id', 'shipper_id', 'payment_id', 'promo_id']:
                 parsed[key] = parse_mongo_oid(value)
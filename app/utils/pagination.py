@@ -0,0 +1,141 @@
+"""
+Pagination Utilities
+Keyset (cursor) pagination theo cặp (createdAt, _id)
+(và theo cặp (field bất kỳ, _id) - xem apply_sort_cursor / split_sorted_page)
+
+CÁCH SỬ DỤNG:
+- Sort luôn theo [('createdAt', -1), ('_id', -1)] để thứ tự ổn định khi trùng createdAt
+- Cursor là chuỗi opaque (base64) chứa createdAt + _id của document cuối trang trước
+- Frontend chỉ cần gửi lại nguyên giá trị nextCursor để lấy trang tiếp theo
+"""
+
+import base64
+import json
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from utils.timezone_utils import to_utc
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Thứ tự sort chuẩn cho keyset pagination (mới nhất trước)
+KEYSET_SORT = [('createdAt', -1), ('_id', -1)]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def normalize_limit(limit: Optional[int], cursor: Optional[str] = None) -> Optional[int]:
+    """
+    Chuẩn hóa tham số limit.
+
+    - Không truyền limit và cursor: trả về None (lấy toàn bộ - giữ tương thích cũ)
+    - Có cursor nhưng không có limit: dùng DEFAULT_PAGE_SIZE
+    - Giới hạn tối đa MAX_PAGE_SIZE
+    """
+    if limit is None:
+        return DEFAULT_PAGE_SIZE if cursor else None
+    if limit < 1:
+        raise ValueError('Tham số limit phải lớn hơn 0')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(created_at: datetime, doc_id: ObjectId) -> str:
+    """
+    Mã hóa (createdAt, _id) thành cursor opaque.
+    createdAt được lưu dạng milliseconds (đúng độ chính xác của MongoDB).
+    """
+    millis = (to_utc(created_at) - _EPOCH) // timedelta(milliseconds=1)
+    raw = f"{millis}:{doc_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Giải mã cursor thành (createdAt, _id). Raise ValueError nếu cursor không hợp lệ."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        millis, doc_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':', 1)
+        return _EPOCH + timedelta(milliseconds=int(millis)), ObjectId(doc_id)
+    except Exception:
+        raise ValueError('Cursor không hợp lệ')
+
+
+def apply_cursor(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Thêm điều kiện keyset vào query: lấy các document "sau" cursor
+    theo thứ tự (createdAt DESC, _id DESC).
+    """
+    if not cursor:
+        return query
+
+    created_at, doc_id = decode_cursor(cursor)
+    keyset = {
+        '$or': [
+            {'createdAt': {'$lt': created_at}},
+            {'createdAt': created_at, '_id': {'$lt': doc_id}},
+        ]
+    }
+    # Dùng $and để không đè lên $or có sẵn trong query
+    query = dict(query)
+    query['$and'] = list(query.get('$and', [])) + [keyset]
+    return query
+
+
+def split_page(docs: List[Dict[str, Any]], limit: Optional[int]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Cắt kết quả đã query với limit + 1 thành (trang hiện tại, nextCursor).
+    nextCursor = None khi đã hết dữ liệu.
+    """
+    if limit is None or len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    last = page[-1]
+    return page, encode_cursor(last['createdAt'], last['_id'])
+
+
+def encode_sort_cursor(value: Any, doc_id: Any) -> str:
+    """Mã hóa (giá trị field sort, _id) của document cuối trang thành cursor opaque (JSON → base64)"""
+    raw = json.dumps([value, str(doc_id)], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_sort_cursor(cursor: str) -> Tuple[Any, str]:
+    """Giải mã cursor của encode_sort_cursor. Raise ValueError nếu cursor không hợp lệ."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return value, doc_id
+    except Exception:
+        raise ValueError('Cursor không hợp lệ')
+
+
+def apply_sort_cursor(query: Dict[str, Any], field: str, direction: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Thêm điều kiện keyset cho sort [(field, direction), ('_id', direction)]
+    (_id là string - dùng cho collection có _id tự đặt như foods)
+    """
+    if not cursor:
+        return query
+
+    value, doc_id = decode_sort_cursor(cursor)
+    op = '$gt' if direction > 0 else '$lt'
+    keyset = {
+        '$or': [
+            {field: {op: value}},
+            {field: value, '_id': {op: doc_id}},
+        ]
+    }
+    query = dict(query)
+    query['$and'] = list(query.get('$and', [])) + [keyset]
+    return query
+
+
+def split_sorted_page(docs: List[Dict[str, Any]], limit: Optional[int], field: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Như split_page nhưng cursor theo (field, _id)"""
+    if limit is None or len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    last = page[-1]
+    return page, encode_sort_cursor(last.get(field), last['_id'])
@@ -0,0 +1,50 @@
+"""
+Stage Timer
+Đo thời gian từng bước của 1 luồng xử lý (vd: checkout) để biết bước nào chậm
+
+CÁCH SỬ DỤNG:
+    timer = StageTimer('checkout')
+    with timer.stage('validate'):
+        ...
+    with timer.stage('write'):
+        ...
+    timer.log(order_id=...)   # [TIMING] checkout total=12.4ms validate=3.1ms write=9.3ms order_id=...
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StageTimer:
+    """Ghi lại thời gian (ms) của từng stage theo thứ tự chạy"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, stage_name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[stage_name] = self.stages.get(stage_name, 0.0) + elapsed
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        """Breakdown dạng {stage: ms, ..., 'total': ms}"""
+        result = {name: round(ms, 2) for name, ms in self.stages.items()}
+        result['total'] = round(self.total_ms, 2)
+        return result
+
+    def log(self, **context) -> None:
+        parts = [f"total={self.total_ms:.1f}ms"]
+        parts += [f"{name}={ms:.1f}ms" for name, ms in self.stages.items()]
+        parts += [f"{key}={value}" for key, value in context.items()]
+        print(f"[TIMING] {self.name} {' '.join(parts)}")
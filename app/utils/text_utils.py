@@ -0,0 +1,65 @@
+import re
+import unicodedata
+from typing import List, Set
+
+_NON_SLUG_CHARS = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_spaces(text: str) -> str:
+    """Lowercase, bỏ khoảng trắng đầu/cuối và gộp khoảng trắng thừa"""
+    return ' '.join((text or '').lower().split())
+
+
+def strip_diacritics(text: str) -> str:
+    """Bỏ dấu tiếng Việt: 'Phở Đặc Biệt' → 'Pho Dac Biet'"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+    # đ/Đ không phải ký tự tổ hợp nên NFD không tách được
+    return unicodedata.normalize('NFC', stripped).replace('đ', 'd').replace('Đ', 'D')
+
+
+def slugify(text: str) -> str:
+    """Tạo slug ASCII cho URL/ID: 'Đồ uống & Trà' → 'do-uong-tra'"""
+    return _NON_SLUG_CHARS.sub('-', strip_diacritics(text).lower()).strip('-')
+
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def fold(text: str) -> str:
+    """Chuẩn hóa để so khớp: bỏ dấu + lowercase + gộp khoảng trắng ('  Phở  BÒ' → 'pho bo')"""
+    return normalize_spaces(strip_diacritics(text))
+
+
+def tokenize(text: str) -> List[str]:
+    """Tách từ (đã bỏ dấu, lowercase): 'Cơm tấm, sườn!' → ['com', 'tam', 'suon']"""
+    return _TOKEN_PATTERN.findall(fold(text))
+
+
+def token_grams(token: str, n: int = 3) -> Set[str]:
+    """Gram của 1 từ: tất cả n-gram + tiền tố ngắn hơn n (để từ khóa ngắn như 'bo' vẫn tra được)"""
+    grams = {token[:i] for i in range(1, min(len(token), n - 1) + 1)}
+    grams.update(token[i:i + n] for i in range(len(token) - n + 1))
+    return grams
+
+
+def search_grams(*texts: str, n: int = 3) -> List[str]:
+    """Tập gram (sorted) của các đoạn text - lưu vào field searchGrams để đánh index multikey"""
+    grams: Set[str] = set()
+    for text in texts:
+        for token in tokenize(text or ''):
+            grams |= token_grams(token, n)
+    return sorted(grams)
+
+
+def query_grams(query: str, n: int = 3) -> List[str]:
+    """Gram bắt buộc của từ khóa: từ dài ≥ n → các n-gram, từ ngắn → chính nó (khớp tiền tố)"""
+    grams: Set[str] = set()
+    for token in tokenize(query):
+        if len(token) >= n:
+            grams.update(token[i:i + n] for i in range(len(token) - n + 1))
+        else:
+            grams.add(token)
+    return sorted(grams)